@@ -0,0 +1,2 @@
+"""Benchmarks for xbrl2rdf, run from the root of the project with
+python -m benchmarks.<name>"""
@@ -0,0 +1,124 @@
+"""Arcs of extended links with many-to-many relations, with the locator and
+arcrole names looked up for every (from, to) pair, as in earlier versions,
+and with XLink2RDF resolving them once per link.
+
+Uses a generated table linkbase: each link has arcs between groups of
+locators sharing a label.
+
+    python -m benchmarks.bench_arcs [links] [locators per label]
+"""
+import sys
+import timeit
+from io import StringIO
+
+from xbrl2rdf.const import *
+from xbrl2rdf.utilfunctions import parseXML, localName
+from xbrl2rdf.ConversionContext import ConversionContext
+from xbrl2rdf.OutputSink import TurtleWriter
+from xbrl2rdf.LinkbaseProcessor import (processExtendedLink, getTurtleName, genRoleName,
+                                        genLinkName, genResourceName, process_resource,
+                                        ARC_ATTRIBUTES)
+import xbrl2rdf.LinkbaseProcessor as LinkbaseProcessor
+
+DICTIONARY = "http://example.com/dict.xsd"
+
+HEADER = ('<link:linkbase xmlns:link="http://www.xbrl.org/2003/linkbase" '
+          'xmlns:xlink="http://www.w3.org/1999/xlink">\n')
+
+LINK = '<link:definitionLink xlink:type="extended" xlink:role="http://example.com/role/t{0}">\n{1}</link:definitionLink>\n'
+
+LOCATOR = '<link:loc xlink:type="locator" xlink:href="{0}#m{1}" xlink:label="{2}"/>\n'
+
+ARC = ('<link:definitionArc xlink:type="arc" xlink:arcrole="http://example.com/arcrole/{0}" '
+       'xlink:from="{1}" xlink:to="{2}" order="{3}"/>\n')
+
+
+def workload(links, size):
+    body = list()
+    for i in range(links):
+        nodes = list()
+        for group in range(4):
+            nodes.extend(LOCATOR.format(DICTIONARY, group * size + j, "g" + str(group)) for j in range(size))
+        nodes.extend(ARC.format("a" + str(a % 2), "g" + str(a), "g" + str(a + 1), a) for a in range(3))
+        body.append(LINK.format(i, "".join(nodes)))
+    root = parseXML((HEADER + "".join(body) + '</link:linkbase>\n').encode('utf-8'))
+    return list(root)
+
+
+class StringWriter(TurtleWriter):
+
+    # triples of the links, without prefixes and header
+    depth = 0
+
+    def __init__(self):
+        self.output = StringIO()
+
+    def write(self, data):
+        self.output.write(data)
+
+
+def legacyXLink2RDF(node, xlink, base, ns, params, handlerPrefix):
+    output = params.pagedata[handlerPrefix]
+    output.comment("XLINKS")
+    output.comment("localname: "+localName(node))
+    output.comment("role: "+node.attrib.get(XLINK_ROLE, None))
+    output.comment("base: "+base)
+    node_role = genRoleName(xlink[XLINK_ROLE], 0, params)
+    for arc in xlink['arcs']:
+        for arc_from in arc.fromloc:
+            for arc_to in arc.toloc:
+                blank = genLinkName(params, handlerPrefix)
+                triple_subject = getTurtleName(arc_from, base, ns, params)
+                triple_predicate = genRoleName(arc.arcrole, 1, params)
+                triple_object = getTurtleName(arc_to, base, ns, params)
+                output.startSubject(blank)
+                output.startBlank(triple_predicate)
+                output.triple("xl:type", "xl:link")
+                if node_role:
+                    output.triple("xl:role", node_role)
+                ARC_ATTRIBUTES.emit(arc.attrib, params, output)
+                output.triple("xl:from", triple_subject)
+                if arc_to.type == "resource":
+                    name = genResourceName(params, handlerPrefix)
+                    output.triple("xl:to", name)
+                    output.endBlank()
+                    output.endSubject()
+                    process_resource(name, arc_to, base, ns, params, handlerPrefix)
+                else:
+                    output.triple("xl:to", triple_object)
+                    output.endBlank()
+                    output.endSubject()
+    return 0
+
+
+def run(links, legacy):
+    params = ConversionContext()
+    params.namespaces["http://example.com/dict"] = "dict"
+    for i in range(len(links[0])):
+        params.id2elementTbl[DICTIONARY + "#m" + str(i)] = ("http://example.com/dict", "m" + str(i))
+    output = StringWriter()
+    params.pagedata["tab"] = output
+    translate = LinkbaseProcessor.XLink2RDF
+    if legacy:
+        LinkbaseProcessor.XLink2RDF = legacyXLink2RDF
+    try:
+        for link in links:
+            processExtendedLink(link, "http://example.com/tab-def.xml", "http://example.com/tab", params, "tab")
+    finally:
+        LinkbaseProcessor.XLink2RDF = translate
+    return output.output.getvalue()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    links = workload(count, size)
+    assert run(links, True) == run(links, False)
+    old = min(timeit.repeat(lambda: run(links, True), number=1, repeat=5))
+    new = min(timeit.repeat(lambda: run(links, False), number=1, repeat=5))
+    print("%8s %8s %14s %14s" % ("links", "pairs", "before (ms)", "after (ms)"))
+    print("%8d %8d %14.1f %14.1f" % (count, count * 3 * size * size, old * 1e3, new * 1e3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Turtle of the attributes of xsd:elements and arcs with a call per known
+attribute, as processAttribute of earlier versions wrote it, and with the
+compiled AttributeEmitter tables.
+
+Uses the schemas and linkbases of the EBA dictionary in data/taxonomies.
+
+    python -m benchmarks.bench_attributes
+"""
+import timeit
+import zipfile
+from io import StringIO
+from datetime import datetime
+from os.path import join
+
+from lxml import etree
+
+from xbrl2rdf.const import *
+from xbrl2rdf.utilfunctions import parseXML
+from xbrl2rdf.ConversionContext import ConversionContext
+from xbrl2rdf.OutputSink import TurtleWriter
+from xbrl2rdf.SchemaProcessor import ELEMENT_ATTRIBUTES
+from xbrl2rdf.LinkbaseProcessor import ARC_ATTRIBUTES
+
+EBA_DICTIONARY = join("data", "taxonomies", "EBA_CRD_IV_XBRL_2.9_Dictionary_2.9.1.0.zip")
+
+ELEMENT_CALLS = [(XBRLI_PERIODTYPE, str), (XBRLI_BALANCE, str), (XBRLDT_TYPEDDOMAINREF, str),
+                 (MODEL_CREATIONDATE, datetime), (MODEL_TODATE, datetime),
+                 (MODEL_MODIFICATIONDATE, datetime), (MODEL_DOMAIN, str),
+                 (MODEL_HIERARCHY, str), (MODEL_ISDEFAULTMEMBER, str), (ENUM_DOMAIN, str),
+                 (ENUM_LINKROLE, str), (SUBSTITUTIONGROUP, None), (NILLABLE, bool),
+                 (ABSTRACT, bool), (BALANCE, str), (FIXED, bool), (EXT_ENUM_LINKROLE, None),
+                 (EXT_ENUM_DOMAIN, None), (EXT_ENUM_HEADUSABLE, bool)]
+
+ARC_CALLS = [(XBRLDT_CONTEXTELEMENT, str), (XBRLDT_TARGETROLE, None), (XBRLDT_CLOSED, bool),
+             (XBRLDT_USABLE, bool), (COVER, str), (AXIS, str), (COMPLEMENT, bool), (NAME, str),
+             (PREFERRED_LABEL, str), (USE, str), (PRIORITY, int), (ORDER, float), (WEIGHT, float)]
+
+
+def workload():
+    elements = list()
+    arcs = list()
+    with zipfile.ZipFile(EBA_DICTIONARY) as z:
+        for name in z.namelist():
+            if name.endswith(".xsd"):
+                root = parseXML(z.read(name))
+                elements.extend(root.iterfind("{http://www.w3.org/2001/XMLSchema}element"))
+            elif name.endswith(".xml"):
+                root = parseXML(z.read(name))
+                for node in root.iter(etree.Element):
+                    if node.get(XLINK_TYPE) == "arc":
+                        arcs.append(dict(node.attrib))
+    return elements, arcs
+
+
+class StringWriter(TurtleWriter):
+
+    # triples of the subject being written, as legacyProcessAttribute writes them
+    depth = 1
+
+    def __init__(self):
+        self.output = StringIO()
+
+    def write(self, data):
+        self.output.write(data)
+
+
+def legacyProcessAttribute(node, attr, attr_type, params):
+    # processAttribute of earlier versions, without the unused arguments
+    if isinstance(node, dict):
+        attr_value = node.get(attr, None)
+    else:
+        attr_value = node.attrib.get(attr, None)
+    if not attr_value:
+        return ''
+    attr_value = attr_value.replace("\\", "\\\\")
+    if attr_type in (bool, int, float, datetime):
+        return '    '+predicates[attr]+' "'+attr_value+'"'+' ;\n'
+    elif attr_type == str:
+        return '    '+predicates[attr]+' """'+attr_value+'"""'+' ;\n'
+    elif attr_type == 'as-is':
+        return '    '+predicates[attr]+' "'+attr_value+' ;\n'
+    name = attr_value.split("/")[-1]
+    base = "/".join(attr_value.split("/")[0:-1])
+    prefix = params.namespaces.get(base, None)
+    if prefix:
+        attr_value = prefix+":"+name
+    else:
+        attr_value = "<"+attr_value+">"
+    return '    '+predicates[attr]+' '+attr_value+' ;\n'
+
+
+def before(nodes, calls, params):
+    output = StringIO()
+    for node in nodes:
+        for attr, attr_type in calls:
+            output.write(legacyProcessAttribute(node, attr, attr_type, params))
+    return output.getvalue()
+
+
+def after(nodes, emitter, params):
+    output = StringWriter()
+    for node in nodes:
+        emitter.emit(node, params, output)
+    return output.output.getvalue()
+
+
+def main():
+    elements, arcs = workload()
+    params = ConversionContext()
+    print("%8s %8s %14s %14s" % ("nodes", "kind", "before (ms)", "after (ms)"))
+    for kind, nodes, calls, emitter in (("element", elements, ELEMENT_CALLS, ELEMENT_ATTRIBUTES),
+                                        ("arc", arcs, ARC_CALLS, ARC_ATTRIBUTES)):
+        assert before(nodes, calls, params) == after(nodes, emitter, params)
+        old = min(timeit.repeat(lambda: before(nodes, calls, params), number=1, repeat=5))
+        new = min(timeit.repeat(lambda: after(nodes, emitter, params), number=1, repeat=5))
+        print("%8d %8s %14.1f %14.1f" % (len(nodes), kind, old * 1e3, new * 1e3))
+
+
+if __name__ == "__main__":
+    main()
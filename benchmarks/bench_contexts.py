@@ -0,0 +1,80 @@
+"""Decoding of the identifier, period and dimensions of instance contexts,
+with the localname lookups of earlier versions and with decodeContext.
+
+Uses a generated instance with dimensional contexts, each with a segment
+member and explicit and typed scenario members.
+
+    python -m benchmarks.bench_contexts [contexts]
+"""
+import sys
+import timeit
+
+from lxml import etree
+
+from xbrl2rdf.InstanceProcessor import decodeContext
+from xbrl2rdf.utilfunctions import parseXML
+
+HEADER = ('<xbrli:xbrl xmlns:xbrli="http://www.xbrl.org/2003/instance" '
+          'xmlns:xbrldi="http://xbrl.org/2006/xbrldi" xmlns:dim="http://example.com/dim" '
+          'xmlns:typ="http://example.com/typ">\n')
+
+CONTEXT = ('<xbrli:context id="c{0}"><xbrli:entity>'
+           '<xbrli:identifier scheme="http://standards.iso.org/iso/17442">LEI{1}</xbrli:identifier>'
+           '<xbrli:segment><xbrldi:explicitMember dimension="dim:SEG">dim:s{2}</xbrldi:explicitMember></xbrli:segment>'
+           '</xbrli:entity><xbrli:period><xbrli:startDate>2020-01-01</xbrli:startDate>'
+           '<xbrli:endDate>2020-12-31</xbrli:endDate></xbrli:period><xbrli:scenario>'
+           '<xbrldi:explicitMember dimension="dim:BAS">dim:x{3}</xbrldi:explicitMember>'
+           '<xbrldi:explicitMember dimension="dim:MCY">dim:y{4}</xbrldi:explicitMember>'
+           '<xbrldi:typedMember dimension="dim:TYP"><typ:id>t{0}</typ:id></xbrldi:typedMember>'
+           '</xbrli:scenario></xbrli:context>\n')
+
+
+def workload(count):
+    body = "".join(CONTEXT.format(i, i % 10, i % 3, i % 7, i % 13) for i in range(count))
+    return list(parseXML((HEADER + body + '</xbrli:xbrl>\n').encode('utf-8')))
+
+
+def legacyDimensions(context, keyword):
+    dimensionlist = list()
+    for node in context.iter():
+        if etree.QName(node).localname == keyword:
+            for subnode in node.iter():
+                if etree.QName(subnode).localname == "explicitMember":
+                    dimensionlist.append((subnode.get('dimension'), None, subnode.text))
+                elif etree.QName(subnode).localname == "typedMember":
+                    dimension = subnode.get('dimension')
+                    inner = subnode[0]
+                    tagdata = inner.prefix + ":" + etree.QName(inner.tag).localname
+                    dimensionlist.append((dimension, tagdata, inner.text))
+    return dimensionlist
+
+
+def legacyPeriod(context):
+    for node in context:
+        if etree.QName(node).localname == "period":
+            return node
+    return None
+
+
+def before(contexts):
+    return [(context[0][0], legacyPeriod(context),
+             legacyDimensions(context, 'segment'), legacyDimensions(context, 'scenario'))
+            for context in contexts]
+
+
+def after(contexts):
+    return [decodeContext(context) for context in contexts]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    contexts = workload(count)
+    assert before(contexts) == after(contexts)
+    old = min(timeit.repeat(lambda: before(contexts), number=1, repeat=5))
+    new = min(timeit.repeat(lambda: after(contexts), number=1, repeat=5))
+    print("%10s %14s %14s" % ("contexts", "before (ms)", "after (ms)"))
+    print("%10d %14.1f %14.1f" % (count, old * 1e3, new * 1e3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Scaling of the dts work queue with the size of the DTS.
+
+Replays the queue traffic of a DTS walk: every schema appends its
+linkbases and prepends its imports (many of them already seen), every
+linkbase prepends the schemas its locators point to and each popped uri
+is checked against the processed uris. The list based queue of earlier
+versions is kept here for comparison.
+
+    python -m benchmarks.bench_dtsqueue
+"""
+import random
+import timeit
+
+from xbrl2rdf.DtsProcessor import DtsQueue
+
+
+class ListQueue:
+    # the former list implementation of params['dts_queue'] and
+    # params['dts_processed']
+
+    def __init__(self):
+        self.queue = list()
+        self.processed = list()
+
+    def prepend(self, entry):
+        for item in self.queue:
+            if item[1] == entry[1]:
+                self.queue.remove(item)
+        self.queue.insert(0, entry)
+
+    def append(self, entry):
+        for item in self.queue:
+            if item[1] == entry[1]:
+                self.queue.remove(item)
+        self.queue.append(entry)
+
+    def pop(self):
+        if self.queue != []:
+            return self.queue.pop(0)
+        return None
+
+
+def workload(size: int, seed: int = 1) -> list:
+    rnd = random.Random(seed)
+    schemas = ["http://example.com/dict/s%d.xsd" % i for i in range(size)]
+    linkbases = {schema: [schema[:-4] + "_%s.xml" % kind for kind in ("lab", "def", "pre")]
+                 for schema in schemas}
+    imports = {schema: rnd.sample(schemas, min(size, 3)) for schema in schemas}
+    return schemas, linkbases, imports
+
+
+def run(queue_factory, size: int) -> int:
+    schemas, linkbases, imports = workload(size)
+    queue = queue_factory()
+    processed = queue.processed
+    add = processed.add if isinstance(processed, set) else processed.append
+    queue.prepend((0, schemas[0], None))
+    loaded = 0
+    item = queue.pop()
+    while item is not None:
+        uri = item[1]
+        if uri not in processed:
+            add(uri)
+            loaded += 1
+            if uri.endswith(".xsd"):
+                for linkbase in linkbases[uri]:
+                    queue.append((1, linkbase, None))
+                for schema in imports[uri]:
+                    queue.prepend((0, schema, None))
+            else:
+                schema = uri.rsplit("_", 1)[0] + ".xsd"
+                for target in imports[schema]:
+                    if target not in processed:
+                        queue.prepend((0, target, None))
+        item = queue.pop()
+    return loaded
+
+
+def main():
+    print("%8s %8s %12s %12s" % ("schemas", "files", "list (s)", "DtsQueue (s)"))
+    for size in (250, 500, 1000, 2000, 4000):
+        loaded = run(DtsQueue, size)
+        list_time = min(timeit.repeat(lambda: run(ListQueue, size), number=1, repeat=3))
+        deque_time = min(timeit.repeat(lambda: run(DtsQueue, size), number=1, repeat=3))
+        print("%8d %8d %12.4f %12.4f" % (size, loaded, list_time, deque_time))
+
+
+if __name__ == "__main__":
+    main()
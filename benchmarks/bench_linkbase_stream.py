@@ -0,0 +1,96 @@
+"""Loading of a large label linkbase through loadXML, from its parsed tree
+and streamed from the file (stream_size 1), each in a fresh process, with
+the growth of the peak resident set size while it runs.
+
+Uses a generated label linkbase file with one extended link per role.
+
+    python -m benchmarks.bench_linkbase_stream [links] [labels per link]
+"""
+import os
+import sys
+import time
+import resource
+import tempfile
+import subprocess
+
+from xbrl2rdf.const import *
+from xbrl2rdf.utilfunctions import loadXML
+from xbrl2rdf.ConversionContext import ConversionContext
+from xbrl2rdf.CompletionIndex import CompletionIndex
+from xbrl2rdf.OutputSink import TurtleWriter
+from xbrl2rdf.DtsProcessor import processDtsFile
+
+DICTIONARY = "http://example.com/dict.xsd"
+
+HEADER = ('<link:linkbase xmlns:link="http://www.xbrl.org/2003/linkbase" '
+          'xmlns:xlink="http://www.w3.org/1999/xlink">\n')
+
+LINK = '<link:labelLink xlink:type="extended" xlink:role="http://www.xbrl.org/2003/role/link{0}">\n{1}</link:labelLink>\n'
+
+LABEL = ('<link:loc xlink:type="locator" xlink:href="{0}#m{1}" xlink:label="loc_m{1}"/>\n'
+         '<link:label xlink:type="resource" xlink:label="label_m{1}" xlink:role="http://www.xbrl.org/2003/role/label" '
+         'xml:lang="en">Label of metric {1} in link {2}</link:label>\n'
+         '<link:labelArc xlink:type="arc" xlink:arcrole="http://www.xbrl.org/2003/arcrole/concept-label" '
+         'xlink:from="loc_m{1}" xlink:to="label_m{1}"/>\n')
+
+
+def workload(filename, links, size):
+    # written link by link, so building it doesn't raise the peak
+    with open(filename, "w", encoding="utf-8") as fp:
+        fp.write(HEADER)
+        for i in range(links):
+            labels = "".join(LABEL.format(DICTIONARY, i * size + j, i) for j in range(size))
+            fp.write(LINK.format(i, labels))
+        fp.write('</link:linkbase>\n')
+
+
+class NullWriter(TurtleWriter):
+
+    # turtle of the links is generated and dropped
+    depth = 0
+
+    def write(self, data):
+        pass
+
+
+class NullSink:
+
+    # loadXML opens an output file per dts file
+    def open(self, name, filename, source):
+        return NullWriter()
+
+
+def run(mode, links, size):
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "lab.xml")
+        workload(filename, links, size)
+        params = ConversionContext()
+        params.dts_processed.add(DICTIONARY)
+        params.namespaces["http://example.com/dict"] = "dict"
+        params.output_sink = NullSink()
+        params.stream_size = 1 if mode == "stream" else None
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        loadXML(processDtsFile, filename, "", params, CompletionIndex())
+        elapsed = time.perf_counter() - started
+        growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+        print("%d %f %d" % (os.path.getsize(filename), elapsed, growth))
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ("tree", "stream"):
+        run(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]))
+        return
+    links = sys.argv[1] if len(sys.argv) > 1 else "200"
+    size = sys.argv[2] if len(sys.argv) > 2 else "1000"
+    print("%10s %8s %12s %18s" % ("size (MB)", "mode", "time (ms)", "peak growth (MB)"))
+    for mode in ("tree", "stream"):
+        result = subprocess.run([sys.executable, "-m", "benchmarks.bench_linkbase_stream", mode, links, size],
+                                capture_output=True, text=True, check=True, cwd=os.getcwd())
+        # loadXML prints the uri it processes, the result is the last line
+        length, elapsed, growth = result.stdout.splitlines()[-1].split()
+        print("%10.1f %8s %12.1f %18.1f" % (int(length) / 2**20, mode, float(elapsed) * 1e3, int(growth) / 1024))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Remapping of urls with the linear scan of earlier versions and with
+PrefixIndex.
+
+Uses the remappings of the packages in data/taxonomies plus synthetic
+prefixes to grow the table, and the urls of the files in the packages.
+
+    python -m benchmarks.bench_prefixindex
+"""
+import json
+import timeit
+import zipfile
+from os.path import join
+
+from xbrl2rdf.utilfunctions import PrefixIndex
+
+TAXONOMY_PATH = join("data", "taxonomies")
+
+
+def linearRemap(mappedPaths: dict, url: str) -> str:
+    # longest prefix by scanning every remapping
+    longestPrefix = 0
+    for mapFrom, mapTo in mappedPaths.items():
+        if url.startswith(mapFrom) and len(mapFrom) > longestPrefix:
+            mappedUrl = mapTo + url[len(mapFrom):]
+            longestPrefix = len(mapFrom)
+    if longestPrefix:
+        return mappedUrl
+    return url
+
+
+def workload():
+    with open(join(TAXONOMY_PATH, "taxonomyPackages.json"), encoding="utf-8") as f:
+        config = json.load(f)
+    remappings = dict()
+    urls = list()
+    for package in config["packages"]:
+        remappings.update(package["remappings"])
+        try:
+            names = zipfile.ZipFile(package["URL"]).namelist()
+        except OSError:
+            continue
+        for name in names:
+            # zip entries below <root>/<host>/... are published as http://<host>/...
+            parts = name.split("/", 1)
+            if len(parts) == 2 and parts[1].startswith("www."):
+                urls.append("http://" + parts[1])
+    return remappings, urls
+
+
+def main():
+    remappings, urls = workload()
+    print("%d urls" % len(urls))
+    print("%10s %14s %14s" % ("prefixes", "linear (us)", "index (us)"))
+    for extra in (0, 100, 1000, 10000):
+        table = dict(remappings)
+        for i in range(extra):
+            table["http://www.example%d.org/taxonomy/%d/" % (i % 97, i)] = "/tmp/example/%d/" % i
+        index = PrefixIndex(table)
+        assert all(index.remap(url) == linearRemap(table, url) for url in urls)
+        linear = min(timeit.repeat(lambda: [linearRemap(table, url) for url in urls], number=1, repeat=3))
+        indexed = min(timeit.repeat(lambda: [index.remap(url) for url in urls], number=1, repeat=3))
+        print("%10d %14.2f %14.2f" % (len(table), linear / len(urls) * 1e6, indexed / len(urls) * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Reading the locators, resources and arcs of extended links into a dict
+per node, as in earlier versions, and into Locator and Arc records, with
+the peak of the Python allocations while a link is held (tracemalloc).
+
+Uses a generated label linkbase; the links are read, not translated.
+
+    python -m benchmarks.bench_xlinks [links] [labels per link]
+"""
+import sys
+import timeit
+import tracemalloc
+from collections import defaultdict
+
+from xbrl2rdf.const import *
+from xbrl2rdf.utilfunctions import parseXML
+from xbrl2rdf.ConversionContext import ConversionContext
+import xbrl2rdf.LinkbaseProcessor as LinkbaseProcessor
+
+HEADER = ('<link:linkbase xmlns:link="http://www.xbrl.org/2003/linkbase" '
+          'xmlns:xlink="http://www.w3.org/1999/xlink">\n')
+
+LINK = '<link:labelLink xlink:type="extended" xlink:role="http://www.xbrl.org/2003/role/link">\n{0}</link:labelLink>\n'
+
+LABEL = ('<link:loc xlink:type="locator" xlink:href="http://example.com/dict.xsd#m{0}" xlink:label="loc_m{0}"/>\n'
+         '<link:label xlink:type="resource" xlink:label="label_m{0}" xlink:role="http://www.xbrl.org/2003/role/label" '
+         'xml:lang="en">Label of metric {0}</link:label>\n'
+         '<link:labelArc xlink:type="arc" xlink:arcrole="http://www.xbrl.org/2003/arcrole/concept-label" '
+         'xlink:from="loc_m{0}" xlink:to="label_m{0}" order="1"/>\n')
+
+
+def workload(links, size):
+    body = "".join(LINK.format("".join(LABEL.format(i * size + j) for j in range(size))) for i in range(links))
+    return list(parseXML((HEADER + body + '</link:linkbase>\n').encode('utf-8')))
+
+
+# the attribute checks of earlier versions searched lists
+RESOURCE_ATTRIBUTES = list(LinkbaseProcessor.RESOURCE_KNOWN_ATTRIBUTES)
+ARC_ATTRIBUTES = list(LinkbaseProcessor.ARC_KNOWN_ATTRIBUTES)
+
+
+def legacyExtendedLink(element, base, ns, params, handlerPrefix):
+    xlink = {XLINK_ROLE: element.attrib.get(XLINK_ROLE),
+             XLINK_ID: element.attrib.get(XLINK_ID),
+             XLINK_BASE: element.attrib.get(XLINK_BASE),
+             'locators': list(),
+             'arcs': list()}
+    for node in element:
+        node_type = node.attrib.get(XLINK_TYPE, None)
+        if node_type == "resource":
+            for key in node.attrib:
+                if key not in RESOURCE_ATTRIBUTES:
+                    print("Not supported yet: resource attribute '"+str(key)+"'")
+        elif node_type == "arc":
+            for key in node.attrib:
+                if key not in ARC_ATTRIBUTES:
+                    print("Not supported yet: arc attribute '"+str(key)+"'")
+        if node_type in ("locator", "resource", "arc"):
+            item = {key: node.attrib.get(key) for key
+                    in node.attrib if node.attrib.get(key) is not None}
+            item['tag'] = node.tag
+            if node_type == "resource":
+                item['node'] = node
+            xlink['arcs' if node_type == "arc" else 'locators'].append(item)
+    labels_nodes = defaultdict(list)
+    for locator in xlink['locators']:
+        labels_nodes[locator[XLINK_LABEL]].append(locator)
+    for arc in xlink['arcs']:
+        arc['fromloc'] = labels_nodes.get(arc[XLINK_FROM], list())
+        arc['toloc'] = labels_nodes.get(arc[XLINK_TO], list())
+    return LinkbaseProcessor.XLink2RDF(element, xlink, base, ns, params, handlerPrefix)
+
+
+def held(node, xlink, base, ns, params, handlerPrefix):
+    # translation is left out, the link is complete here
+    return 0
+
+
+def run(links, read):
+    params = ConversionContext()
+    for link in links:
+        read(link, "http://example.com/lab.xml", "", params, "lab")
+
+
+def measure(links, read):
+    tracemalloc.start()
+    run(links, read)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    links = workload(count, size)
+    translate = LinkbaseProcessor.XLink2RDF
+    LinkbaseProcessor.XLink2RDF = held
+    try:
+        print("%8s %10s %14s %16s" % ("links", "version", "time (ms)", "peak (MB)"))
+        for version, read in (("dicts", legacyExtendedLink), ("records", LinkbaseProcessor.processExtendedLink)):
+            elapsed = min(timeit.repeat(lambda: run(links, read), number=1, repeat=5))
+            print("%8d %10s %14.1f %16.1f" % (count, version, elapsed * 1e3, measure(links, read) / 2**20))
+    finally:
+        LinkbaseProcessor.XLink2RDF = translate
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,212 @@
 """Tests for `xbrl2rdf` package."""
 
 
+import os
+import gzip
+import hashlib
+import tempfile
+import threading
 import unittest
+import zipfile
+from unittest import mock
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
 from click.testing import CliRunner
 
 from xbrl2rdf import xbrl2rdf
+from xbrl2rdf.DtsProcessor import DtsQueue, DtsPrefetcher, dispatchDtsQueue
+from xbrl2rdf.CompletionIndex import CompletionIndex, JOURNAL_FILE, PRELOADS_FILE, EMITTED_JOURNAL_FILE
+from xbrl2rdf.Manifest import Manifest, MANIFEST_FILE, MANIFEST_JOURNAL_FILE
+from xbrl2rdf.utilfunctions import PrefixIndex, HrefCache, appendDtsQueue
+from xbrl2rdf.WebCache import WebCache, OfflineError
+from xbrl2rdf.Emitter import GraphSink, Literal
+from xbrl2rdf.OutputSink import NQuadsSink, NTriplesSink, OutputSink
+from xbrl2rdf.InstanceProcessor import contextKey, hashName, entryPoints, decodeContext, processContext
+from xbrl2rdf.utilfunctions import parseXML, splitTag, TagDispatch
+from xbrl2rdf.OutputSink import TurtleWriter, EXTENSIONS, zstandard
+from xbrl2rdf.ConversionContext import ConversionContext
+from xbrl2rdf.LinkbaseProcessor import ARC_ATTRIBUTES, RESOURCE_ATTRIBUTES, Locator, Arc, processExtendedLink
+from xbrl2rdf.const import (XBRL_SCHEMA, XBRL_LINKBASE, XLINK_FROM, XLINK_TO, XLINK_ARCROLE, NAME,
+                            XBRLDT_CONTEXTELEMENT, XBRLDT_TARGETROLE, XBRLDT_CLOSED, XBRLDT_USABLE,
+                            COVER, AXIS, COMPLEMENT, PREFERRED_LABEL, USE, PRIORITY, ORDER, WEIGHT)
+from lxml import etree
+from rdflib import Graph, URIRef, BNode
+from rdflib import Literal as RDFLiteral
+from rdflib.compare import isomorphic
+
+from xbrl2rdf import PackageManager, LinkbaseProcessor, DtsProcessor
+from xbrl2rdf.PackageManager import Taxonomies
+
+PPSP_SCHEMA = "http://www.dnb.nl/nl/fr/xbrl/fws/dnb-nr/ppsp-2018-01/2018-04-30/mod/ppsp.xsd"
+
+INSTANCE_HEADER = (
+    '<xbrli:xbrl xmlns:xbrli="http://www.xbrl.org/2003/instance" xmlns:link="http://www.xbrl.org/2003/linkbase" '
+    'xmlns:xlink="http://www.w3.org/1999/xlink" xmlns:iso4217="http://www.xbrl.org/2003/iso4217" '
+    'xmlns:xbrldi="http://xbrl.org/2006/xbrldi" xmlns:ppsp-met="http://www.dnb.nl/nl/fr/xbrl/dict/met" '
+    'xmlns:ppsp-dim="http://www.dnb.nl/nl/fr/xbrl/dict/dim">\n'
+    '<link:schemaRef xlink:type="simple" xlink:href="' + PPSP_SCHEMA + '"/>\n'
+    '<xbrli:unit id="EUR"><xbrli:measure>iso4217:EUR</xbrli:measure></xbrli:unit>\n')
+
+INSTANCE_CONTEXT = (
+    '<xbrli:context id="c{0}"><xbrli:entity><xbrli:identifier scheme="http://standards.iso.org/iso/17442">'
+    'LEI</xbrli:identifier></xbrli:entity><xbrli:period><xbrli:instant>2018-12-31</xbrli:instant></xbrli:period>'
+    '<xbrli:scenario><xbrldi:explicitMember dimension="ppsp-dim:BAS">ppsp-dim:x{1}</xbrldi:explicitMember>'
+    '</xbrli:scenario></xbrli:context>\n')
+
+INSTANCE_FACT = '<ppsp-met:mi{0} contextRef="c{1}" unitRef="EUR" decimals="0">{2}</ppsp-met:mi{0}>\n'
+
+# turtle of the attributes of an arc and a resource, in the order of the emitters
+ARC_TURTLE = ['    xbrldt:contextElement """segment""" ;\n', '    xbrldt:targetRole role:link ;\n',
+              '    xbrldt:closed "true" ;\n', '    xbrldt:usable "false" ;\n', '    xl:axis """descendant""" ;\n',
+              '    xl:complement "false" ;\n', '    xl:name """v""" ;\n',
+              '    xl:preferredLabel """http://www.xbrl.org/2003/role/terseLabel""" ;\n',
+              '    xl:use """optional""" ;\n', '    xl:priority "1" ;\n', '    xl:order "2.0" ;\n',
+              '    xl:weight "-1" ;\n']
+
+RESOURCE_TURTLE = ['    xlink:role <http://example.com/role/variable> ;\n', '    rdf:lang """en""" ;\n',
+                   '    xbrli:nils "false" ;\n', '    xbrli:matches "true" ;\n', '    xl:bindAsSequence "false" ;\n',
+                   '    xl:fallbackValue """0""" ;\n', '    xl:test """$a ge 0""" ;\n',
+                   '    xl:select """concat(\'a\', \'b\')""" ;\n', '    xl:dimension """eba_dim:BAS""" ;\n']
+
+LINKBASE_SCHEMA = (
+    '<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xbrli="http://www.xbrl.org/2003/instance" '
+    'xmlns:s="http://example.com/s" targetNamespace="http://example.com/s">\n'
+    '<xsd:element id="s_m1" name="m1" type="xbrli:monetaryItemType" substitutionGroup="xbrli:item"/>\n'
+    '<xsd:element id="s_m2" name="m2" type="xbrli:monetaryItemType" substitutionGroup="xbrli:item"/>\n'
+    '</xsd:schema>\n')
+
+# two locators and two resources with the same label, an arc to a missing label
+LINKBASE = (
+    '<link:linkbase xmlns:link="http://www.xbrl.org/2003/linkbase" xmlns:xlink="http://www.w3.org/1999/xlink">\n'
+    '<link:labelLink xlink:type="extended" xlink:role="http://www.xbrl.org/2003/role/link">\n'
+    '<link:loc xlink:type="locator" xlink:href="s.xsd#s_m1" xlink:label="m"/>\n'
+    '<link:loc xlink:type="locator" xlink:href="s.xsd#s_m2" xlink:label="m"/>\n'
+    '<link:label xlink:type="resource" xlink:label="l" xlink:role="http://www.xbrl.org/2003/role/label" '
+    'xml:lang="en">Amount</link:label>\n'
+    '<link:label xlink:type="resource" xlink:label="l" xlink:role="http://www.xbrl.org/2003/role/terseLabel" '
+    'xml:lang="nl">Bedrag</link:label>\n'
+    '<link:labelArc xlink:type="arc" xlink:arcrole="http://www.xbrl.org/2003/arcrole/concept-label" '
+    'xlink:from="m" xlink:to="l"/>\n'
+    '<link:labelArc xlink:type="arc" xlink:arcrole="http://www.xbrl.org/2003/arcrole/concept-label" '
+    'xlink:from="m" xlink:to="missing"/>\n'
+    '</link:labelLink>\n'
+    '<link:presentationLink xlink:type="extended" xlink:role="http://www.xbrl.org/2003/role/link">\n'
+    '<link:loc xlink:type="locator" xlink:href="s.xsd#s_m1" xlink:label="a"/>\n'
+    '<link:loc xlink:type="locator" xlink:href="s.xsd#s_m2" xlink:label="b"/>\n'
+    '<link:presentationArc xlink:type="arc" xlink:arcrole="http://www.xbrl.org/2003/arcrole/parent-child" '
+    'xlink:from="a" xlink:to="b" order="2" use="optional" priority="1"/>\n'
+    '</link:presentationLink>\n'
+    '</link:linkbase>\n')
+
+TURTLE_PREFIXES = ('@prefix xl: <http://www.xbrl.org/2003/XLink#>.\n'
+                   '@prefix xlink: <http://www.w3.org/1999/xlink#>.\n'
+                   '@prefix xbrldt: <http://xbrl.org/2005/xbrldt#>.\n'
+                   '@prefix role: <http://www.xbrl.org/2003/role#>.\n'
+                   '@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>.\n'
+                   '@prefix xbrli: <http://www.xbrl.org/2003/instance#>.\n')
+
+
+def ppspPackage() -> int:
+    """Index of the PPSP package, found without saving taxonomyPackages.json."""
+    if xbrl2rdf.manager is None:
+        manager = Taxonomies(tempfile.mkdtemp())
+        manager.refresh(xbrl2rdf.TAXONOMY_PATH)
+        manager.rebuildRemappings()
+        xbrl2rdf.manager = manager
+    names = [package['name'] for package in xbrl2rdf.manager.config['packages']]
+    return names.index('PPSP reporting')
+
+
+def writePackage(filename: str, name: str) -> str:
+    """Taxonomy package zip with only the files of META-INF."""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    with zipfile.ZipFile(filename, 'w') as package:
+        package.writestr(stem + '/META-INF/taxonomyPackage.xml',
+                         '<taxonomyPackage xmlns="http://xbrl.org/2016/taxonomy-package" xml:lang="en">'
+                         '<identifier>http://example.com/' + stem + '</identifier><name>' + name + '</name>'
+                         '<version>1</version></taxonomyPackage>')
+        package.writestr(stem + '/META-INF/catalog.xml',
+                         '<catalog xmlns="urn:oasis:names:tc:entity:xmlns:xml:catalog">'
+                         '<rewriteURI uriStartString="http://example.com/' + stem + '/" rewritePrefix="../"/></catalog>')
+    return filename
+
+
+def writeInstance(filename: str, number: int, facts: int = 3, contexts_first: bool = True) -> str:
+    """Small PPSP instance, instances with another number have the same contexts but other facts."""
+    contexts = "".join(INSTANCE_CONTEXT.format(i, i % 2) for i in range(facts))
+    values = "".join(INSTANCE_FACT.format(i, i, number * 100 + i) for i in range(facts))
+    body = contexts + values if contexts_first else values + contexts
+    with open(filename, 'w', encoding='utf-8') as outfile:
+        outfile.write(INSTANCE_HEADER + body + '</xbrli:xbrl>\n')
+    return filename
+
+
+def instanceGraph(output: str, url: str, base: str = None) -> Graph:
+    """Graph of the output files of the instance url, from the manifest.
+
+    With base, relative names are resolved against base and the name of the
+    file instead of the output directory, so outputs of runs in other
+    directories can be compared.
+    """
+    graph = Graph()
+    for entry in Manifest(output)[url]:
+        graph.parse(os.path.join(output, entry['file']), format="turtle",
+                    publicID=base + entry['file'] if base else None)
+    return graph
+
+
+def writeLinkbase(directory: str) -> str:
+    """s.xsd and lab.xml in directory, returns the filename of the linkbase."""
+    with open(os.path.join(directory, "s.xsd"), 'w', encoding='utf-8') as outfile:
+        outfile.write(LINKBASE_SCHEMA)
+    with open(os.path.join(directory, "lab.xml"), 'w', encoding='utf-8') as outfile:
+        outfile.write(LINKBASE)
+    return os.path.join(directory, "lab.xml")
+
+
+def dtsGraph(queue: list, stream_size: int = None, prefetcher: DtsPrefetcher = None) -> tuple:
+    """Graph and params of the dts files in queue, a list of (uri_type, uri)."""
+    graph = Graph()
+    params = ConversionContext()
+    params.stream_size = stream_size
+    params.prefetcher = prefetcher
+    params.dts_queue = DtsQueue()
+    params.dts_processed = params.dts_queue.processed
+    params.output_sink = GraphSink(graph)
+    params.output_sink.namespaces = params.namespaces
+    for prefix, uri in (("xbrli", "http://www.xbrl.org/2003/instance"), ("link", "http://www.xbrl.org/2003/linkbase"),
+                        ("xl", "http://www.xbrl.org/2003/XLink"), ("xlink", "http://www.w3.org/1999/xlink"),
+                        ("rdf", "http://www.w3.org/1999/02/22-rdf-syntax-ns#"), ("xsd", "http://www.w3.org/2001/XMLSchema")):
+        params.namespaces[uri] = prefix
+    params.namespaces_to_skip = ["http://www.xbrl.org/2003/instance", "http://www.xbrl.org/2003/linkbase"]
+    for uri_type, uri in queue:
+        appendDtsQueue(uri_type, uri, "", None, 0, params)
+    dispatchDtsQueue(params, CompletionIndex())
+    return graph, params
+
+
+class StringWriter(TurtleWriter):
+    """Turtle of the triples of one subject."""
+    depth = 1
+
+    def __init__(self):
+        self.lines = []
+
+    def write(self, data: str) -> None:
+        self.lines.append(data)
+
+
+class CountingHandler(SimpleHTTPRequestHandler):
+    """Serves files and counts the GET requests."""
+    protocol_version = "HTTP/1.1"
+    requests = list()
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get("If-Modified-Since")))
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
 
 class TestXbrl2rdf(unittest.TestCase):
     """Tests for `xbrl2rdf` package."""
@@ -20,6 +222,747 @@ class TestXbrl2rdf(unittest.TestCase):
     def test_000_something(self):
         """Test something."""
 
+    def test_dts_queue(self):
+        """Test prepend/append priority of the dts queue."""
+        queue = DtsQueue()
+        queue.append((1, "a.xml", None))
+        queue.append((1, "b.xml", None))
+        queue.prepend((0, "c.xsd", None))
+        # queueing a uri again moves it
+        queue.append((1, "a.xml", None))
+        queue.prepend((0, "b.xml", None))
+        self.assertEqual(len(queue), 3)
+        self.assertEqual([entry[1] for entry in queue], ["b.xml", "c.xsd", "a.xml"])
+        self.assertIn("a.xml", queue)
+        self.assertEqual([entry[1] for entry in queue.peek(2)], ["b.xml", "c.xsd"])
+        self.assertEqual(queue.pop(), (0, "b.xml", None))
+        self.assertEqual(queue.pop(), (0, "c.xsd", None))
+        self.assertEqual(queue.pop(), (1, "a.xml", None))
+        self.assertIsNone(queue.pop())
+        self.assertEqual(len(queue), 0)
+
+    def test_completion_index(self):
+        """Test journal and compaction of the completion index."""
+        with tempfile.TemporaryDirectory() as path:
+            index = CompletionIndex(path, compact_every=3)
+            index.add("a.xbrl")
+            index.add("b.xsd")
+            index.add("a.xbrl")
+            index.checkpoint()
+            with open(os.path.join(path, JOURNAL_FILE)) as journal:
+                self.assertEqual(journal.read(), "a.xbrl\nb.xsd\n")
+            self.assertIn("b.xsd", CompletionIndex(path))
+            index.add("c.xml")
+            index.checkpoint()
+            # the journal reached compact_every and is folded into preloads.json
+            self.assertFalse(os.path.exists(os.path.join(path, JOURNAL_FILE)))
+            self.assertTrue(os.path.exists(os.path.join(path, PRELOADS_FILE)))
+            resumed = CompletionIndex(path)
+            self.assertEqual(sorted(resumed), ["a.xbrl", "b.xsd", "c.xml"])
+
+    def test_manifest(self):
+        """Test the manifest of output files and their hashes."""
+        with tempfile.TemporaryDirectory() as output:
+            data = OutputSink(output).open("dts1", "/met", "http://example.com/met.xsd")
+            data.write("# empty\n")
+            files = data.close("")
+            # a rerun writes the same file
+            again = OutputSink(output).open("dts1", "/met", "http://example.com/met.xsd")
+            self.assertEqual(again.filename, files[0])
+            again.discard()
+            Manifest(output).update({"http://example.com/met.xsd": files}, data.digests)
+            self.assertFalse(os.path.exists(os.path.join(output, MANIFEST_FILE)))
+            manifest = Manifest(output)
+            entry = manifest["http://example.com/met.xsd"]
+            self.assertEqual(entry, [{"file": os.path.relpath(files[0], output),
+                                      "sha256": hashlib.sha256(b"# empty\n").hexdigest()}])
+            manifest.compact()
+            self.assertFalse(os.path.exists(os.path.join(output, MANIFEST_JOURNAL_FILE)))
+            self.assertEqual(Manifest(output)["http://example.com/met.xsd"], entry)
+
+    def test_prefix_index(self):
+        """Test longest prefix remapping."""
+        index = PrefixIndex({"http://www.xbrl.org/": "pkg1/www.xbrl.org/",
+                             "http://www.xbrl.org/2003/": "pkg2/2003/",
+                             "http://www.eba.europa.eu/eu/fr/xbrl/ext/model.xsd": "pkg3/model.xsd"})
+        self.assertEqual(index.remap("http://www.xbrl.org/2003/xl-2003-12-31.xsd"),
+                         "pkg2/2003/xl-2003-12-31.xsd")
+        self.assertEqual(index.remap("http://www.xbrl.org/dtr/type/numeric.xsd"),
+                         "pkg1/www.xbrl.org/dtr/type/numeric.xsd")
+        self.assertEqual(index.remap("http://www.eba.europa.eu/eu/fr/xbrl/ext/model.xsd"),
+                         "pkg3/model.xsd")
+        self.assertNotIn("http://www.eba.europa.eu/eu/fr/xbrl/ext/", index)
+        self.assertEqual(index.remap("http://example.com/a.xsd"), "http://example.com/a.xsd")
+
+    def test_package_refresh(self):
+        """Test package indices that stay the same when zip files come, go and change."""
+        with tempfile.TemporaryDirectory() as path:
+            writePackage(os.path.join(path, "b.zip"), "B")
+            writePackage(os.path.join(path, "a.zip"), "A")
+            manager = Taxonomies(path)
+            self.assertTrue(manager.refresh(path))
+            manager.save()
+            self.assertEqual([package['name'] for package in manager.config['packages']], ["A", "B"])
+            # a new zip is appended, a missing one keeps its index
+            writePackage(os.path.join(path, "0.zip"), "C")
+            os.remove(os.path.join(path, "a.zip"))
+            manager = Taxonomies(path)
+            with mock.patch.object(PackageManager, "packageInfo", wraps=PackageManager.packageInfo) as reads:
+                self.assertTrue(manager.refresh(path))
+            self.assertEqual([call.args[0] for call in reads.call_args_list], [os.path.join(path, "0.zip")])
+            packages = manager.config['packages']
+            self.assertEqual([package['name'] for package in packages], ["A", "B", "C"])
+            self.assertEqual([package['status'] for package in packages], ["unavailable", "enabled", "enabled"])
+            manager.save()
+            # only the changed zip is read again, in its place
+            writePackage(os.path.join(path, "b.zip"), "B2")
+            stat = os.stat(os.path.join(path, "b.zip"))
+            os.utime(os.path.join(path, "b.zip"), (stat.st_atime, stat.st_mtime + 10))
+            writePackage(os.path.join(path, "a.zip"), "A")
+            manager = Taxonomies(path)
+            with mock.patch.object(PackageManager, "packageInfo", wraps=PackageManager.packageInfo) as reads:
+                self.assertTrue(manager.refresh(path))
+                self.assertFalse(manager.refresh(path))
+            self.assertEqual(sorted(call.args[0] for call in reads.call_args_list),
+                             [os.path.join(path, "a.zip"), os.path.join(path, "b.zip")])
+            packages = manager.config['packages']
+            self.assertEqual([package['name'] for package in packages], ["A", "B2", "C"])
+            self.assertEqual([package['status'] for package in packages], ["enabled"] * 3)
+
+    def test_taxonomy_cache(self):
+        """Test instances converted with a compiled taxonomy from the cache."""
+        taxo = ppspPackage()
+        with tempfile.TemporaryDirectory() as output:
+            os.mkdir(os.path.join(output, "data"))
+            os.mkdir(os.path.join(output, "taxonomies"))
+            completed = CompletionIndex(output)
+            urls = [writeInstance(os.path.join(output, "ppsp"+str(number)+".xbrl"), number)
+                    for number in (1, 2)]
+            for url in urls:
+                self.assertEqual(xbrl2rdf.go(taxo, 1, url, output, completed,
+                                             cache_dir=os.path.join(output, "cache")), 0)
+            self.assertEqual(len(os.listdir(os.path.join(output, "cache"))), 1)
+            for url in urls:
+                facts = [subject for subject in instanceGraph(output, url).subjects()
+                         if isinstance(subject, URIRef) and ".xbrl#" in subject]
+                self.assertTrue(facts)
+                # the subjects of the second instance use its own base
+                base = os.path.basename(url) + "#"
+                self.assertEqual([fact for fact in facts if base not in fact], [])
+            # a completed instance returns before the package or caches are opened
+            self.assertEqual(xbrl2rdf.go(len(xbrl2rdf.manager.config['packages']), 1, urls[0], output,
+                                         completed, cache_dir=os.path.join(output, "cache")), 0)
+            # n-triples output doesn't use the turtle cache
+            url = writeInstance(os.path.join(output, "ppsp3.xbrl"), 3)
+            self.assertEqual(xbrl2rdf.go(taxo, 3, url, output, completed,
+                                         cache_dir=os.path.join(output, "nt-cache")), 0)
+            self.assertFalse(os.path.exists(os.path.join(output, "nt-cache")))
+
+    def test_batch(self):
+        """Test converting instances with a pool of worker processes."""
+        taxo = ppspPackage()
+        with tempfile.TemporaryDirectory() as output:
+            os.mkdir(os.path.join(output, "data"))
+            os.mkdir(os.path.join(output, "taxonomies"))
+            completed = CompletionIndex(output)
+            urls = [writeInstance(os.path.join(output, "ppsp"+str(number)+".xbrl"), number)
+                    for number in range(4)]
+            self.assertEqual(xbrl2rdf.batch(taxo, 1, urls, output, completed, workers=2, dedup=True), 0)
+            self.assertEqual([url for url in urls if url not in completed], [])
+            self.assertEqual([url for url in urls if url not in Manifest(output)], [])
+            leftovers = [name for path, dirs, names in os.walk(output) for name in names
+                         if name.endswith(".part") or name.endswith(".tmp")]
+            self.assertEqual(leftovers, [])
+            self.assertTrue(all(len(instanceGraph(output, url)) > 0 for url in urls))
+            # the instances share one entry point, its DTS is translated before the pool starts
+            self.assertEqual(set(entryPoints(url) for url in urls), {(PPSP_SCHEMA,)})
+            self.assertIn(PPSP_SCHEMA, completed)
+
+    def test_batch_failure(self):
+        """Test instances that fail, in the parent and in a worker, are not completed."""
+        taxo = ppspPackage()
+        with tempfile.TemporaryDirectory() as output:
+            os.mkdir(os.path.join(output, "data"))
+            os.mkdir(os.path.join(output, "taxonomies"))
+            bad = list()
+            for number in range(2):
+                bad.append(os.path.join(output, "bad"+str(number)+".xbrl"))
+                with open(bad[-1], 'w', encoding='utf-8') as outfile:
+                    outfile.write(INSTANCE_HEADER + '<xbrli:context id="c0">')
+            good = [writeInstance(os.path.join(output, "ppsp"+str(number)+".xbrl"), number)
+                    for number in range(3)]
+            completed = CompletionIndex(output)
+            self.assertEqual(xbrl2rdf.batch(taxo, 1, bad + good, output, completed, workers=2, dedup=True), -1)
+            for index in (completed, CompletionIndex(output)):
+                self.assertEqual([url for url in bad if url in index], [])
+                self.assertEqual([url for url in good if url not in index], [])
+            self.assertEqual([url for url in bad if url in Manifest(output)], [])
+            leftovers = [name for path, dirs, names in os.walk(output) for name in names
+                         if name.endswith(".part") or name.endswith(".tmp")]
+            self.assertEqual(leftovers, [])
+
+    def test_dedup(self):
+        """Test contexts written once for all instances, and per instance when streamed."""
+        taxo = ppspPackage()
+        XBRLI = "http://www.xbrl.org/2003/instance#"
+        RDF_TYPE = URIRef("http://www.w3.org/1999/02/22-rdf-syntax-ns#type")
+        with tempfile.TemporaryDirectory() as output:
+            os.mkdir(os.path.join(output, "data"))
+            os.mkdir(os.path.join(output, "taxonomies"))
+            completed = CompletionIndex(output)
+            urls = [writeInstance(os.path.join(output, "ppsp1.xbrl"), 1),
+                    writeInstance(os.path.join(output, "ppsp2.xbrl"), 2),
+                    writeInstance(os.path.join(output, "ppsp3.xbrl"), 3, contexts_first=False)]
+            for url, stream_size in zip(urls, (None, None, 1)):
+                xbrl2rdf.go(taxo, 1, url, output, completed, dedup=True, stream_size=stream_size)
+            graphs = [instanceGraph(output, url) for url in urls]
+            contexts = [set(graph.subjects(RDF_TYPE, URIRef(XBRLI + "context"))) for graph in graphs]
+            used = [set(graph.objects(None, URIRef(XBRLI + "context"))) for graph in graphs]
+            # c0 and c2 are equal, the second instance refers to the contexts of the first
+            self.assertEqual(len(contexts[0]), 2)
+            self.assertEqual(contexts[1], set())
+            self.assertEqual(used[1], contexts[0])
+            # a streamed instance writes its own contexts, its facts may come first
+            self.assertEqual(len(contexts[2]), 3)
+            self.assertEqual(used[2], contexts[2])
+            # the hashed names are kept apart from the completed uris
+            self.assertFalse([uri for uri in CompletionIndex(output) if uri.startswith("xbrl2rdf:")])
+            with open(os.path.join(output, EMITTED_JOURNAL_FILE)) as journal:
+                self.assertEqual(len(journal.read().split()), 3)
+
+    def test_instance_stream(self):
+        """Test an instance parsed incrementally against the parsed tree."""
+        taxo = ppspPackage()
+        graphs = list()
+        with tempfile.TemporaryDirectory() as directory:
+            for stream_size in (None, 1):
+                output = os.path.join(directory, str(stream_size))
+                os.mkdir(output)
+                os.mkdir(os.path.join(output, "data"))
+                os.mkdir(os.path.join(output, "taxonomies"))
+                url = writeInstance(os.path.join(output, "ppsp.xbrl"), 1, facts=4, contexts_first=False)
+                with self.assertLogs(level="INFO") as logs:
+                    self.assertEqual(xbrl2rdf.go(taxo, 1, url, output, CompletionIndex(output),
+                                                 stream_size=stream_size), 0)
+                self.assertEqual(any("Streaming instance" in line for line in logs.output), stream_size is not None)
+                graph = instanceGraph(output, url, "http://example.com/")
+                # the provenance refers to the instance in its own directory
+                href = (None, URIRef("http://www.w3.org/1999/xlink#href"), RDFLiteral(url))
+                self.assertEqual(len(list(graph.triples(href))), 1)
+                graph.remove(href)
+                graphs.append(graph)
+        self.assertEqual(len(set(graphs[0].subjects(URIRef("http://www.w3.org/1999/02/22-rdf-syntax-ns#type"),
+                                                    URIRef("http://www.xbrl.org/2003/instance#context")))), 4)
+        self.assertTrue(isomorphic(graphs[0], graphs[1]))
+
+    def test_href_cache(self):
+        """Test expansion of locator hrefs with a bounded LRU."""
+        cache = HrefCache(size=2)
+        base = "http://example.com/tab/t1-lab.xml"
+        self.assertEqual(cache.expand("../met.xsd#m1", base), "http://example.com/met.xsd#m1")
+        self.assertEqual(cache.expand("#l1", base), base+"#l1")
+        self.assertEqual(cache.expand("../met.xsd#m1", base), "http://example.com/met.xsd#m1")
+        # the least recently used pair is dropped
+        cache.expand("t1.xsd", base)
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn(("#l1", base), cache.entries)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+    def test_graph_sink(self):
+        """Test triples emitted to an rdflib Graph."""
+        graph = Graph()
+        sink = GraphSink(graph)
+        sink.namespaces = {"http://www.xbrl.org/2003/instance": "xbrli",
+                           "http://example.com/ns#": "ex"}
+        output = sink.open("instance", "/data/instance")
+        output.startSubject("ex:context_1")
+        output.triple("xbrli:scheme", "<http://example.com/scheme>")
+        output.startBlank("xbrli:entity")
+        output.triple("xbrli:identifier", Literal('say "1234"'))
+        output.endBlank()
+        output.endSubject()
+        context = URIRef("http://example.com/ns#context_1")
+        entity = BNode("instanceb1")
+        self.assertEqual(set(graph), {
+            (context, URIRef("http://www.xbrl.org/2003/instance#scheme"), URIRef("http://example.com/scheme")),
+            (context, URIRef("http://www.xbrl.org/2003/instance#entity"), entity),
+            (entity, URIRef("http://www.xbrl.org/2003/instance#identifier"), RDFLiteral('say "1234"'))})
+
+    def test_abstract_emitter(self):
+        """Test that an emitter without all methods can't be instantiated."""
+        class Partial(TurtleWriter):
+            pass
+        with self.assertRaises(TypeError):
+            Partial()
+        self.assertEqual(StringWriter().lines, [])
+
+    def test_nquads_sink(self):
+        """Test line-oriented output with the provenance as graph name."""
+        with tempfile.TemporaryDirectory() as output:
+            sink = NQuadsSink(output)
+            sink.namespaces = {"http://example.com/ns": "ex"}
+            data = sink.open("instance", "/data")
+            data.setGraph("ex:provenance1")
+            data.startSubject("ex:fact1")
+            data.startBlank("ex:period")
+            data.triple("ex:instant", Literal("2020-12-31"))
+            data.endBlank()
+            data.endSubject()
+            with open(data.close("@prefix ex: <http://example.com/ns#>.\n")[0]) as infile:
+                lines = infile.read().splitlines()
+        scope = "_:instance_" + hashlib.sha1(b"/data").hexdigest()[:8]
+        self.assertEqual(lines, [
+            "<http://example.com/ns#fact1> <http://example.com/ns#period> " +
+            scope + "b1 <http://example.com/ns#provenance1> .",
+            scope + 'b1 <http://example.com/ns#instant> "2020-12-31" <http://example.com/ns#provenance1> .'])
+
+    def test_sharded_output(self):
+        """Test splitting output files at subject boundaries."""
+        with tempfile.TemporaryDirectory() as output:
+            data = OutputSink(output, shard_triples=2).open("dts1", "/dts")
+            for number in range(5):
+                data.startSubject("ex:concept"+str(number))
+                data.triple("rdf:type", "ex:item")
+                data.triple("ex:order", Literal(str(number)))
+                data.endSubject()
+            shards = data.close("@prefix ex: <http://example.com/ns#>.\n"
+                                "@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>.\n")
+            self.assertEqual(len(shards), 5)
+            self.assertTrue(shards[1].endswith("_1.ttl"))
+            for number, shard in enumerate(shards):
+                graph = Graph().parse(shard, format="turtle")
+                self.assertEqual(len(graph), 2)
+                self.assertIn(RDFLiteral(str(number)), set(graph.objects()))
+            # written again in fewer shards, the shards of the first run are removed
+            data = OutputSink(output, shard_triples=4).open("dts1", "/dts")
+            for number in range(5):
+                data.startSubject("ex:concept"+str(number))
+                data.triple("rdf:type", "ex:item")
+                data.triple("ex:order", Literal(str(number)))
+                data.endSubject()
+            self.assertEqual(data.close(""), shards[:3])
+            self.assertEqual(sorted(os.listdir(output)), sorted(os.path.basename(shard) for shard in shards[:3]))
+            # the same document opened twice gets a second name
+            sink = OutputSink(output)
+            names = [sink.open("dts" + str(number), "/dts").filename for number in range(3)]
+            self.assertEqual(names, [shards[0], shards[0][:-4] + "-1.ttl", shards[0][:-4] + "-2.ttl"])
+            self.assertEqual(sink.used, set(names))
+
+    def test_compressed_output(self):
+        """Test gzip and zstd shards that read as the uncompressed ones."""
+        header = ("@prefix ex: <http://example.com/ns#>.\n"
+                  "@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>.\n")
+        graphs = dict()
+        bodies = dict()
+        compressions = [(False, open), ("gzip", gzip.open)]
+        if zstandard is not None:
+            compressions.append(("zstd", zstandard.open))
+        for compress, opener in compressions:
+            with tempfile.TemporaryDirectory() as output:
+                for sink in (OutputSink(output, compress, shard_triples=4),
+                             NTriplesSink(output, compress, shard_triples=4)):
+                    sink.namespaces = {"http://example.com/ns": "ex",
+                                       "http://www.w3.org/1999/02/22-rdf-syntax-ns#": "rdf"}
+                    data = sink.open("dts1", "/dts")
+                    for number in range(5):
+                        data.startSubject("ex:concept"+str(number))
+                        data.triple("rdf:type", "ex:item")
+                        data.startBlank("ex:label")
+                        data.triple("ex:text", Literal("label "+str(number), lang="en"))
+                        data.endBlank()
+                        data.endSubject()
+                    data.dump(os.path.join(output, "body"))
+                    with open(os.path.join(output, "body"), encoding="utf-8") as infile:
+                        bodies[compress, sink.extension] = infile.read()
+                    shards = data.close(header)
+                    self.assertEqual(len(shards), 3)
+                    graph = Graph()
+                    for shard in shards:
+                        self.assertTrue(shard.endswith(sink.extension + EXTENSIONS.get(compress, "")))
+                        with opener(shard, "rt", encoding="utf-8") as infile:
+                            graph.parse(data=infile.read(), format="turtle" if sink.extension == ".ttl" else "nt")
+                    self.assertEqual(len(graph), 15)
+                    graphs[compress, sink.extension] = graph
+        for (compress, extension), graph in graphs.items():
+            self.assertEqual(bodies[compress, extension], bodies[False, extension])
+            self.assertTrue(isomorphic(graph, graphs[False, extension]))
+        self.assertTrue(isomorphic(graphs[False, ".ttl"], graphs[False, ".nt"]))
+
+    def test_restored_shards(self):
+        """Test turtle restored from the taxonomy cache split as when it was written."""
+        def emit(data):
+            for number in range(6):
+                data.startSubject("ex:concept"+str(number))
+                data.triple("rdf:type", "ex:item")
+                data.startBlank("ex:label")
+                # a subject end and a blank line inside a long literal
+                data.triple("ex:text", Literal("lébel "+str(number)+"\n    .\n\n", lang="fr", long=True))
+                data.endBlank()
+                data.collection("ex:members", ["ex:m1", "ex:m2"])
+                data.endSubject()
+        header = ("@prefix ex: <http://example.com/ns#>.\n"
+                  "@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>.\n")
+        with tempfile.TemporaryDirectory() as output:
+            data = OutputSink(output).open("dts1", "/dts")
+            emit(data)
+            cached = os.path.join(output, "cached")
+            data.dump(cached)
+            data.discard()
+            # 8 triples per subject, the size of a subject is above 100 bytes
+            for shards in ({"shard_triples": 16}, {"shard_size": 100}, {"shard_size": 250}):
+                contents = []
+                for restore in (False, True):
+                    directory = os.path.join(output, str(len(os.listdir(output))))
+                    os.mkdir(directory)
+                    data = OutputSink(directory, **shards).open("dts1", "/dts")
+                    if restore:
+                        data.load(cached)
+                    else:
+                        emit(data)
+                    files = data.close(header)
+                    contents.append([open(shard, encoding="utf-8").read() for shard in files])
+                self.assertGreater(len(contents[0]), 1)
+                self.assertEqual(contents[1], contents[0])
+                graph = Graph()
+                for content in contents[1]:
+                    graph.parse(data=content, format="turtle")
+                self.assertEqual(len(graph), 6 * 8)
+
+    def test_shared_output_file(self):
+        """Test two writers of the same output file, as in batch workers."""
+        with tempfile.TemporaryDirectory() as output:
+            first = OutputSink(output).open("dts1", "/met", "http://example.com/met.xsd")
+            second = OutputSink(output).open("dts1", "/met", "http://example.com/met.xsd")
+            first.write("# first\n")
+            second.write("# second\n")
+            self.assertEqual(second.close(""), first.close(""))
+            with open(first.filename) as infile:
+                self.assertEqual(infile.read(), "# first\n")
+            self.assertEqual(os.listdir(output), [os.path.basename(first.filename)])
+
+    def test_attribute_emitters(self):
+        """Test the turtle of the compiled arc and resource attributes."""
+        params = ConversionContext()
+        params.namespaces["http://www.xbrl.org/2003/role"] = "role"
+        arc = {XBRLDT_CONTEXTELEMENT: "segment", XBRLDT_TARGETROLE: "http://www.xbrl.org/2003/role/link",
+               XBRLDT_CLOSED: "true", XBRLDT_USABLE: "false", COMPLEMENT: "false", NAME: "v",
+               PREFERRED_LABEL: "http://www.xbrl.org/2003/role/terseLabel", USE: "optional",
+               PRIORITY: "1", ORDER: "2.0", WEIGHT: "-1", COVER: "", AXIS: "descendant"}
+        resource = parseXML(
+            b'<variable:factVariable xmlns:variable="http://xbrl.org/2008/variable" '
+            b'xmlns:xlink="http://www.w3.org/1999/xlink" xlink:type="resource" xlink:label="v" '
+            b'xlink:role="http://example.com/role/variable" xml:lang="en" bindAsSequence="false" '
+            b'fallbackValue="0" matches="true" nils="false" select="concat(\'a\', \'b\')" '
+            b'dimension="eba_dim:BAS" test="$a ge 0"/>')
+        for node, expected, emitter in ((arc, ARC_TURTLE, ARC_ATTRIBUTES),
+                                        (resource, RESOURCE_TURTLE, RESOURCE_ATTRIBUTES)):
+            # the same triples from the element and from its attributes
+            for attributes in (node, getattr(node, "attrib", node)):
+                output = StringWriter()
+                emitter.emit(attributes, params, output)
+                self.assertEqual(output.lines, expected)
+            graph = Graph().parse(data=TURTLE_PREFIXES + "<http://example.com/s>\n" + "".join(expected) + ".\n",
+                                  format="turtle")
+            self.assertEqual(len(graph), len(expected))
+
+    def test_context_key(self):
+        """Test hashed context names independent of prefixes and member order."""
+        template = ('<xbrli:context xmlns:xbrli="http://www.xbrl.org/2003/instance" '
+                    'xmlns:xbrldi="http://xbrl.org/2006/xbrldi" xmlns:{0}="http://example.com/dim" id="{1}">'
+                    '<xbrli:entity><xbrli:identifier scheme="http://example.com">LEI</xbrli:identifier></xbrli:entity>'
+                    '<xbrli:period><xbrli:instant>2020-12-31</xbrli:instant></xbrli:period><xbrli:scenario>{2}</xbrli:scenario>'
+                    '</xbrli:context>')
+        members = ['<xbrldi:explicitMember dimension="{0}:A">{0}:x</xbrldi:explicitMember>',
+                   '<xbrldi:explicitMember dimension="{0}:B">{0}:y</xbrldi:explicitMember>']
+        first = parseXML(template.format("d", "c1", "".join(members).format("d")))
+        second = parseXML(template.format("dim", "c2", "".join(reversed(members)).format("dim")))
+        other = parseXML(template.format("d", "c3", members[0].format("d")))
+        self.assertEqual(hashName("context", contextKey(first, None)),
+                         hashName("context", contextKey(second, None)))
+        self.assertNotEqual(contextKey(first, None), contextKey(other, None))
+
+    def test_decode_context(self):
+        """Test the dimensions of segment and scenario and the triples of a context."""
+        context = parseXML(
+            b'<xbrli:context xmlns:xbrli="http://www.xbrl.org/2003/instance" xmlns:xbrldi="http://xbrl.org/2006/xbrldi" '
+            b'xmlns:dim="http://example.com/dim" xmlns:typ="http://example.com/typ" id="c1">'
+            b'<xbrli:entity><xbrli:identifier scheme="http://example.com">LEI</xbrli:identifier>'
+            b'<xbrli:segment><xbrldi:explicitMember dimension="dim:A">dim:x</xbrldi:explicitMember>'
+            b'<xbrldi:typedMember dimension="dim:T"><typ:id>t1</typ:id></xbrldi:typedMember></xbrli:segment>'
+            b'</xbrli:entity><xbrli:period><xbrli:startDate>2020-01-01</xbrli:startDate>'
+            b'<xbrli:endDate>2020-12-31</xbrli:endDate></xbrli:period>'
+            b'<xbrli:scenario><xbrldi:typedMember dimension="dim:U"><typ:code>u1</typ:code></xbrldi:typedMember>'
+            b'<xbrldi:explicitMember dimension="dim:B">dim:y</xbrldi:explicitMember></xbrli:scenario>'
+            b'</xbrli:context>')
+        identifier, period, segment, scenario = decodeContext(context)
+        self.assertEqual((identifier.text, identifier.get("scheme")), ("LEI", "http://example.com"))
+        self.assertEqual([node.text for node in period], ["2020-01-01", "2020-12-31"])
+        self.assertEqual(segment, [("dim:A", None, "dim:x"), ("dim:T", "typ:id", "t1")])
+        self.assertEqual(scenario, [("dim:U", "typ:code", "u1"), ("dim:B", None, "dim:y")])
+        plain = parseXML(
+            b'<xbrli:context xmlns:xbrli="http://www.xbrl.org/2003/instance" id="c2"><xbrli:entity>'
+            b'<xbrli:identifier scheme="http://example.com">LEI</xbrli:identifier></xbrli:entity>'
+            b'<xbrli:period><xbrli:forever/></xbrli:period></xbrli:context>')
+        self.assertEqual(decodeContext(plain)[2:], ([], []))
+
+        graph = Graph()
+        params = ConversionContext()
+        for prefix, uri in (("rdf", "http://www.w3.org/1999/02/22-rdf-syntax-ns#"),
+                            ("xbrli", "http://www.xbrl.org/2003/instance"), ("xbrldt", "http://xbrl.org/2005/xbrldt"),
+                            ("xbrldi", "http://xbrl.org/2006/xbrldi"), ("oddb", "http://www.workiva.com/oddb"),
+                            ("dim", "http://example.com/dim"), ("typ", "http://example.com/typ"),
+                            ("instance", "http://example.com/instance")):
+            params.namespaces[uri] = prefix
+        sink = GraphSink(graph)
+        sink.namespaces = params.namespaces
+        params.pagedata["instance"] = sink.open("instance", "/data/instance")
+        processContext(context, params, "instance", "instance:provenance1")
+        expected = Graph().parse(format="turtle", data="""
+            @prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>.
+            @prefix xbrli: <http://www.xbrl.org/2003/instance#>.
+            @prefix xbrldt: <http://xbrl.org/2005/xbrldt#>.
+            @prefix xbrldi: <http://xbrl.org/2006/xbrldi#>.
+            @prefix oddb: <http://www.workiva.com/oddb#>.
+            @prefix dim: <http://example.com/dim#>.
+            @prefix typ: <http://example.com/typ#>.
+            @prefix instance: <http://example.com/instance#>.
+            instance:context_c1 rdf:type xbrli:context ;
+                oddb:provenance instance:provenance1 ;
+                xbrli:entity [
+                    xbrli:period [ xbrli:startDate "2020-01-01" ; xbrli:endDate "2020-12-31" ] ;
+                    xbrli:identifier "LEI" ;
+                    xbrli:scheme <http://example.com> ] ;
+                xbrli:segment [
+                    xbrldt:dimensionItem [ xbrldt:dimension dim:A ; xbrldi:explicitMember dim:x ] ;
+                    xbrldt:dimensionItem [ xbrldt:dimension dim:T ; xbrldt:dimension-domain typ:id ;
+                                           xbrldi:typedMember "t1" ] ] ;
+                xbrli:scenario [
+                    xbrldt:dimensionItem [ xbrldt:dimension dim:U ; xbrldt:dimension-domain typ:code ;
+                                           xbrldi:typedMember "u1" ] ;
+                    xbrldt:dimensionItem [ xbrldt:dimension dim:B ; xbrldi:explicitMember dim:y ] ] .
+            """)
+        self.assertTrue(isomorphic(graph, expected))
+
+    def test_linkbase_deferral(self):
+        """Test a linkbase that is translated after the schema it refers to."""
+        with tempfile.TemporaryDirectory() as directory:
+            linkbase = writeLinkbase(directory)
+            schema = os.path.join(directory, "s.xsd")
+            graph, params = dtsGraph([(XBRL_LINKBASE, linkbase)])
+            self.assertEqual(params.deferralCount, 1)
+            self.assertEqual(params.deferred, {})
+            # the linkbase is read once, its tree is kept while it waits
+            self.assertEqual(params.fileCount, 2)
+            self.assertIn(schema, params.dts_processed)
+            expected, expected_params = dtsGraph([(XBRL_SCHEMA, schema), (XBRL_LINKBASE, linkbase)])
+            self.assertEqual(expected_params.deferralCount, 0)
+        # the locators resolve to the elements of the schema
+        m1 = URIRef("http://example.com/s#m1")
+        self.assertIn(m1, set(graph.objects(None, URIRef("http://www.xbrl.org/2003/XLink#from"))))
+        self.assertEqual(len(graph), len(expected))
+        self.assertTrue(isomorphic(graph, expected))
+
+    def test_prefetch(self):
+        """Test dts files parsed ahead on the prefetch threads."""
+        with tempfile.TemporaryDirectory() as directory:
+            linkbase = writeLinkbase(directory)
+            schema = os.path.join(directory, "s.xsd")
+            for queue in ([(XBRL_SCHEMA, schema), (XBRL_LINKBASE, linkbase)], [(XBRL_LINKBASE, linkbase)]):
+                expected, expected_params = dtsGraph(queue)
+                prefetcher = DtsPrefetcher(2)
+                with mock.patch.object(DtsProcessor, "prefetchXML", wraps=DtsProcessor.prefetchXML) as spy:
+                    graph, params = dtsGraph(queue, prefetcher=prefetcher)
+                # every file is parsed once, on a prefetch thread
+                self.assertEqual(sorted(call.args[0] for call in spy.call_args_list), [linkbase, schema])
+                self.assertEqual(prefetcher.futures, {})
+                self.assertEqual(params.fileCount, expected_params.fileCount)
+                self.assertTrue(isomorphic(graph, expected))
+                prefetcher.close()
+                # the executor is shut down
+                with self.assertRaises(RuntimeError):
+                    prefetcher.executor.submit(len, "")
+
+            # a failed prefetch leaves the file to loadXML, which reports the error as before
+            missing = os.path.join(directory, "missing.xsd")
+            errors = []
+            for prefetcher in (None, DtsPrefetcher(2)):
+                with self.assertLogs(level="ERROR") as logs:
+                    graph, params = dtsGraph([(XBRL_SCHEMA, missing), (XBRL_SCHEMA, schema)], prefetcher=prefetcher)
+                errors.append((logs.output, params.errorCount, len(graph)))
+                if prefetcher is not None:
+                    prefetcher.close()
+            self.assertEqual(errors[1], errors[0])
+            self.assertEqual(errors[0][1], 1)
+            malformed = os.path.join(directory, "malformed.xsd")
+            with open(malformed, "w", encoding="utf-8") as outfile:
+                outfile.write("<xsd:schema")
+            for prefetcher in (None, DtsPrefetcher(2)):
+                with self.assertRaises(etree.XMLSyntaxError):
+                    dtsGraph([(XBRL_SCHEMA, malformed)], prefetcher=prefetcher)
+                if prefetcher is not None:
+                    prefetcher.close()
+
+    def test_linkbase_stream(self):
+        """Test linkbases of at least stream_size bytes parsed incrementally."""
+        with tempfile.TemporaryDirectory() as directory:
+            linkbase = writeLinkbase(directory)
+            schema = os.path.join(directory, "s.xsd")
+            size = os.path.getsize(linkbase)
+            for queue in ([(XBRL_SCHEMA, schema), (XBRL_LINKBASE, linkbase)], [(XBRL_LINKBASE, linkbase)]):
+                expected, params = dtsGraph(queue)
+                with self.assertLogs(level="INFO") as logs:
+                    graph, params = dtsGraph(queue, stream_size=size)
+                self.assertIn("INFO:root:checking linkbase " + linkbase + " (streaming)", logs.output)
+                self.assertEqual(params.deferred, {})
+                self.assertTrue(isomorphic(graph, expected))
+                with self.assertLogs(level="INFO") as logs:
+                    graph, params = dtsGraph(queue, stream_size=size + 1)
+                self.assertIn("INFO:root:checking linkbase " + linkbase, logs.output)
+                self.assertTrue(isomorphic(graph, expected))
+            # the first link is translated while streaming, the second waits
+            # for t.xsd, and the file is read again from there
+            other = os.path.join(directory, "t.xsd")
+            with open(other, 'w', encoding='utf-8') as outfile:
+                outfile.write(LINKBASE_SCHEMA.replace("s=\"http://example.com/s", "t=\"http://example.com/t")
+                              .replace("example.com/s", "example.com/t").replace("s_m", "t_m"))
+            with open(linkbase, 'w', encoding='utf-8') as outfile:
+                outfile.write(LINKBASE.replace('"s.xsd#s_m1" xlink:label="a"', '"t.xsd#t_m1" xlink:label="a"'))
+            expected, params = dtsGraph([(XBRL_SCHEMA, schema), (XBRL_LINKBASE, linkbase)])
+            self.assertEqual(params.deferralCount, 1)
+            with mock.patch.object(LinkbaseProcessor, "translateLink", wraps=LinkbaseProcessor.translateLink) as spy:
+                graph, params = dtsGraph([(XBRL_SCHEMA, schema), (XBRL_LINKBASE, linkbase)], stream_size=1)
+            self.assertEqual(params.deferralCount, 1)
+            self.assertEqual(params.deferred, {})
+            self.assertIn(other, params.dts_processed)
+            self.assertEqual(spy.call_count, 2)
+            self.assertIn(URIRef("http://example.com/t#m1"),
+                          set(graph.objects(None, URIRef("http://www.xbrl.org/2003/XLink#from"))))
+            self.assertTrue(isomorphic(graph, expected))
+
+    def test_arc_expansion(self):
+        """Test links of every pair of locators and resources with the labels of an arc."""
+        with tempfile.TemporaryDirectory() as directory:
+            linkbase = writeLinkbase(directory)
+            graph, params = dtsGraph([(XBRL_SCHEMA, os.path.join(directory, "s.xsd")),
+                                      (XBRL_LINKBASE, linkbase)])
+        xl = "http://www.xbrl.org/2003/XLink#"
+        concept_label = URIRef("http://www.xbrl.org/2003/arcrole#concept-label")
+        pairs = set()
+        for link in graph.objects(None, concept_label):
+            label = graph.value(graph.value(link, URIRef(xl + "to")),
+                                URIRef("http://www.w3.org/1999/02/22-rdf-syntax-ns#literal"))
+            pairs.add((graph.value(link, URIRef(xl + "from")), str(label)))
+        m1, m2 = URIRef("http://example.com/s#m1"), URIRef("http://example.com/s#m2")
+        self.assertEqual(pairs, {(m1, "Amount"), (m1, "Bedrag"), (m2, "Amount"), (m2, "Bedrag")})
+        parent_child = list(graph.subject_objects(URIRef("http://www.xbrl.org/2003/arcrole#parent-child")))
+        self.assertEqual(len(parent_child), 1)
+        self.assertEqual(graph.value(parent_child[0][1], URIRef(xl + "to")), m2)
+        # the arc to a missing label makes no links
+        self.assertEqual((params.linkCount, params.resourceCount), (5, 4))
+        # one prefix for the arcroles and one for the roles, declared once
+        self.assertEqual((params.arcroleNumber, params.roleNumber), (1, 1))
+
+    def test_extended_link(self):
+        """Test the triples of extended links read into Locator and Arc records."""
+        first = Locator("locator", "s.xsd#s_m1", "".join(["m", "1"]))
+        second = Locator("locator", "s.xsd#s_m2", "".join(["m", "1"]))
+        self.assertFalse(hasattr(first, "__dict__"))
+        self.assertIs(first.label, second.label)
+        arc = Arc({XLINK_ARCROLE: "http://www.xbrl.org/2003/arcrole/concept-label", XLINK_FROM: "m1", XLINK_TO: "l"})
+        self.assertEqual((arc.fromLabel, arc.toLabel, arc.fromloc, arc.toloc), ("m1", "l", (), ()))
+        self.assertFalse(hasattr(arc, "__dict__"))
+
+        base = "http://example.com/lab.xml"
+        graph = Graph()
+        params = ConversionContext()
+        for prefix, uri in (("rdf", "http://www.w3.org/1999/02/22-rdf-syntax-ns#"),
+                            ("xl", "http://www.xbrl.org/2003/XLink"), ("xlink", "http://www.w3.org/1999/xlink"),
+                            ("link", "http://www.xbrl.org/2003/linkbase"), ("role", "http://www.xbrl.org/2003/role"),
+                            ("arcrole", "http://www.xbrl.org/2003/arcrole"), ("s", "http://example.com/s"),
+                            ("dts1", base)):
+            params.namespaces[uri] = prefix
+        params.id2elementTbl = {"http://example.com/s.xsd#s_m1": ("http://example.com/s", "m1"),
+                                "http://example.com/s.xsd#s_m2": ("http://example.com/s", "m2")}
+        sink = GraphSink(graph)
+        sink.namespaces = params.namespaces
+        params.pagedata["dts1"] = sink.open("dts1", "/taxonomies/lab", base)
+        for link in parseXML(LINKBASE.encode()):
+            processExtendedLink(link, base, None, params, "dts1")
+        self.assertEqual((params.xlinkCount, params.locCount, params.resCount, params.arcCount), (2, 4, 2, 3))
+        links = "".join(
+            "dts1:link{0} arcrole:concept-label [ xl:type xl:link ; xl:role role:link ; "
+            "xl:from s:{1} ; xl:to dts1:resource{0} ] .\n".format(number, concept)
+            for number, concept in ((1, "m1"), (2, "m1"), (3, "m2"), (4, "m2")))
+        resources = "".join(
+            'dts1:resource{0} xl:type link:label ; xlink:role role:{1} ; rdf:lang "{2}" ; '
+            'rdf:literal "{3}"@{2} .\n'.format(number, role, lang, text)
+            for number, (role, lang, text) in enumerate([("label", "en", "Amount"), ("terseLabel", "nl", "Bedrag")] * 2, 1))
+        expected = Graph().parse(format="turtle", data="""
+            @prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>.
+            @prefix xl: <http://www.xbrl.org/2003/XLink#>.
+            @prefix xlink: <http://www.w3.org/1999/xlink#>.
+            @prefix link: <http://www.xbrl.org/2003/linkbase#>.
+            @prefix role: <http://www.xbrl.org/2003/role#>.
+            @prefix arcrole: <http://www.xbrl.org/2003/arcrole#>.
+            @prefix s: <http://example.com/s#>.
+            @prefix dts1: <http://example.com/lab.xml#>.
+            dts1:link5 arcrole:parent-child [ xl:type xl:link ; xl:role role:link ; xl:use "optional" ;
+                xl:priority "1" ; xl:order "2" ; xl:from s:m1 ; xl:to s:m2 ] .
+            """ + links + resources)
+        self.assertTrue(isomorphic(graph, expected), graph.serialize(format="turtle"))
+
+    def test_tag_dispatch(self):
+        """Test handlers found by Clark tag, by localname and the default."""
+        root = parseXML(b'<a:root xmlns:a="http://example.com/a" xmlns:b="http://example.com/b">'
+                        b'<a:context/><b:context/><a:unit/><b:unit/><fact/><a:fact/></a:root>')
+        for node in root.iter():
+            qname = etree.QName(node)
+            self.assertEqual(splitTag(node.tag), (qname.namespace, qname.localname))
+        dispatch = TagDispatch({"context": "context", "{http://example.com/b}unit": "b-unit", "fact": "fact"},
+                               "default")
+        expected = ["context", "context", "default", "b-unit", "fact", "fact"]
+        # the second pass gets the handlers kept per tag
+        for repeat in range(2):
+            self.assertEqual([dispatch[node] for node in root], expected)
+        self.assertEqual(len(dispatch.tags), 6)
+        # tags without a handler are kept too
+        dispatch = TagDispatch({"{http://example.com/a}context": "context"})
+        self.assertEqual([dispatch[node] for node in root], ["context", None, None, None, None, None])
+        self.assertEqual(len(dispatch.tags), 6)
+
+    def test_web_cache(self):
+        """Test caching, revalidation and offline mode of the web cache."""
+        with tempfile.TemporaryDirectory() as path:
+            os.mkdir(os.path.join(path, "www"))
+            with open(os.path.join(path, "www", "schema.xsd"), "wb") as outfile:
+                outfile.write(b"<schema/>")
+            server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                         partial(CountingHandler, directory=os.path.join(path, "www")))
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                url = "http://127.0.0.1:" + str(server.server_port) + "/schema.xsd"
+                CountingHandler.requests.clear()
+                cache = WebCache(os.path.join(path, "cache"))
+                self.assertEqual(cache.get(url), b"<schema/>")
+                self.assertEqual(cache.get(url), b"<schema/>")
+                # a new cache on the same directory, as in a later run
+                self.assertEqual(WebCache(os.path.join(path, "cache")).get(url), b"<schema/>")
+                self.assertEqual(len(CountingHandler.requests), 1)
+                revalidating = WebCache(os.path.join(path, "cache"), revalidate=True)
+                self.assertEqual(revalidating.get(url), b"<schema/>")
+                self.assertEqual(revalidating.hits, 1)
+                self.assertIsNotNone(CountingHandler.requests[-1][1])
+                revalidating.close()
+                cache.close()
+                offline = WebCache(os.path.join(path, "cache"), offline=True)
+                self.assertEqual(offline.get(url), b"<schema/>")
+                with self.assertRaises(OfflineError):
+                    offline.get(url + ".missing")
+            finally:
+                server.shutdown()
+                server.server_close()
+
     def test_command_line_interface(self):
         """Test the CLI."""
         # runner = CliRunner()
@@ -0,0 +1,107 @@
+import os
+import json
+from os.path import join, isfile
+
+PRELOADS_FILE: str = 'preloads.json'
+JOURNAL_FILE: str = 'preloads.journal'
+# hashed names of the contexts and units in the output, see go(dedup=True)
+EMITTED_FILE: str = 'emitted.json'
+EMITTED_JOURNAL_FILE: str = 'emitted.journal'
+
+
+class CompletionIndex:
+
+    ''' Set of uris that have been converted
+
+    The index is persisted in the output directory as preloads.json, the
+    list of uris at the last compaction, plus preloads.journal, to which
+    every checkpoint appends the uris completed since the previous one,
+    one per line. Once the journal holds compact_every lines it is folded
+    into preloads.json.
+
+    Without a path the index only lives in memory. preloads_file and
+    journal_file name the files of another index in the same directory.
+    '''
+
+    def __init__(self, path: str = None, uris=(), compact_every: int = 10000,
+                 preloads_file: str = PRELOADS_FILE, journal_file: str = JOURNAL_FILE):
+        self.path = path
+        self.preloads_file = preloads_file
+        self.journal_file = journal_file
+        self.compact_every = compact_every
+        self.uris = set(uris)
+        self.pending = list()     # uris added since the last checkpoint
+        self.journal_length = 0
+        if self.path is not None:
+            self.load()
+
+    def load(self) -> None:
+        preloads_file = join(self.path, self.preloads_file)
+        if isfile(preloads_file):
+            with open(preloads_file, 'r', encoding='utf-8') as infile:
+                self.uris.update(json.load(infile))
+        journal_file = join(self.path, self.journal_file)
+        if isfile(journal_file):
+            with open(journal_file, 'r', encoding='utf-8') as infile:
+                for line in infile:
+                    # a line without newline is an interrupted write
+                    if line.endswith('\n'):
+                        self.uris.add(line[:-1])
+                        self.journal_length += 1
+
+    def __contains__(self, uri) -> bool:
+        return uri in self.uris
+
+    def __len__(self) -> int:
+        return len(self.uris)
+
+    def __iter__(self):
+        return iter(self.uris)
+
+    def add(self, uri) -> None:
+        if uri not in self.uris:
+            self.uris.add(uri)
+            self.pending.append(uri)
+
+    def update(self, uris) -> None:
+        for uri in uris:
+            self.add(uri)
+
+    def rollback(self, mark: int) -> list:
+        # forget the uris added since len(self.pending) was mark, e.g. by a
+        # conversion that failed, before they are drained or checkpointed
+        removed = self.pending[mark:]
+        del self.pending[mark:]
+        self.uris.difference_update(removed)
+        return removed
+
+    def drain(self) -> list:
+        # hand over the uris added since the last checkpoint without writing them
+        pending = self.pending
+        self.pending = list()
+        return pending
+
+    def checkpoint(self) -> None:
+        pending = self.drain()
+        if self.path is None or not pending:
+            return None
+        with open(join(self.path, self.journal_file), 'a', encoding='utf-8') as outfile:
+            outfile.write(''.join(uri+'\n' for uri in pending))
+        self.journal_length += len(pending)
+        if self.journal_length >= self.compact_every:
+            self.compact()
+        return None
+
+    def compact(self) -> None:
+        if self.path is None:
+            return None
+        # the journal is only removed after the new preloads.json is in place
+        preloads_file = join(self.path, self.preloads_file)
+        with open(preloads_file + '.tmp', 'w', encoding='utf-8') as outfile:
+            json.dump(sorted(self.uris), outfile, indent=4)
+        os.replace(preloads_file + '.tmp', preloads_file)
+        journal_file = join(self.path, self.journal_file)
+        if isfile(journal_file):
+            os.remove(journal_file)
+        self.journal_length = 0
+        return None
@@ -0,0 +1,159 @@
+from io import StringIO
+from typing import TYPE_CHECKING
+
+from .utilfunctions import HrefCache
+
+if TYPE_CHECKING:
+    from .FileSource import FileSource
+    from .DtsProcessor import DtsQueue, DtsPrefetcher
+    from .TaxonomyCache import TaxonomyCache
+    from .OutputSink import OutputSink
+    from .WebCache import WebCache
+    from .CompletionIndex import CompletionIndex
+
+
+class ConversionContext:
+
+    ''' State of the conversion of one instance and its DTS
+
+    This is the params object every handler receives. All fields are
+    slots, so the handlers use plain attribute access and a misspelled
+    field raises AttributeError instead of creating a new key. go() makes
+    a context per instance, so conversions in one process don't share
+    state.
+    '''
+
+    __slots__ = ('out', 'facts', 'prefix',
+                 'xbrl_zipfile', 'uri2file',
+                 'package_name', 'package_uri', 'package_date',
+                 'output_format', 'stream_size',
+                 'namespaces', 'namespaces_to_skip',
+                 'dts_queue', 'dts_processed', 'id2elementTbl', 'href_cache',
+                 'factCount', 'conceptCount', 'xlinkCount', 'arcCount',
+                 'locCount', 'resCount', 'linkCount', 'fileCount',
+                 'errorCount', 'provenanceNumber', 'arcroleNumber',
+                 'roleNumber', 'resourceCount', 'dtsCount', 'deferralCount',
+                 'urlfilename', 'pagedata', 'sources', 'headers',
+                 'taxonomy_cache', 'web_cache', 'output_sink', 'prefetcher',
+                 'emitted', 'context_names', 'unit_names', 'deferred')
+
+    out: StringIO
+    facts: StringIO
+    # the prefix header, set when the output is written
+    prefix: str
+
+    xbrl_zipfile: 'FileSource'
+    # absolute path in the taxonomy package -> file in the package
+    uri2file: dict
+
+    package_name: str
+    package_uri: str
+    package_date: str
+    output_format: int
+    # local instances and dts linkbases of at least stream_size bytes are parsed incrementally, None disables
+    stream_size: int
+
+    # uri -> prefix
+    namespaces: dict
+    # schemas not to include
+    namespaces_to_skip: list
+    dts_queue: 'DtsQueue'
+    dts_processed: set
+    # uri#id -> (namespace, name)
+    id2elementTbl: dict
+    # (href, base) -> expanded href of the locators of all linkbases
+    href_cache: HrefCache
+
+    factCount: int
+    conceptCount: int
+    xlinkCount: int
+    arcCount: int
+    locCount: int
+    resCount: int
+    linkCount: int
+    fileCount: int
+    errorCount: int
+    provenanceNumber: int
+    arcroleNumber: int
+    roleNumber: int
+    resourceCount: int
+    dtsCount: int
+    # linkbases put back in the queue until their schemas are loaded
+    deferralCount: int
+
+    # namespace -> (safe) url for filename
+    urlfilename: dict
+    # namespace -> file the turtle of the document is written to
+    pagedata: dict
+    # namespace -> source href
+    sources: dict
+    # namespace -> prefix header, for output restored from the taxonomy cache
+    headers: dict
+
+    # compiled taxonomies, see TaxonomyCache
+    taxonomy_cache: 'TaxonomyCache'
+    # documents downloaded because they are not in the taxonomy package, see WebCache
+    web_cache: 'WebCache'
+    output_sink: 'OutputSink'
+    # threads that parse dts files ahead of the queue, see DtsPrefetcher
+    prefetcher: 'DtsPrefetcher'
+
+    # hashed contexts and units already in the output, None to write them per instance
+    emitted: 'CompletionIndex'
+    # context id -> name, unit id -> name, for hashed contexts and units
+    context_names: dict
+    unit_names: dict
+    # uri -> (root, or StreamSource if streamed, ns, handlerPrefix, links done) of linkbases waiting for their schemas
+    deferred: dict
+
+    def __init__(self):
+        self.out = StringIO()
+        self.facts = StringIO()
+        self.prefix = ''
+
+        self.xbrl_zipfile = None
+        self.uri2file = dict()
+
+        self.package_name = ''
+        self.package_uri = ''
+        self.package_date = ''
+        self.output_format = 1
+        self.stream_size = None
+
+        self.namespaces = dict()
+        self.namespaces_to_skip = list()
+        self.dts_queue = None
+        self.dts_processed = set()
+        self.id2elementTbl = dict()
+        self.href_cache = HrefCache()
+
+        self.factCount = 0
+        self.conceptCount = 0
+        self.xlinkCount = 0
+        self.arcCount = 0
+        self.locCount = 0
+        self.resCount = 0
+        self.linkCount = 0
+        self.fileCount = 0
+        self.errorCount = 0
+        self.provenanceNumber = 0
+        self.arcroleNumber = 0
+        self.roleNumber = 0
+        self.resourceCount = 0
+        self.dtsCount = 0
+        self.deferralCount = 0
+
+        self.urlfilename = dict()
+        self.pagedata = dict()
+        self.sources = dict()
+        self.headers = dict()
+
+        self.taxonomy_cache = None
+        self.web_cache = None
+        self.output_sink = None
+        self.prefetcher = None
+
+        self.emitted = None
+        self.context_names = dict()
+        self.unit_names = dict()
+        self.deferred = dict()
@@ -1,50 +1,180 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count, islice
 from lxml import etree
-from .utilfunctions import loadXML
+import logging
+from .ConversionContext import ConversionContext
+from .utilfunctions import loadXML, prefetchXML, localName, parseXML, StreamSource
 from .SchemaProcessor import processSchema
-from .LinkbaseProcessor import processLinkBase
+from .LinkbaseProcessor import processLinkBase, processLinkBaseStream, resumeLinkBase
 
 #this is the handler for dts
 def processDtsFile(root, base, ns, params, handlerPrefix):
-    if etree.QName(root).localname == "schema":
+    if isinstance(root, StreamSource):
+        # at least stream_size bytes, see loadXML: linkbases are parsed
+        # incrementally, schemas as usual
+        with root.open() as fp:
+            event, node = next(etree.iterparse(fp, events=("start",)))
+            name = localName(node)
+        if name == "linkbase":
+            return processLinkBaseStream(root, base, ns, params, handlerPrefix)
+        root = parseXML(root.read())
+    root_name = localName(root)
+    if root_name == "schema":
         res = processSchema(root, base, params, handlerPrefix)
-    elif etree.QName(root).localname == "linkbase":
+    elif root_name == "linkbase":
         res = processLinkBase(root, base, ns, params, handlerPrefix)
     return res
 
 
+class DtsQueue:
+
+    ''' Work queue of dts files
+
+    An entry is a (uri_type, uri, ns) tuple and the queue holds at most one
+    entry per uri: queueing a uri again moves it to the front (prepend) or
+    the back (append). Moved entries are not searched for and removed, the
+    old position stays in the deque and is skipped when it is popped, so
+    every operation is O(1).
+
+    processed is the set of uris that have been loaded.
+    '''
+
+    def __init__(self):
+        self.queue = deque()     # (sequence number, entry), may hold stale positions
+        self.pending = dict()    # uri -> sequence number of its live position
+        self.processed = set()
+        self.sequence = count()
+
+    def prepend(self, entry) -> None:
+        seq = next(self.sequence)
+        self.pending[entry[1]] = seq
+        self.queue.appendleft((seq, entry))
+        self.compact()
+
+    def append(self, entry) -> None:
+        seq = next(self.sequence)
+        self.pending[entry[1]] = seq
+        self.queue.append((seq, entry))
+        self.compact()
+
+    def pop(self):
+        while self.queue:
+            seq, entry = self.queue.popleft()
+            if self.pending.get(entry[1]) == seq:
+                del self.pending[entry[1]]
+                return entry
+        return None
+
+    def compact(self) -> None:
+        # drop stale positions once they outnumber the live ones
+        if len(self.queue) > 2 * len(self.pending) + 64:
+            self.queue = deque(item for item in self.queue
+                               if self.pending.get(item[1][1]) == item[0])
+
+    def clear(self) -> None:
+        self.queue.clear()
+        self.pending.clear()
+
+    def __contains__(self, uri) -> bool:
+        return uri in self.pending
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def __iter__(self):
+        for seq, entry in list(self.queue):
+            if self.pending.get(entry[1]) == seq:
+                yield entry
+
+    def peek(self, n: int) -> list:
+        # the next n entries, without popping them
+        live = (entry for seq, entry in self.queue
+                if self.pending.get(entry[1]) == seq)
+        return list(islice(live, n))
+
+
+class DtsPrefetcher:
+
+    ''' Reads and parses the next files of the dts queue on a thread pool
+
+    lxml releases the GIL while it parses, so the files ahead in the queue
+    are decompressed and parsed while the handler of the current file
+    writes its turtle. loadXML takes the parsed root with take(); a file
+    that wasn't prefetched, or whose prefetch failed, is read by loadXML
+    as before, so errors are reported the usual way.
+    '''
+
+    def __init__(self, workers: int = 4, depth: int = None):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.depth = depth or 2 * workers
+        self.futures = dict()   # uri -> future of the parsed root
+
+    def fill(self, params: ConversionContext, completed_output) -> None:
+        for uri_type, uri, ns in params.dts_queue.peek(self.depth):
+            if uri in self.futures or uri in completed_output or \
+               uri in params.dts_processed:
+                continue
+            self.futures[uri] = self.executor.submit(prefetchXML, uri, params)
+        # forget prefetches of files that were loaded some other way
+        if len(self.futures) > 4 * self.depth:
+            for uri in [uri for uri in self.futures if uri in completed_output]:
+                self.futures.pop(uri).cancel()
+
+    def take(self, uri: str):
+        future = self.futures.pop(uri, None)
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception:
+            return None
+
+    def close(self) -> None:
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
+        self.executor.shutdown(wait=True)
+
+
 def popDtsQueue(params):
     # pop entry from start of queue
-    dts_queue = params['dts_queue']
-    if dts_queue != []:
-        return dts_queue.pop(0)
-    return None
+    return params.dts_queue.pop()
 
 
 def dispatchDtsQueue(params, completed_output):
     res = 0
+    prefetcher = params.prefetcher
+    if prefetcher is not None:
+        prefetcher.fill(params, completed_output)
     item = popDtsQueue(params)
     while item is not None:
-        res = loadXML(processDtsFile, item[1], item[2], params, completed_output)
+        if item[1] in params.deferred:
+            res = resumeLinkBase(item[1], params)
+        else:
+            res = loadXML(processDtsFile, item[1], item[2], params, completed_output)
+        if prefetcher is not None:
+            prefetcher.fill(params, completed_output)
         item = popDtsQueue(params)
     return res
 
 
 def showDtsQueue(params):
     count = 0
-    for uri_type, uri, ns in params['dts_queue']:
-        params['log'].write(str(count)+": "+uri+"\n")
+    for uri_type, uri, ns in params.dts_queue:
+        logging.info(str(count)+": "+uri)
         count += 1
 
 
 def dtsQueueLength(params):
-    return len(params['dts_queue'])
+    return len(params.dts_queue)
 
 
 def addDtsUri(params, uri):
     # Processed dts elements
-    dts = params['dts_processed']
+    dts = params.dts_processed
     if uri in dts:
         return -1
     else:
-        dts.append(uri)
+        dts.add(uri)
         return 0
@@ -0,0 +1,216 @@
+import logging
+from abc import ABC, abstractmethod
+from itertools import count
+from urllib.parse import urljoin
+
+from rdflib import URIRef, BNode
+from rdflib import Literal as RDFLiteral
+from rdflib.namespace import RDF
+
+
+class Literal:
+
+    ''' Literal object of a triple
+
+    value is the lexical value, unescaped; datatype is a prefixed name or
+    <iri>. long asks the turtle writer for a triple quoted string.
+    '''
+
+    __slots__ = ('value', 'datatype', 'lang', 'long')
+
+    def __init__(self, value: str, datatype: str = None, lang: str = None, long: bool = False):
+        self.value = value
+        self.datatype = datatype
+        self.lang = lang
+        self.long = long
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Literal) and \
+            (self.value, self.datatype, self.lang) == (other.value, other.datatype, other.lang)
+
+    def __hash__(self) -> int:
+        return hash((self.value, self.datatype, self.lang))
+
+    def __repr__(self) -> str:
+        return 'Literal(%r, %r, %r)' % (self.value, self.datatype, self.lang)
+
+
+class Emitter(ABC):
+
+    ''' Receives the triples of one document
+
+    The handlers describe one subject at a time:
+
+        output.startSubject('dts1:concept')
+        output.triple('rdf:type', 'xbrli:item')
+        output.startBlank('xbrli:entity')
+        output.triple('xbrli:identifier', Literal('1234'))
+        output.endBlank()
+        output.endSubject()
+
+    Subjects, predicates and objects that aren't literals are written as
+    in turtle: prefixed names, <iri>s and _:labels. Literals are Literal
+    objects, escaping is up to the backend. A subclass writes turtle
+    (TurtleFile) or turns the calls into triples (TripleEmitter); one
+    that misses a method can't be instantiated.
+    '''
+
+    def comment(self, text: str) -> None:
+        pass
+
+    @abstractmethod
+    def startSubject(self, subject: str) -> None:
+        pass
+
+    @abstractmethod
+    def triple(self, predicate: str, obj) -> None:
+        pass
+
+    @abstractmethod
+    def startBlank(self, predicate: str) -> None:
+        pass
+
+    @abstractmethod
+    def endBlank(self) -> None:
+        pass
+
+    @abstractmethod
+    def collection(self, predicate: str, items: list) -> None:
+        pass
+
+    @abstractmethod
+    def endSubject(self) -> None:
+        pass
+
+    def setGraph(self, graph: str) -> None:
+        # name of the graph of the triples that follow, for backends with graphs
+        pass
+
+    def subjectDone(self) -> None:
+        # called after each subject, where the output can be split
+        pass
+
+    def release(self) -> None:
+        # the document is done for now, free what can be freed
+        pass
+
+    def close(self, header: str) -> list:
+        # header is the turtle prefix header, returns the output files
+        return []
+
+    def discard(self) -> None:
+        pass
+
+
+class TripleEmitter(Emitter):
+
+    ''' Emitter that hands (subject, predicate, object) rdflib terms to callback
+
+    Prefixed names are resolved with namespaces, the uri -> prefix table of
+    the conversion, as the turtle header would resolve them. Blank nodes
+    get labels from scope and a counter, so they differ between documents
+    and are the same on every run. Relative namespaces, such as the one of
+    the instance, are resolved against base if given, as a turtle parser
+    resolves them against the document.
+    '''
+
+    def __init__(self, callback, namespaces: dict, scope: str = '', base: str = None):
+        self.callback = callback
+        self.namespaces = namespaces
+        self.scope = scope
+        self.base = base
+        self.prefixes = dict()
+        self.prefixes_size = -1
+        self.blanks = count(1)
+        self.subjects = list()
+
+    def resolvePrefix(self, prefix: str) -> str:
+        if self.prefixes_size != len(self.namespaces):
+            # same rule as printNamespaces
+            self.prefixes = {prefix: (uri if uri.endswith('#') else uri+'#')
+                             for uri, prefix in self.namespaces.items()}
+            if self.base is not None:
+                self.prefixes = {prefix: urljoin(self.base, uri[:-1])+'#'
+                                 for prefix, uri in self.prefixes.items()}
+            self.prefixes_size = len(self.namespaces)
+        return self.prefixes.get(prefix, None)
+
+    def resolve(self, term):
+        if isinstance(term, Literal):
+            if term.datatype is not None:
+                return RDFLiteral(term.value, datatype=self.resolve(term.datatype))
+            return RDFLiteral(term.value, lang=term.lang)
+        if term[0] == '<':
+            if term[1] == '<':
+                raise ValueError('quoted triples are only supported in turtle: '+term)
+            return URIRef(term[1:-1])
+        prefix, sep, name = term.partition(':')
+        if prefix == '_':
+            return BNode(self.scope+'_'+name)
+        uri = self.resolvePrefix(prefix)
+        if uri is None:
+            logging.warning('unknown prefix in '+term)
+            return URIRef(term)
+        return URIRef(uri+name)
+
+    def newBlank(self) -> BNode:
+        return BNode(self.scope+'b'+str(next(self.blanks)))
+
+    def startSubject(self, subject: str) -> None:
+        self.subjects = [self.resolve(subject)]
+
+    def triple(self, predicate: str, obj) -> None:
+        self.callback(self.subjects[-1], self.resolve(predicate), self.resolve(obj))
+
+    def startBlank(self, predicate: str) -> None:
+        blank = self.newBlank()
+        self.callback(self.subjects[-1], self.resolve(predicate), blank)
+        self.subjects.append(blank)
+
+    def endBlank(self) -> None:
+        self.subjects.pop()
+
+    def collection(self, predicate: str, items: list) -> None:
+        if not items:
+            self.callback(self.subjects[-1], self.resolve(predicate), RDF.nil)
+            return None
+        node = self.newBlank()
+        self.callback(self.subjects[-1], self.resolve(predicate), node)
+        for position, item in enumerate(items):
+            self.callback(node, RDF.first, self.resolve(item))
+            if position == len(items) - 1:
+                rest = RDF.nil
+            else:
+                rest = self.newBlank()
+            self.callback(node, RDF.rest, rest)
+            node = rest
+        return None
+
+    def endSubject(self) -> None:
+        self.subjects = list()
+        self.subjectDone()
+
+
+class CallbackSink:
+
+    ''' Output of a conversion as triples passed to callback(s, p, o)
+
+    Use instead of OutputSink to feed a store without writing turtle;
+    go() sets namespaces to the namespace table of the conversion.
+    '''
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.namespaces = dict()
+
+    def open(self, namespace: str, urlfilename: str, source: str = None) -> Emitter:
+        return TripleEmitter(self.callback, self.namespaces, namespace)
+
+
+class GraphSink(CallbackSink):
+
+    ''' Output of a conversion added to an rdflib Graph '''
+
+    def __init__(self, graph):
+        super().__init__(lambda s, p, o: graph.add((s, p, o)))
+        self.graph = graph
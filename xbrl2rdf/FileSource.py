@@ -8,7 +8,7 @@ import zipfile, tarfile, os, io, errno, base64, gzip, zlib, re, struct, random,
 from lxml import etree
 from operator import indexOf
 
-from .utilfunctions import isHttpUrl, encoding_type
+from .utilfunctions import isHttpUrl, encoding_type, PrefixIndex
 
 archivePathSeparators = (".zip" + os.sep, ".tar.gz" + os.sep, ".eis" + os.sep, ".xml" + os.sep, ".xfd" + os.sep, ".frm" + os.sep, '.taxonomyPackage.xml' + os.sep) + \
                         ((".zip/", ".tar.gz/", ".eis/", ".xml/", ".xfd/", ".frm/", '.taxonomyPackage.xml/') if os.sep != "/" else ()) #acomodate windows and http styles
@@ -326,18 +326,24 @@ class FileSource:
             return archiveFileName in archiveFileSource.dir
         return True # True only means that the filepath maps into the archive, not that the file is really there
     
+    @property
+    def mappedPaths(self):
+        return self._mappedPaths
+
+    @mappedPaths.setter
+    def mappedPaths(self, mappedPaths):
+        self._mappedPaths = mappedPaths
+        self.mappedPathsIndex = PrefixIndex(mappedPaths) if mappedPaths else None
+
     def isMappedUrl(self, url):
-        if self.mappedPaths is not None:
-            return any(url.startswith(mapFrom) 
-                       for mapFrom in self.mappedPaths)
+        if self.mappedPathsIndex is not None:
+            return url in self.mappedPathsIndex
         return False        
 
     def mappedUrl(self, url):
-        if self.mappedPaths:
-            for mapFrom, mapTo in self.mappedPaths.items():
-                if url.startswith(mapFrom):
-                    url = mapTo + url[len(mapFrom):]
-                    break
+        # the longest remapping prefix applies
+        if self.mappedPathsIndex is not None:
+            return self.mappedPathsIndex.remap(url)
         return url
     
     def fileSourceContainingFilepath(self, filepath):
@@ -1,20 +1,29 @@
 from lxml import etree
 import logging
+import hashlib
+import json
 
 from .DtsProcessor import processSchema, processLinkBase
 from .LinkbaseProcessor import processExtendedLink
-from .utilfunctions import registerNamespaces, prependDtsQueue
-from .const import XLINK_HREF, XBRL_SCHEMA
+from .ConversionContext import ConversionContext
+from .Emitter import Literal
+from .utilfunctions import registerNamespaces, prependDtsQueue, splitTag, localName, TagDispatch
+from .const import XLINK_HREF, XBRL_SCHEMA, XBRLI_ENTITY, XBRLI_IDENTIFIER, \
+                    XBRLI_PERIOD, XBRLI_INSTANT, XBRLI_FOREVER, XBRLI_SEGMENT, \
+                    XBRLI_SCENARIO, XBRLDI_EXPLICITMEMBER, XBRLDI_TYPEDMEMBER
+
+XBRLI_NS = "http://www.xbrl.org/2003/instance"
 
 #change this to true to write types in ttl, false to not
 write_types = False
 
-def processInstance(root: etree._Element, base: str, ns: str, params: dict, handlerPrefix) -> int:
+def processInstance(root: etree._Element, base: str, ns: str, params: ConversionContext, handlerPrefix) -> int:
 
-    if etree.QName(root).localname == "schema":
-        return processSchema(root, base, handlerPrefix)
-    if etree.QName(root).localname == "linkbase":
-        return processLinkBase(root, base, ns)
+    root_name = localName(root)
+    if root_name == "schema":
+        return processSchema(root, base, params, handlerPrefix)
+    if root_name == "linkbase":
+        return processLinkBase(root, base, ns, params, handlerPrefix)
 
     logging.info("Processing instance "+base+"\n")
 
@@ -25,7 +34,7 @@ def processInstance(root: etree._Element, base: str, ns: str, params: dict, hand
     provenance = genProvenanceName(base, params, handlerPrefix)
     #force processing schemaRef first to combine with instance
     for child in root:
-        child_name: str = etree.QName(child).localname
+        child_name: str = localName(child)
         if child_name == "schemaRef":
             uri = child.attrib.get(XLINK_HREF, None)
             if uri is None:
@@ -33,18 +42,17 @@ def processInstance(root: etree._Element, base: str, ns: str, params: dict, hand
                 return -1
             processSchemaRef(child, provenance, params, handlerPrefix)
             res = prependDtsQueue(XBRL_SCHEMA, uri, base, ns, 0, params)
+    #contexts and units first, so facts can refer to their (hashed) names
+    for child in root:
+        child_name: str = localName(child)
+        if child_name in ("context", "unit"):
+            processInstanceChild(child, child_name, provenance, base, params, handlerPrefix)
     for child in root:
-        child_name: str = etree.QName(child).localname
-        if child_name == "context":
-            processContext(child, params, handlerPrefix, provenance)
-        elif child_name == "unit":
-            processUnit(child, params, handlerPrefix, provenance)
-        elif child_name == "footnoteLink":
+        child_name: str = localName(child)
+        if child_name == "footnoteLink":
             footnote_links.append(child)
-        elif child_name == "schemaRef": #already processed
-            continue
-        else:
-            child_name = processFact(child, provenance, base, params, handlerPrefix)
+        elif child_name not in ("schemaRef", "context", "unit"): #already processed
+            processInstanceChild(child, child_name, provenance, base, params, handlerPrefix)
 
     # for child in footnote_links:
     #     # if (child->type != XML_ELEMENT_NODE)
@@ -54,255 +62,310 @@ def processInstance(root: etree._Element, base: str, ns: str, params: dict, hand
     return res
 
 
-def processContext(context: etree._Element, params: dict, handlerPrefix, provenance) -> int:
+def processInstanceStream(source, base: str, ns: str, params: ConversionContext, handlerPrefix) -> int:
+    # same as processInstance, but source is parsed incrementally: each child
+    # of the root is handled when its end tag is read and is then freed, so
+    # memory use does not depend on the size of the instance; with hashed
+    # contexts and units they have to come before the facts that use them
+    logging.info("Streaming instance "+base+"\n")
+
+    res = -1
+    provenance = None
+    depth = 0
+    for event, node in etree.iterparse(source, events=("start", "end"),
+                                       remove_comments=True, huge_tree=True):
+        if event == "start":
+            if depth == 0:
+                registerNamespaces(node, base, params)
+                provenance = genProvenanceName(base, params, handlerPrefix)
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            # only complete children of the root are processed
+            continue
+        child_name: str = localName(node)
+        if child_name == "schemaRef":
+            uri = node.attrib.get(XLINK_HREF, None)
+            if uri is None:
+                logging.error("Couldn't identify schema location.")
+                return -1
+            processSchemaRef(node, provenance, params, handlerPrefix)
+            res = prependDtsQueue(XBRL_SCHEMA, uri, base, ns, 0, params)
+        elif child_name != "footnoteLink":
+            processInstanceChild(node, child_name, provenance, base, params, handlerPrefix)
+        node.clear()
+        while node.getprevious() is not None:
+            del node.getparent()[0]
+
+    if res != 0:
+        logging.error("Couldn't find schemaRef in "+base)
+    return res
+
+
+def entryPoints(filename: str) -> tuple:
+    # hrefs of the schemaRefs of an instance file, these come before its other
+    # children, so only the start of the file is parsed; None if unreadable
+    hrefs = list()
+    try:
+        for event, node in etree.iterparse(filename, events=("start",), huge_tree=True):
+            if node.getparent() is None:
+                continue
+            if localName(node) != "schemaRef":
+                break
+            hrefs.append(node.attrib.get(XLINK_HREF, None))
+    except (OSError, etree.XMLSyntaxError):
+        return None
+    return tuple(hrefs)
+
+
+def processInstanceChild(child: etree._Element, child_name: str, provenance: str, base: str, params: ConversionContext, handlerPrefix) -> None:
+    INSTANCE_CHILDREN[child](child, provenance, base, params, handlerPrefix)
+
+
+def processContext(context: etree._Element, params: ConversionContext, handlerPrefix, provenance) -> int:
 
     context_id = context.attrib.get('id', None)
-    output = params['pagedata']['instance']
-    output.write(handlerPrefix+":context_"+context_id+"\n")
-    output.write("    rdf:type xbrli:context;\n")
-    output.write("    oddb:provenance "+provenance+";\n")
-    output.write("    xbrli:entity [\n")
+    decoded = decodeContext(context)
+    context_identifier, period, segmentData, scenarioData = decoded
+    name = handlerPrefix+":context_"+context_id
+    if params.emitted is not None:
+        # identical contexts of all instances share one name and are written once
+        name = hashName("context", contextKey(context, params, decoded))
+        params.context_names[context_id] = name
+        if name in params.emitted:
+            return 0
+        params.emitted.add(name)
+    output = params.pagedata['instance']
+    output.startSubject(name)
+    output.triple("rdf:type", "xbrli:context")
+    if params.emitted is None:
+        output.triple("oddb:provenance", provenance)
+    output.startBlank("xbrli:entity")
      # every context element has one period element
-    period = getContextPeriod(context, params)
     period_child = period[0]
-
-    if etree.QName(period_child).localname == "instant":
-        instant = period_child.text
-        output.write('    xbrli:period \n')
-        if write_types:
-            output.write('        [ xbrli:instant "'+instant+'"^^xsd:date; ];\n')
-        else:
-            output.write('        [ xbrli:instant "'+instant+'"; ];\n')
-    elif etree.QName(period_child).localname == "forever":
-        output.write('    xbrli:period xbrli:forever;\n\n')
+    date_type = "xsd:date" if write_types else None
+
+    if period_child.tag == XBRLI_INSTANT:
+        output.startBlank("xbrli:period")
+        output.triple("xbrli:instant", Literal(period_child.text, date_type))
+        output.endBlank()
+    elif period_child.tag == XBRLI_FOREVER:
+        output.triple("xbrli:period", "xbrli:forever")
     # expect sequence of startDate/endDate pairs
     else:
-        output.write("    xbrli:period \n")
         while period_child is not None:
-            value = period_child.text
-            if write_types:
-                output.write('        [ xbrli:startDate "' + value +
-                            '"^^xsd:date;\n')
-            else:
-                output.write('        [ xbrli:startDate "' + value +
-                            '";\n')
+            output.startBlank("xbrli:period")
+            output.triple("xbrli:startDate", Literal(period_child.text, date_type))
             period_child = period_child.getnext()
-            value = period_child.text
-            if write_types:
-                output.write('          xbrli:endDate "' + value +
-                            '"^^xsd:date; ]\n')
-            else:
-                 output.write('          xbrli:endDate "' + value +
-                            '"; ]\n')
+            output.triple("xbrli:endDate", Literal(period_child.text, date_type))
+            output.endBlank()
             period_child = period_child.getnext()
-        output.write("        ;\n")
 
-    context_identifier = getContextIdentifier(context, params)
-    context_value = context_identifier.text
-    output.write('    xbrli:identifier "'+context_value+'" ;\n')
+    output.triple("xbrli:identifier", Literal(context_identifier.text))
 
     context_scheme = context_identifier.attrib.get("scheme", None)
+    output.triple("xbrli:scheme", "<"+context_scheme+">")
+    output.endBlank()
 
     # identifier = context[0][0]
     # scheme = identifier.attrib.get('scheme', None)
 
-    # entity element has optional segment
-
-    segmentData = getContextSegment(context, params)
-    scenarioData = getContextScenario(context, params)
-    if len(segmentData) > 0 or len(scenarioData) > 0:
-        output.write("    xbrli:scheme <"+context_scheme+"> ;\n        ];\n")
-    else:
-        output.write("    xbrli:scheme <"+context_scheme+"> ;\n        ].\n")
-    if len(segmentData) > 0:
-        output.write('    xbrli:segment [\n')
-        for data in segmentData:
-            dimension, tag, value = data
-            output.write('        xbrldt:dimensionItem [\n')
-            if tag is None:
-                output.write('                xbrldt:dimension ' + dimension + ';\n')
-                output.write('                xbrldi:explicitMember '+value+'];\n')
-            else:
-                output.write('                xbrldt:dimension ' + dimension + ';\n')
-                output.write('                xbrldt:dimension-domain ' + tag + ';\n')
-                if write_types:
-                    output.write('                xbrldi:typedMember """' + value +
-                                        '"""^^rdf:XMLLiteral;] ;\n')
+    # entity element has optional segment and scenario
+    for keyword, dimensionData in (('segment', segmentData), ('scenario', scenarioData)):
+        if len(dimensionData) > 0:
+            output.startBlank("xbrli:"+keyword)
+            for dimension, tag, value in dimensionData:
+                output.startBlank("xbrldt:dimensionItem")
+                output.triple("xbrldt:dimension", dimension)
+                if tag is None:
+                    output.triple("xbrldi:explicitMember", value)
                 else:
-                    output.write('                xbrldi:typedMember """' + value +
-                                        '""";] ;\n')
-        if len(scenarioData) > 0:
-            output.write('    ];\n')
-        else:
-            output.write('    ].\n')
-
-    if len(scenarioData) > 0:
-        output.write('    xbrli:scenario [\n')
-        for data in scenarioData:
-            dimension, tag, value = data
-            output.write('        xbrldt:dimensionItem [\n')
-            if tag is None:
-                output.write('                xbrldt:dimension ' + dimension + ';\n')
-                output.write('                xbrldi:explicitMember '+value+'];\n')
-            else:
-                output.write('                xbrldt:dimension ' + dimension + ';\n')
-                output.write('                xbrldt:dimension-domain ' + tag + ';\n')
-                if write_types:
-                    output.write('                xbrldi:typedMember """' + value +
-                                        '"""^^rdf:XMLLiteral;] ;\n')
-                else:
-                    output.write('                xbrldi:typedMember """' + value +
-                                        '""";] ;\n')
-        output.write('    ].\n\n')
+                    output.triple("xbrldt:dimension-domain", tag)
+                    output.triple("xbrldi:typedMember",
+                                  Literal(value, "rdf:XMLLiteral" if write_types else None, long=True))
+                output.endBlank()
+            output.endBlank()
 
+    output.endSubject()
     return 0
 
 
-def genFactName(params: dict, handlerPrefix) -> str:
-    params['factCount'] += 1
-    return handlerPrefix+":fact"+str(params['factCount'])
-
-
-def genProvenanceName(base: str, params: dict, handlerPrefix) -> str:
-    base = base.replace("\\", "\\\\")
-    output = params['pagedata']['instance']
-    params['provenanceNumber'] += 1
-    name: str = handlerPrefix+":provenance"+str(params['provenanceNumber'])
-    output.write("# provenance for facts from same filing\n")
-    output.write(name+" \n")
-    output.write('    rdf:type oddb0:Provenance;\n')
-    output.write('    xlink:href "'+base+'";\n')
+def decodeContext(context: etree._Element) -> tuple:
+    # identifier element, period element and the (dimension, tag, value)
+    # members of segment and scenario, in one pass over the context
+    identifier = None
+    period = None
+    segment = list()
+    scenario = list()
+    for child in context:
+        tag = child.tag
+        if tag == XBRLI_ENTITY:
+            for node in child:
+                if node.tag == XBRLI_IDENTIFIER:
+                    identifier = node
+                elif node.tag == XBRLI_SEGMENT:
+                    decodeMembers(node, segment)
+        elif tag == XBRLI_PERIOD:
+            period = child
+        elif tag == XBRLI_SCENARIO:
+            decodeMembers(child, scenario)
+    return identifier, period, segment, scenario
+
+
+def decodeMembers(node: etree._Element, members: list) -> None:
+    for member in node:
+        if member.tag == XBRLDI_EXPLICITMEMBER:
+            members.append((member.get('dimension'), None, member.text))
+        elif member.tag == XBRLDI_TYPEDMEMBER:
+            inner = member[0]
+            members.append((member.get('dimension'),
+                            inner.prefix+":"+localName(inner), inner.text))
+
+
+def contextKey(context: etree._Element, params: ConversionContext, decoded: tuple = None) -> str:
+    # canonical form of the entity, period and dimensions, independent of
+    # the prefixes and the order of the members in the instance
+    identifier, period, segment, scenario = decoded or decodeContext(context)
+    key = [identifier.get("scheme"), identifier.text.strip()]
+    for node in period:
+        key.append((node.tag, (node.text or '').strip()))
+    for keyword, members in (('segment', segment), ('scenario', scenario)):
+        key.append((keyword, sorted((clarkName(dimension, context),
+                                     clarkName(value, context) if tag is None else clarkName(tag, context),
+                                     '' if tag is None else (value or '').strip())
+                                    for dimension, tag, value in members)))
+    return json.dumps(key)
+
+
+def unitKey(unit: etree._Element, params: ConversionContext) -> str:
+    # measures with the element they are in: unit, unitNumerator or unitDenominator
+    return json.dumps(sorted((localName(measure.getparent()),
+                              clarkName(measure.text, measure, XBRLI_NS))
+                             for measure in unit.iter('{*}measure')))
+
+
+def clarkName(qname: str, node: etree._Element, default: str = None) -> str:
+    # prefix:name in the content of node -> {namespace}name
+    prefix, sep, name = qname.strip().rpartition(':')
+    namespace = node.nsmap.get(prefix if sep else None, default)
+    if namespace is None:
+        return name
+    return "{"+namespace+"}"+name
+
+
+def hashName(kind: str, key: str) -> str:
+    return "xbrl2rdf:"+kind+"_"+hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def genFactName(params: ConversionContext, handlerPrefix) -> str:
+    params.factCount += 1
+    return handlerPrefix+":fact"+str(params.factCount)
+
+
+def genProvenanceName(base: str, params: ConversionContext, handlerPrefix) -> str:
+    output = params.pagedata['instance']
+    params.provenanceNumber += 1
+    name: str = handlerPrefix+":provenance"+str(params.provenanceNumber)
+    output.comment("provenance for facts from same filing")
+    output.setGraph(name)
+    output.startSubject(name)
+    output.triple("rdf:type", "oddb0:Provenance")
+    output.triple("xlink:href", Literal(base))
     filename = base[base.rfind('/') + 1:]
-    output.write('    xlink:title "'+filename+'";\n')
+    output.triple("xlink:title", Literal(filename))
+    output.endSubject()
     return name
 
 
-def getContextIdentifier(context: etree._Element, params: dict) -> etree._Element:
-    entity = context[0]
-    return entity[0]
-
-
-def getContextSegment(context: etree._Element, params: dict) -> etree._Element:
-    return getContextDimensions(context, params, 'segment')
-    '''
-    dimensionlist = list()
-    for node in context.iter():
-        if etree.QName(node).localname == "segment":
-            for subnode in node.iter():
-                if etree.QName(subnode).localname == "explicitMember":
-                    dimensionlist.add (subnode.get('dimension'), None, subnode.text)
-                elif etree.QName(subnode).localname == "typedMember":
-                    dimension = subnode.get('dimension')
-                    inner = subnode[0]
-                    tagdata = inner.prefix + ":" + etree.QName(inner.tag).localname
-                    dimensionlist.add (dimension, tagdata, inner.text)
-    return dimensionlist
-    '''
-
-def getContextDimensions(context: etree._Element, params: dict, keyword) -> etree._Element:
-    dimensionlist = list()
-    for node in context.iter():
-        if etree.QName(node).localname == keyword:
-            for subnode in node.iter():
-                if etree.QName(subnode).localname == "explicitMember":
-                    dimensionlist.append((subnode.get('dimension'), None, subnode.text))
-                elif etree.QName(subnode).localname == "typedMember":
-                    dimension = subnode.get('dimension')
-                    inner = subnode[0]
-                    tagdata = inner.prefix + ":" + etree.QName(inner.tag).localname
-                    dimensionlist.append((dimension, tagdata, inner.text))
-    return dimensionlist
-
-def getContextScenario(context: etree._Element, params: dict) -> etree._Element:
-    return getContextDimensions(context, params, 'scenario')
-    '''
-    for node in context.iter():
-        if etree.QName(node).localname == "scenario":
-            return node
-    return None
-    '''
-
-def getContextPeriod(context: etree._Element, params: dict) -> etree._Element:
-    for node in context:
-        if etree.QName(node).localname == "period":
-            return node
-    return None
+def getContextIdentifier(context: etree._Element, params: ConversionContext) -> etree._Element:
+    return decodeContext(context)[0]
+
+
+def getContextSegment(context: etree._Element, params: ConversionContext) -> list:
+    return decodeContext(context)[2]
+
+
+def getContextDimensions(context: etree._Element, params: ConversionContext, keyword) -> list:
+    return decodeContext(context)[2 if keyword == 'segment' else 3]
+
+
+def getContextScenario(context: etree._Element, params: ConversionContext) -> list:
+    return decodeContext(context)[3]
+
+
+def getContextPeriod(context: etree._Element, params: ConversionContext) -> etree._Element:
+    return decodeContext(context)[1]
 
 
 # this needs further work to cope with more than one
 # child element for the unit element, e.g. 2 measures for
 # multiple pairs or numerator/denominator this could use
 # one collection for numerator and another for denominator
-def processUnit(unit: etree._Element, params: dict, handlerPrefix, provenance) -> int:
-    output = params['pagedata']['instance']
+def processUnit(unit: etree._Element, params: ConversionContext, handlerPrefix, provenance) -> int:
+    output = params.pagedata['instance']
     unit_id = unit.attrib.get("id", None)
-    unitDetails =[]
+    name = handlerPrefix+":unit_" + unit_id
+    if params.emitted is not None:
+        name = hashName("unit", unitKey(unit, params))
+        params.unit_names[unit_id] = name
+        if name in params.emitted:
+            return 0
+        params.emitted.add(name)
     unit_child = unit[0]
     if (unit_child is not None) and (
-          etree.QName(unit_child).localname == "measure"):
+          localName(unit_child) == "measure"):
         measure = unit_child.text
-        output.write(handlerPrefix+":unit_" + unit_id+"\n")
-        output.write("    rdf:type xbrli:unit;\n")
-        unitDetails.append("    oddb:provenance "+provenance)
+        output.startSubject(name)
+        output.triple("rdf:type", "xbrli:unit")
+        if params.emitted is None:
+            output.triple("oddb:provenance", provenance)
         if ":" in measure:
-            unitDetails.append("    xbrli:measure "+measure)
+            output.triple("xbrli:measure", measure)
         else:
-            unitDetails.append("    xbrli:measure xbrli:"+measure)
-    elif etree.QName(unit_child).localname == "divide":
-        output.write(handlerPrefix+":unit_" + unit_id+"\n")
-        numerator = getNumerator(unit_child, params)
-        denominator = getDenominator(unit_child, params)
-        unitDetails.append("    xbrli:numerator "+numerator)
-        unitDetails.append("    xbrli:denominator "+denominator)
-    if unit_child is not None:
-        for detail in unitDetails:
-            output.write(detail)
-            if detail == unitDetails[-1]:
-                output.write(' .\n\n')
-            else:
-                output.write(' ;\n')
+            output.triple("xbrli:measure", "xbrli:"+measure)
+        output.endSubject()
+    elif localName(unit_child) == "divide":
+        output.startSubject(name)
+        output.triple("xbrli:numerator", getNumerator(unit_child, params))
+        output.triple("xbrli:denominator", getDenominator(unit_child, params))
+        output.endSubject()
     return 0
 
-def processFact(fact: etree._Element, provenance: str, base: str, params: dict, handlerPrefix) -> str:
+def processFact(fact: etree._Element, provenance: str, base: str, params: ConversionContext, handlerPrefix) -> str:
     # fact_id = fact.attrib.get('id', None)
-    output = params['pagedata']['instance']
+    output = params.pagedata['instance']
     contextRef = fact.attrib.get("contextRef", None)
-    prefix = params['namespaces'].get(etree.QName(fact).namespace, None)
+    namespace, localname = splitTag(fact.tag)
+    prefix = params.namespaces.get(namespace, None)
 
     # this implies that the fact is a tuple
     if contextRef is None:
 
         # todo prefix
-        logging.info("tuple: " + etree.QName(fact).localname+
+        logging.info("tuple: " + localname+
                      "\nprefix: "+prefix)
 
         child_fact_name = []
         for child in fact:
-            processFact(child, provenance, base, params)
-            child_fact_name.append(handlerPrefix+":fact"+str(params['factCount'])+"\n")
-
-        factName = genFactName(params)
-        output.write(factName+"\n")
-        output.write("    xl:type xbrli:tuple ;\n")
-        output.write("    oddb:provenance "+provenance+" ;\n")
-        output.write("    rdf:type " + prefix +
-                              ":"+etree.QName(fact).localname+" ;\n")
-        output.write("    xbrli:content (\n")
+            child_fact_name.append(processFact(child, provenance, base, params, handlerPrefix))
 
-        for item in child_fact_name:
-            output.write("        "+item)
-
-        output.write("    ).\n")
+        factName = genFactName(params, handlerPrefix)
+        output.startSubject(factName)
+        output.triple("xl:type", "xbrli:tuple")
+        output.triple("oddb:provenance", provenance)
+        output.triple("rdf:type", prefix+":"+localname)
+        output.collection("xbrli:content", child_fact_name)
+        output.endSubject()
 
         return factName
 
     factName = genFactName(params, handlerPrefix)
     # change to Raggett-> rdf:type is xl:type and vice versa
-    output.write(factName+" \n")
-    output.write("    rdf:type oddb:fact ;\n")
-    output.write("    oddb:provenance "+provenance+" ;\n")
-    output.write("    xl:type " + prefix +
-                          ":"+etree.QName(fact).localname+" ;\n")
+    output.startSubject(factName)
+    output.triple("rdf:type", "oddb:fact")
+    output.triple("oddb:provenance", provenance)
+    output.triple("xl:type", prefix+":"+localname)
 
     unitRef = fact.attrib.get("unitRef", None)
     isNil = fact.attrib.get('{http://www.w3.org/2001/XMLSchema-instance}nil', None)
@@ -310,47 +373,27 @@ def processFact(fact: etree._Element, provenance: str, base: str, params: dict,
         #print('sourceline', fact.sourceline, 'attrib', fact.attrib, 'nill?', isNil)
         #need to check for xsi:nil 'true' attribute, if so, put rdf:nil
         if isNil:
-            output.write('    rdf:literal ' + 'rdf:nil;\n')
+            output.triple("rdf:literal", "rdf:nil")
         else:
             value = fact.text
-            if "." in value:
-                if write_types:
-                    output.write('    rdf:literal "' + value +
-                                        '"^^xsd:decimal ;\n')
-                else:
-                    output.write('    rdf:literal "' + value +
-                                        '" ;\n')
+            if write_types:
+                output.triple("rdf:literal", Literal(value, "xsd:decimal" if "." in value else "xsd:integer"))
             else:
-                if write_types:
-                    output.write('    rdf:literal "' + value +
-                                        '"^^xsd:integer ;\n')
-                else:
-                    output.write('    rdf:literal "' + value +
-                                        '" ;\n')
+                output.triple("rdf:literal", Literal(value))
 
         decimals = fact.attrib.get("decimals", None)
         if decimals is not None:
-            if write_types:
-                output.write('    xbrli:decimals "' + decimals +
-                                    '"^^xsd:integer ;\n')
-            else:
-                output.write('    xbrli:decimals "' + decimals +
-                                    '" ;\n')
+            output.triple("xbrli:decimals", Literal(decimals, "xsd:integer" if write_types else None))
         precision = fact.attrib.get("precision", None)
         if precision is not None:
-            if write_types:
-                output.write('    xbrli:precision "' + precision +
-                                    '"^^xsd:integer ;\n')
-            else:
-                output.write('    xbrli:precision "' + precision +
-                                    '" ;\n')
+            output.triple("xbrli:precision", Literal(precision, "xsd:integer" if write_types else None))
 
         # does xmlGetProp ignore namespace prefix for attribute names?
         balance = fact.attrib.get("balance", None)
         if balance is not None:
-            output.write('    xbrli:balance "'+balance+'"\n')
+            output.triple("xbrli:balance", Literal(balance))
 
-        output.write("    xbrli:unit "+handlerPrefix+":unit_"+unitRef+";\n")
+        output.triple("xbrli:unit", params.unit_names.get(unitRef, handlerPrefix+":unit_"+unitRef))
     # non-numeric fact
     else:
         count = len(fact)
@@ -360,34 +403,25 @@ def processFact(fact: etree._Element, provenance: str, base: str, params: dict,
                 #print(type(child), child.sourceline, 'child:', child)
                 # use single quotation mark if string has quotation marks
                 xml += etree.tostring(child, encoding='unicode').replace('"', "'")
-            if write_types:
-                output.write('    rdf:literal """' + xml +
-                                    '"""^^rdf:XMLLiteral.\n')
-            else:
-                output.write('    rdf:literal """' + xml +
-                                    '""".\n')
+            output.triple("rdf:literal", Literal(xml, "rdf:XMLLiteral" if write_types else None, long=True))
         elif not isNil:
             content = fact.text.replace('"', "'")
-            if content.split(":")[0] in params['namespaces'].values():
-                output.write('    rdf:literal ' + content +
-                                      ' ;\n')
+            if content.split(":")[0] in params.namespaces.values():
+                output.triple("rdf:literal", content)
             else:
-                lang = fact.attrib.get("lang", None)
-                if lang is not None:
-                    output.write('    rdf:literal """' + content +
-                                          '"""@'+lang+' ;\n')
-                else:
-                    output.write('    rdf:literal """' + content +
-                                          '""" ;\n')
+                output.triple("rdf:literal", Literal(content, lang=fact.attrib.get("lang", None), long=True))
 
-    output.write("    xbrli:context "+handlerPrefix+":context_"+contextRef+" .\n\n")
+    if params.emitted is not None and contextRef not in params.context_names:
+        logging.warning("context "+contextRef+" is used before it is defined, it is not hashed")
+    output.triple("xbrli:context", params.context_names.get(contextRef, handlerPrefix+":context_"+contextRef))
+    output.endSubject()
 
     return factName
 
 
-def getNumerator(divide: etree._Element, params: dict) -> str:
+def getNumerator(divide: etree._Element, params: ConversionContext) -> str:
     for child in divide:
-        if etree.QName(child).localname == "unitNumerator":
+        if localName(child) == "unitNumerator":
             divide_child = child[0]
             if divide_child is not None:
                 value = divide_child.text
@@ -397,9 +431,9 @@ def getNumerator(divide: etree._Element, params: dict) -> str:
                     return 'xbrli:'+value
     assert (False), "Didn't find a numerator in getNumerator!"
 
-def getDenominator(divide: etree._Element, params: dict) -> str:
+def getDenominator(divide: etree._Element, params: ConversionContext) -> str:
     for child in divide:
-        if etree.QName(child).localname == "unitDenominator":
+        if localName(child) == "unitDenominator":
             divide_child = child[0]
             if divide_child is not None:
                 value = divide_child.text
@@ -410,12 +444,20 @@ def getDenominator(divide: etree._Element, params: dict) -> str:
     assert (False), "Didn't find a denominator in getDenominator!"
 
 
-def processSchemaRef(child: etree._Element, provenance: str, params: dict, handlerPrefix) -> int:
-    output = params['pagedata']['instance']
+def processSchemaRef(child: etree._Element, provenance: str, params: ConversionContext, handlerPrefix) -> int:
+    output = params.pagedata['instance']
     schemaRef = child.attrib.get(XLINK_HREF, None)
     schemaRef = schemaRef.replace("eu/eu/", "eu/")
     if schemaRef:
-        #output.write(handlerPrefix+":schemaRef \n")
-        #output.write("    oddb:provenance "+provenance+" ;\n")
-        output.write("    link:schemaRef <"+schemaRef+"> .\n\n")
+        output.startSubject(provenance)
+        output.triple("link:schemaRef", "<"+schemaRef+">")
+        output.endSubject()
     return 0
+
+
+# handlers of the children of the instance root, as called by processInstanceChild
+INSTANCE_CHILDREN = TagDispatch({
+    "context": lambda child, provenance, base, params, handlerPrefix:
+        processContext(child, params, handlerPrefix, provenance),
+    "unit": lambda child, provenance, base, params, handlerPrefix:
+        processUnit(child, params, handlerPrefix, provenance)}, default=processFact)
@@ -1,4 +1,6 @@
 from collections import defaultdict
+from itertools import islice
+from sys import intern
 from lxml import etree
 import urllib
 import logging
@@ -15,37 +17,247 @@ from .const import XBRLDT_CONTEXTELEMENT, XBRLDT_CLOSED, XBRLDT_TARGETROLE, \
                    XBRLDT_USABLE
 from .const import ORDER, USE, PRIORITY, WEIGHT, NAME, COVER, COMPLEMENT, AXIS, PREFERRED_LABEL
 
-from .utilfunctions import processAttribute, isHttpUrl, expandRelativePath, \
-                           appendDtsQueue, prependDtsQueue
+from .ConversionContext import ConversionContext
+from .Emitter import Literal
+from .utilfunctions import AttributeEmitter, StreamSource, isHttpUrl, \
+                           appendDtsQueue, prependDtsQueue, splitTag, localName
 
 write_types = False
 
-def processLinkBase(root: etree._Element, base: str, ns: str, params: dict, handlerPrefix) -> int:
+# attributes written as triples, in this order
+ARC_ATTRIBUTES: AttributeEmitter = AttributeEmitter([
+    # addition to xbrlimport / Raggett
+    (XBRLDT_CONTEXTELEMENT, str),
+    (XBRLDT_TARGETROLE, None),
+    (XBRLDT_CLOSED, bool),
+    (XBRLDT_USABLE, bool),
+    (COVER, str),
+    (AXIS, str),
+    (COMPLEMENT, bool),
+    (NAME, str),
+    (PREFERRED_LABEL, str),
+    # end of addition to xbrlimport / Raggett
+    (USE, str),
+    (PRIORITY, int),
+    (ORDER, float),
+    (WEIGHT, float)])
+
+STAR_ARC_ATTRIBUTES: AttributeEmitter = AttributeEmitter([
+    (XLINK_ROLE, str),
+    (USE, str),
+    (PRIORITY, int),
+    (ORDER, float),
+    (WEIGHT, float),
+    # addition to xbrlimport / Raggett
+    (XBRLDT_CONTEXTELEMENT, str),
+    (XBRLDT_TARGETROLE, None),
+    (XBRLDT_CLOSED, bool),
+    (XBRLDT_USABLE, bool),
+    (COVER, str),
+    (AXIS, str),
+    (COMPLEMENT, bool),
+    (NAME, str)])
+
+RESOURCE_ATTRIBUTES: AttributeEmitter = AttributeEmitter([
+    (XLINK_ROLE, None),
+    (XML_LANG, str),
+    (AS, None),
+    # arc_to boolean attributes
+    (ABSTRACT, bool),
+    (MERGE, bool),
+    (NILS, bool),
+    (STRICT, bool),
+    (IMPLICITFILTERING, bool),
+    (MATCHES, bool),
+    (MATCHANY, bool),
+    (BINDASSEQUENCE, bool),
+    # arc_to literal attributes
+    (NAME, str),
+    (OUTPUT, str),
+    (FALLBACKVALUE, str),
+    (ASPECTMODEL, str),
+    (TEST, str),
+    (PARENTCHILDORDER, str),
+    (SELECT, str),
+    (VARIABLE, str),
+    (DIMENSION, str),
+    (SCHEME, str)])
+
+# attributes of resources and arcs that are known, others are reported
+RESOURCE_KNOWN_ATTRIBUTES: frozenset = frozenset([
+    XLINK_ROLE, XLINK_TYPE, XLINK_LABEL, XLINK_TITLE, XML_LANG, ID, AS, ABSTRACT,
+    MERGE, NILS, STRICT, IMPLICITFILTERING, MATCHES, MATCHANY, BINDASSEQUENCE,
+    NAME, OUTPUT, FALLBACKVALUE, ASPECTMODEL, TEST, PARENTCHILDORDER, SELECT,
+    VARIABLE, DIMENSION, SCHEME])
+
+ARC_KNOWN_ATTRIBUTES: frozenset = frozenset([
+    XLINK_FROM, XLINK_TO, XLINK_ARCROLE, XLINK_TITLE, XLINK_TYPE,
+    XBRLDT_CONTEXTELEMENT, XBRLDT_CLOSED, XBRLDT_TARGETROLE, XBRLDT_USABLE,
+    ORDER, USE, PRIORITY, WEIGHT, NAME, COVER, COMPLEMENT, AXIS, PREFERRED_LABEL])
+
+
+class Locator:
+
+    ''' Locator or resource of an extended link
+
+    Only the href and label of a locator are used, so no copy of its
+    attributes is made. node is the element of a resource, its attributes
+    and content are read when it is written. hrefs and labels repeat over
+    the links of a DTS and are interned.
+    '''
+
+    __slots__ = ('type', 'href', 'label', 'node')
+
+    def __init__(self, type: str, href: str, label: str, node: etree._Element = None):
+        self.type = type
+        self.href = intern(href) if href is not None else None
+        self.label = intern(label) if label is not None else None
+        self.node = node
+
+
+class Arc:
+
+    ''' Arc of an extended link
+
+    attrib is the attribute mapping of its element, node.attrib, not a
+    copy; the attributes are written for every (from, to) pair while the
+    link is translated. fromloc and toloc are the locators with the from
+    and to label, shared by all arcs with that label.
+    '''
+
+    __slots__ = ('arcrole', 'fromLabel', 'toLabel', 'attrib', 'fromloc', 'toloc')
+
+    def __init__(self, attrib):
+        arcrole = attrib.get(XLINK_ARCROLE, None)
+        from_label = attrib.get(XLINK_FROM, None)
+        to_label = attrib.get(XLINK_TO, None)
+        self.arcrole = intern(arcrole) if arcrole is not None else None
+        self.fromLabel = intern(from_label) if from_label is not None else None
+        self.toLabel = intern(to_label) if to_label is not None else None
+        self.attrib = attrib
+        self.fromloc = ()
+        self.toloc = ()
+
+
+def processLinkBase(root: etree._Element, base: str, ns: str, params: ConversionContext, handlerPrefix) -> int:
     # first phase searchs for schemas
     logging.info("checking linkbase "+base)
-    missingSchemas: int = 0
-    for node in root:
-        node_type = node.attrib.get(XLINK_TYPE, None)
-        if node_type == "extended":
-            missingSchemas += checkExtendedLink(node, base, ns, params)
-        elif node_type == "simple":
-            missingSchemas += checkSimpleLink(node, base, ns, params)
+    missingSchemas: int = checkLinkBase(root, base, ns, params)
     if missingSchemas > 0:
-        appendDtsQueue(XBRL_LINKBASE, base, "", ns, 1, params)
-        logging.info("missing schemas "+base)
+        # the schemas are at the front of the queue, the linkbase goes to the
+        # back with its parsed tree, so it is translated after them without
+        # reading and parsing it again
+        deferLinkBase(root, base, ns, params, handlerPrefix)
         return 0
+    return translateLinkBase(root, base, ns, params, handlerPrefix)
+
+
+def processLinkBaseStream(source: StreamSource, base: str, ns: str, params: ConversionContext, handlerPrefix) -> int:
+    # same as processLinkBase, but the file is parsed incrementally in one
+    # pass, and each link is freed when it has been handled, so memory use
+    # depends on the largest extended link, not on the size of the linkbase.
+    # A link is translated as soon as it is checked, while its schemas are
+    # loaded and the namespaces of its resources known. From the first link
+    # that has to wait the rest is only checked, and the linkbase is
+    # deferred with the number of links done; resumeLinkBase parses the file
+    # again and continues from there
+    logging.info("checking linkbase "+base+" (streaming)")
+    done: int = 0
+    waiting: bool = False
+    for node in streamLinks(source):
+        missingSchemas = checkLink(node, base, ns, params)
+        if not waiting:
+            waiting = missingSchemas > 0 or not resourceNamespacesKnown(node, params)
+        if not waiting:
+            translateLink(node, base, ns, params, handlerPrefix)
+            done += 1
+    if waiting:
+        deferLinkBase(source, base, ns, params, handlerPrefix, done)
+    return 0
+
+
+def streamLinks(source: StreamSource):
+    # the children of the root element, each one is freed when the next is read
+    depth = 0
+    with source.open() as fp:
+        for event, node in etree.iterparse(fp, events=("start", "end"),
+                                           remove_comments=True, huge_tree=True):
+            if event == "start":
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                # only complete children of the root are processed
+                continue
+            yield node
+            node.clear()
+            while node.getprevious() is not None:
+                del node.getparent()[0]
+
+
+def resourceNamespacesKnown(element: etree._Element, params: ConversionContext) -> bool:
+    # process_resource needs a prefix for the children of resources, their
+    # namespaces are registered by the schemas of the dts
+    for node in element:
+        if node.attrib.get(XLINK_TYPE, None) == "resource":
+            for child in node:
+                if splitTag(child.tag)[0] not in params.namespaces:
+                    return False
+    return True
+
+
+def checkLinkBase(links, base: str, ns: str, params: ConversionContext) -> int:
+    missingSchemas: int = 0
+    for node in links:
+        missingSchemas += checkLink(node, base, ns, params)
+    return missingSchemas
+
+
+def checkLink(node: etree._Element, base: str, ns: str, params: ConversionContext) -> int:
+    node_type = node.attrib.get(XLINK_TYPE, None)
+    if node_type == "extended":
+        return checkExtendedLink(node, base, ns, params)
+    elif node_type == "simple":
+        return checkSimpleLink(node, base, ns, params)
+    return 0
+
+
+def deferLinkBase(root, base: str, ns: str, params: ConversionContext, handlerPrefix, done: int = 0) -> None:
+    # root is the parsed tree, or the StreamSource of a streamed linkbase of
+    # which the first done links have been translated
+    params.deferred[base] = (root, ns, handlerPrefix, done)
+    params.deferralCount += 1
+    appendDtsQueue(XBRL_LINKBASE, base, "", ns, 0, params)
+    logging.info("missing schemas "+base)
+
+
+def resumeLinkBase(uri: str, params: ConversionContext) -> int:
+    # translate a deferred linkbase, its schemas have been loaded in the meantime
+    root, ns, handlerPrefix, done = params.deferred.pop(uri)
+    if isinstance(root, StreamSource):
+        root = islice(streamLinks(root), done, None)
+    res = translateLinkBase(root, uri, ns, params, handlerPrefix)
+    params.pagedata[handlerPrefix].release()
+    return res
+
+
+def translateLinkBase(root, base: str, ns: str, params: ConversionContext, handlerPrefix) -> int:
     # second phase translates links into RDF
     logging.info("processing linkbase "+base)
     for node in root:
-        node_type = node.attrib.get(XLINK_TYPE, None)
-        if node_type == "extended":
-            processExtendedLink(node, base, ns, params, handlerPrefix)
-        elif node_type == "simple":
-            processSimpleLink(node, base, ns, params)
+        translateLink(node, base, ns, params, handlerPrefix)
     return 0
 
 
-def checkSimpleLink(node: etree._Element, base: str, ns: str, params: dict) -> int:
+def translateLink(node: etree._Element, base: str, ns: str, params: ConversionContext, handlerPrefix) -> None:
+    node_type = node.attrib.get(XLINK_TYPE, None)
+    if node_type == "extended":
+        processExtendedLink(node, base, ns, params, handlerPrefix)
+    elif node_type == "simple":
+        processSimpleLink(node, base, ns, params)
+
+
+def checkSimpleLink(node: etree._Element, base: str, ns: str, params: ConversionContext) -> int:
     missingSchemas = 0
     href = node.attrib.get(XLINK_HREF, None)
     if href is not None:
@@ -58,15 +270,15 @@ def checkSimpleLink(node: etree._Element, base: str, ns: str, params: dict) -> i
             lns = ns
         else:
             lns = None
-        uri = expandRelativePath(uri, base)
-        if uri not in params['dts_processed']:
+        uri = params.href_cache.expand(uri, base)
+        if uri not in params.dts_processed:
             missingSchemas += 1
             logging.info("found unseen1: "+uri)
             prependDtsQueue(XBRL_SCHEMA, uri, base, lns, 0, params)
     return missingSchemas
 
 
-def checkExtendedLink(element: etree._Element, base: str, ns: str, params: dict) -> int:
+def checkExtendedLink(element: etree._Element, base: str, ns: str, params: ConversionContext) -> int:
     missingSchemas = 0
     for node in element:
         node_type = node.attrib.get(XLINK_TYPE, None)
@@ -82,15 +294,15 @@ def checkExtendedLink(element: etree._Element, base: str, ns: str, params: dict)
                     lns = ns
                 else:
                     lns = None
-                uri = expandRelativePath(uri, base)
-                if uri not in params['dts_processed']:
+                uri = params.href_cache.expand(uri, base)
+                if uri not in params.dts_processed:
                     missingSchemas += 1
                     logging.info("found unseen2: "+uri)
                     prependDtsQueue(XBRL_SCHEMA, uri, base, lns, 0, params)
     return missingSchemas
 
 
-def processSimpleLink(node: etree._Element, base: str, ns: str, params: dict) -> int:
+def processSimpleLink(node: etree._Element, base: str, ns: str, params: ConversionContext) -> int:
     node_role = node.attrib.get("roleURI", None)
     if node_role:
         declareRole(node_role, 0, params)
@@ -100,348 +312,232 @@ def processSimpleLink(node: etree._Element, base: str, ns: str, params: dict) ->
     return 0
 
 
-def processExtendedLink(element: etree._Element, base: str, ns: str, params: dict, handlerPrefix) -> int:
-    params['xlinkCount'] += 1
-    localLocCount = 0
+def processExtendedLink(element: etree._Element, base: str, ns: str, params: ConversionContext, handlerPrefix) -> int:
+    params.xlinkCount += 1
     xlink = {XLINK_ROLE: element.attrib.get(XLINK_ROLE),
              XLINK_ID: element.attrib.get(XLINK_ID),
              XLINK_BASE: element.attrib.get(XLINK_BASE),
-             'locators': list(),
              'arcs': list()}
+    # label -> locators and resources with that label
+    labels = defaultdict(list)
     for node in element:
-        localLocCount += 1
-        node_type = node.attrib.get(XLINK_TYPE, None)
+        attrib = node.attrib
+        node_type = attrib.get(XLINK_TYPE, None)
         if node_type == "locator":
-            params['locCount'] += 1
-            localLocCount += 1
-            locator = {key: node.attrib.get(key) for key
-                       in node.attrib if node.attrib.get(key) is not None}
-            locator['tag'] = node.tag
-            xlink['locators'].append(locator)
+            params.locCount += 1
+            label = attrib.get(XLINK_LABEL, None)
+            labels[label].append(Locator(node_type, attrib.get(XLINK_HREF, None), label))
         elif node_type == "resource":
-            params['resCount'] += 1
-            for key in node.attrib:
-                if key not in [XLINK_ROLE,
-                               XLINK_TYPE,
-                               XLINK_LABEL,
-                               XLINK_TITLE,
-                               XML_LANG,
-                               ID,
-                               AS,
-                               ABSTRACT,
-                               MERGE,
-                               NILS,
-                               STRICT,
-                               IMPLICITFILTERING,
-                               MATCHES,
-                               MATCHANY,
-                               BINDASSEQUENCE,
-                               NAME,
-                               OUTPUT,
-                               FALLBACKVALUE,
-                               ASPECTMODEL,
-                               TEST,
-                               PARENTCHILDORDER,
-                               SELECT,
-                               VARIABLE,
-                               DIMENSION,
-                               SCHEME]:
+            params.resCount += 1
+            for key in attrib:
+                if key not in RESOURCE_KNOWN_ATTRIBUTES:
                     print("Not supported yet: resource attribute '"+str(key)+"'")
-
-            localLocCount += 1
-            resource = {key: node.attrib.get(key) for key
-                        in node.attrib if node.attrib.get(key) is not None}
-            resource['node'] = node
-            resource['tag'] = node.tag
-            xlink['locators'].append(resource)
+            label = attrib.get(XLINK_LABEL, None)
+            labels[label].append(Locator(node_type, attrib.get(XLINK_HREF, None), label, node))
         elif node_type == "arc":
-            params['arcCount'] += 1
-            for key in node.attrib:
-                if key not in [XLINK_FROM,
-                               XLINK_TO,
-                               XLINK_ARCROLE,
-                               XLINK_TITLE,
-                               XLINK_TYPE,
-                               XBRLDT_CONTEXTELEMENT,
-                               XBRLDT_CLOSED,
-                               XBRLDT_TARGETROLE,
-                               XBRLDT_USABLE,
-                               ORDER,
-                               USE,
-                               PRIORITY,
-                               WEIGHT,
-                               NAME,
-                               COVER,
-                               COMPLEMENT,
-                               AXIS,
-                               PREFERRED_LABEL]:
+            params.arcCount += 1
+            for key in attrib:
+                if key not in ARC_KNOWN_ATTRIBUTES:
                     print("Not supported yet: arc attribute '"+str(key)+"'")
-            arc = {key: node.attrib.get(key) for key
-                   in node.attrib if node.attrib.get(key) is not None}
-            arc['tag'] = node.tag
-            xlink['arcs'].append(arc)
+            xlink['arcs'].append(Arc(attrib))
         else:
             logging.error("Unknown type found in xlink "+node_type)
 
-    labels_nodes = defaultdict(list)
-    for locator in xlink['locators']:
-        labels_nodes[locator[XLINK_LABEL]].append(locator)
-
     # fix up relations between arcs and locs
     for arc in xlink['arcs']:
-        arc['fromloc'] = list()
-        label = arc[XLINK_FROM]
-        if label in labels_nodes.keys():
-            arc['fromloc'] = labels_nodes[label]
-        arc['toloc'] = list()
-        label = arc[XLINK_TO]
-        if label in labels_nodes.keys():
-            arc['toloc'] = labels_nodes[label]
-
-    if params['output_format'] == 1:
-        XLink2RDF(element, xlink, base, ns, params, handlerPrefix)
-    elif params['output_format'] == 2:
+        arc.fromloc = labels.get(arc.fromLabel, ())
+        arc.toloc = labels.get(arc.toLabel, ())
+
+    if params.output_format == 2:
         XLink2RDFstar(element, xlink, base, ns, params, handlerPrefix)
+    else:
+        XLink2RDF(element, xlink, base, ns, params, handlerPrefix)
 
     return 0
 
 
-def process_resource(name: str, resource: dict, base: str, ns: str, params: dict, handlerPrefix) -> int:
+def process_resource(name: str, resource: 'Locator', base: str, ns: str, params: ConversionContext, handlerPrefix) -> int:
 
-    output = params['pagedata'][handlerPrefix]
-    output.write(name+" \n")
-    namespace = etree.QName(resource['node']).namespace
-    name = etree.QName(resource['node']).localname
-    prefix = params['namespaces'].get(namespace, None)
+    output = params.pagedata[handlerPrefix]
+    output.startSubject(name)
+    namespace, name = splitTag(resource.node.tag)
+    prefix = params.namespaces.get(namespace, None)
     if prefix is not None:
-        output.write("    xl:type "+prefix+":"+name+" ;\n")
+        output.triple("xl:type", prefix+":"+name)
     else:
-        output.write("    xl:type <"+namespace+"/"+name+"> ;\n")
+        output.triple("xl:type", "<"+namespace+"/"+name+">")
 
-    output.write(processAttribute(resource, XLINK_ROLE,
-                                  attr_type=None, params=params))
-    output.write(processAttribute(resource, XML_LANG,
-                                  attr_type=str, params=params))
-    output.write(processAttribute(resource, AS,
-                                  attr_type=None, params=params))
-
-    # arc_to boolean attributes
-    output.write(processAttribute(resource, ABSTRACT,
-                                  attr_type=bool, params=params))
-    output.write(processAttribute(resource, MERGE,
-                                  attr_type=bool, params=params))
-    output.write(processAttribute(resource, NILS,
-                                  attr_type=bool, params=params))
-    output.write(processAttribute(resource, STRICT,
-                                  attr_type=bool, params=params))
-    output.write(processAttribute(resource, IMPLICITFILTERING,
-                                  attr_type=bool, params=params))
-    output.write(processAttribute(resource, MATCHES,
-                                  attr_type=bool, params=params))
-    output.write(processAttribute(resource, MATCHANY,
-                                  attr_type=bool, params=params))
-    output.write(processAttribute(resource, BINDASSEQUENCE,
-                                  attr_type=bool, params=params))
-
-    # arc_to literal attributes
-    output.write(processAttribute(resource, NAME, attr_type=str, params=params))
-    output.write(processAttribute(resource, OUTPUT, attr_type=str, params=params))
-    output.write(processAttribute(resource, FALLBACKVALUE, attr_type=str, params=params))
-    output.write(processAttribute(resource, ASPECTMODEL, attr_type=str, params=params))
-    output.write(processAttribute(resource, TEST, attr_type=str, params=params))
-    output.write(processAttribute(resource, PARENTCHILDORDER, attr_type=str, params=params))
-    output.write(processAttribute(resource, SELECT, attr_type=str, params=params))
-    output.write(processAttribute(resource, VARIABLE, attr_type=str, params=params))
-    output.write(processAttribute(resource, DIMENSION, attr_type=str, params=params))
-    output.write(processAttribute(resource, SCHEME, attr_type=str, params=params))
+    RESOURCE_ATTRIBUTES.emit(resource.node, params, output)
 
     # we did not yet do 'id' to Literal
 
-    resource_text = resource['node'].text
+    resource_text = resource.node.text
     if resource_text and (resource_text) != '\n      ':
-        lang = resource.get('{http://www.w3.org/XML/1998/namespace}lang', None)
-        if lang is not None:
-            output.write('    rdf:literal """'+resource_text+'"""@'+lang+' ;\n')
-        else:
-            output.write('    rdf:literal """'+resource_text+'"""; \n')
+        lang = resource.node.get(XML_LANG, None)
+        output.triple('rdf:literal', Literal(resource_text, lang=lang, long=True))
     # else:
     #     resource_label = getTurtleName(resource, base, ns, params)
     #     if resource_label is not None:
     #         output.write('    xlink:label '+resource_label+' ;\n')
 
-    for child in resource['node']:
-        namespace = etree.QName(child).namespace
-        name = etree.QName(child).localname
-        prefix = params['namespaces'].get(namespace, None)
+    for child in resource.node:
+        namespace, name = splitTag(child.tag)
+        prefix = params.namespaces.get(namespace, None)
         if (len(child) > 0) and (child[0].text != '\n          '):
-            output.write("    "+prefix+":"+name+' '+child[0].text+' ;\n')
+            output.triple(prefix+":"+name, child[0].text)
         elif child.text and (child.text != '\n        '):
             if write_types:
-                output.write("    "+prefix+":"+name+' """'+child.text+'"""^^rdf:XMLLiteral ;\n')
+                output.triple(prefix+":"+name, Literal(child.text, 'rdf:XMLLiteral', long=True))
             else:
-                output.write("    "+prefix+":"+name+' """'+child.text+'""" ;\n')
+                output.triple(prefix+":"+name, Literal(child.text, long=True))
 
-    output.write("    .\n\n")
+    output.endSubject()
 
     return 0
 
 
-def XLink2RDF(node: etree._Element, xlink: dict, base: str, ns: str, params: dict, handlerPrefix) -> int:
+def XLink2RDF(node: etree._Element, xlink: dict, base: str, ns: str, params: ConversionContext, handlerPrefix) -> int:
 
-    output = params['pagedata'][handlerPrefix]
-    output.write("# XLINKS\n")
-    output.write("# localname: "+etree.QName(node.tag).localname+"\n")
-    output.write("# role: "+node.attrib.get(XLINK_ROLE, None)+"\n")
-    output.write("# base: "+base+"\n\n")
+    output = params.pagedata[handlerPrefix]
+    output.comment("XLINKS")
+    node_name = localName(node)
+    output.comment("localname: "+node_name)
+    output.comment("role: "+node.attrib.get(XLINK_ROLE, None))
+    output.comment("base: "+base)
 
-    if etree.QName(node.tag).localname == "footnoteLink":
+    if node_name == "footnoteLink":
         print("Footnote link found, skipping")
         node_role = None
     else:
         node_role = genRoleName(xlink[XLINK_ROLE], 0, params)
 
+    names = dict()
+    arcroles = dict()
     for arc in xlink['arcs']:
 
-        for arc_from in arc['fromloc']:
+        if not (arc.fromloc and arc.toloc):
+            continue
+        triple_predicate = arcroleName(arc.arcrole, arcroles, params)
+        from_names = locatorNames(arc.fromLabel, arc.fromloc, names, base, ns, params)
+        to_names = locatorNames(arc.toLabel, arc.toloc, names, base, ns, params)
 
-            for arc_to in arc['toloc']:
+        for arc_from, triple_subject in from_names:
 
-                blank = genLinkName(params, handlerPrefix)
+            for arc_to, triple_object in to_names:
 
-                triple_subject = getTurtleName(arc_from, base, ns, params)
-                triple_predicate = genRoleName(arc[XLINK_ARCROLE],
-                                               1, params)
-                triple_object = getTurtleName(arc_to, base, ns, params)
+                blank = genLinkName(params, handlerPrefix)
 
-                output.write(blank + " " + triple_predicate + " [\n")
-                output.write("    xl:type xl:link ;\n")
+                output.startSubject(blank)
+                output.startBlank(triple_predicate)
+                output.triple("xl:type", "xl:link")
 
                 if node_role:
-                    output.write("    xl:role "+node_role+" ;\n")
+                    output.triple("xl:role", node_role)
 
                 # process_arc_attributes
+                ARC_ATTRIBUTES.emit(arc.attrib, params, output)
+
+                output.triple("xl:from", triple_subject)
 
-                # addition to xbrlimport / Raggett
-                output.write(processAttribute(arc, XBRLDT_CONTEXTELEMENT, attr_type=str, params=params))
-                output.write(processAttribute(arc, XBRLDT_TARGETROLE, attr_type=None, params=params))
-                output.write(processAttribute(arc, XBRLDT_CLOSED, attr_type=bool, params=params))
-                output.write(processAttribute(arc, XBRLDT_USABLE, attr_type=bool, params=params))
-                output.write(processAttribute(arc, COVER, attr_type=str, params=params))
-                output.write(processAttribute(arc, AXIS, attr_type=str, params=params))
-                output.write(processAttribute(arc, COMPLEMENT, attr_type=bool, params=params))
-                output.write(processAttribute(arc, NAME, attr_type=str, params=params))
-                output.write(processAttribute(arc, PREFERRED_LABEL, attr_type=str, params=params))
-                # end of addition to xbrlimport / Raggett
-
-                output.write(processAttribute(arc, USE, attr_type=str, params=params))
-                output.write(processAttribute(arc, PRIORITY, attr_type=int, params=params))
-                output.write(processAttribute(arc, ORDER, attr_type=float, params=params))
-                output.write(processAttribute(arc, WEIGHT, attr_type=float, params=params))
-
-                output.write("    xl:from "+triple_subject+" ;\n")
-
-                locator_type = arc_to.get(XLINK_TYPE, None)
+                locator_type = arc_to.type
                 if locator_type == "resource":
                     name = genResourceName(params, handlerPrefix)
-                    output.write("    xl:to "+name+" ;\n")
-                    output.write("    ] .\n\n")
+                    output.triple("xl:to", name)
+                    output.endBlank()
+                    output.endSubject()
                     process_resource(name, arc_to, base, ns, params, handlerPrefix)
                 else:
-                    output.write("    xl:to "+triple_object+" ;\n")
-                    output.write("    ] .\n\n")
+                    output.triple("xl:to", triple_object)
+                    output.endBlank()
+                    output.endSubject()
 
 
     return 0
 
 
-def XLink2RDFstar(node: etree._Element, xlink: dict, base: str, ns: str, params: dict, handlerPrefix) -> int:
+def XLink2RDFstar(node: etree._Element, xlink: dict, base: str, ns: str, params: ConversionContext, handlerPrefix) -> int:
 
-    output = params['pagedata'][handlerPrefix]
+    output = params.pagedata[handlerPrefix]
 
 
-    output.write("# XLINKS\n")
-    output.write("# localname: "+etree.QName(node.tag).localname+"\n")
-    output.write("# role: "+node.attrib.get(XLINK_ROLE, None)+"\n")
-    output.write("# base: "+base+"\n\n")
+    output.comment("XLINKS")
+    node_name = localName(node)
+    output.comment("localname: "+node_name)
+    output.comment("role: "+node.attrib.get(XLINK_ROLE, None))
+    output.comment("base: "+base)
 
-    if etree.QName(node.tag).localname == "footnoteLink":
+    if node_name == "footnoteLink":
         print("Footnote link found, skipping")
         node_role = None
     else:
         node_role = genRoleName(xlink[XLINK_ROLE], 0, params)
 
+    names = dict()
+    arcroles = dict()
     for arc in xlink['arcs']:
-        for arc_from in arc['fromloc']:
-            for arc_to in arc['toloc']:
-                triple_subject = getTurtleName(arc_from, base, ns, params)
-                triple_predicate = genRoleName(arc[XLINK_ARCROLE],
-                                               1, params)
-                triple_object = getTurtleName(arc_to, base, ns, params)
-                output.write(triple_subject+" "+triple_predicate+" "+triple_object+" .\n")
-
-                found = False
-                for a in arc.keys():
-                    if a in [XLINK_ROLE,
-                             USE,
-                             PRIORITY,
-                             ORDER,
-                             WEIGHT,
-                             XBRLDT_CONTEXTELEMENT,
-                             XBRLDT_TARGETROLE,
-                             XBRLDT_CLOSED,
-                             XBRLDT_USABLE,
-                             COVER,
-                             AXIS,
-                             COMPLEMENT,
-                             NAME]:
-                        found = True
+        if not (arc.fromloc and arc.toloc):
+            continue
+        triple_predicate = arcroleName(arc.arcrole, arcroles, params)
+        from_names = locatorNames(arc.fromLabel, arc.fromloc, names, base, ns, params)
+        to_names = locatorNames(arc.toLabel, arc.toloc, names, base, ns, params)
+        found = any(a in STAR_ARC_ATTRIBUTES for a in arc.attrib)
+        for arc_from, triple_subject in from_names:
+            for arc_to, triple_object in to_names:
+                output.startSubject(triple_subject)
+                output.triple(triple_predicate, triple_object)
+                output.endSubject()
+
                 if found:
-                    output.write("<<"+triple_subject + " " + triple_predicate + " " + triple_object+">> \n")
-                    output.write(processAttribute(arc, XLINK_ROLE, attr_type=str, params=params))
-                    output.write(processAttribute(arc, USE, attr_type=str, params=params))
-                    output.write(processAttribute(arc, PRIORITY, attr_type=int, params=params))
-                    output.write(processAttribute(arc, ORDER, attr_type=float, params=params))
-                    output.write(processAttribute(arc, WEIGHT, attr_type=float, params=params))
-
-                    # addition to xbrlimport / Raggett
-                    output.write(processAttribute(arc, XBRLDT_CONTEXTELEMENT, attr_type=str, params=params))
-                    output.write(processAttribute(arc, XBRLDT_TARGETROLE, attr_type=None, params=params))
-                    output.write(processAttribute(arc, XBRLDT_CLOSED, attr_type=bool, params=params))
-                    output.write(processAttribute(arc, XBRLDT_USABLE, attr_type=bool, params=params))
-                    output.write(processAttribute(arc, COVER, attr_type=str, params=params))
-                    output.write(processAttribute(arc, AXIS, attr_type=str, params=params))
-                    output.write(processAttribute(arc, COMPLEMENT, attr_type=bool, params=params))
-                    output.write(processAttribute(arc, NAME, attr_type=str, params=params))
-                    output.write("    .\n")
-                output.write("\n")
-                locator_type = arc_to.get(XLINK_TYPE, None)
+                    output.startSubject("<<"+triple_subject + " " + triple_predicate + " " + triple_object+">>")
+                    STAR_ARC_ATTRIBUTES.emit(arc.attrib, params, output)
+                    output.endSubject()
+                locator_type = arc_to.type
                 if locator_type == "resource":
-                    process_resource(arc_to, base, ns, params, handlerPrefix)
+                    # the resource is the object of the arc
+                    process_resource(triple_object, arc_to, base, ns, params, handlerPrefix)
 
     return 0
 
 
-def genLinkName(params: dict, handlerPrefix) -> str:
-    params['linkCount'] += 1
-    name = handlerPrefix+":link"+str(params['linkCount'])
+def locatorNames(label: str, locators: list, names: dict, base: str, ns: str, params: ConversionContext) -> list:
+    # turtle names of the locators with a label, resolved once per extended link
+    resolved = names.get(label, None)
+    if resolved is None:
+        resolved = [(loc, getTurtleName(loc, base, ns, params)) for loc in locators]
+        names[label] = resolved
+    return resolved
+
+
+def arcroleName(arcrole: str, arcroles: dict, params: ConversionContext) -> str:
+    # turtle name of an arcrole, resolved once per extended link
+    name = arcroles.get(arcrole, None)
+    if name is None:
+        name = genRoleName(arcrole, 1, params)
+        arcroles[arcrole] = name
+    return name
+
+
+def genLinkName(params: ConversionContext, handlerPrefix) -> str:
+    params.linkCount += 1
+    name = handlerPrefix+":link"+str(params.linkCount)
     return name
 
 
-def genResourceName(params: dict, handlerPrefix) -> str:
-    params['resourceCount'] += 1
-    name = handlerPrefix+":resource"+str(params['resourceCount'])
+def genResourceName(params: ConversionContext, handlerPrefix) -> str:
+    params.resourceCount += 1
+    name = handlerPrefix+":resource"+str(params.resourceCount)
     return name
 
 
-def getTurtleName(loc: dict, base: str, ns: str, params: dict) -> str:
-    href = loc.get(XLINK_HREF, None)
+def getTurtleName(loc: 'Locator', base: str, ns: str, params: ConversionContext) -> str:
+    href = loc.href
     if href is not None:
-        href = expandRelativePath(href, base)
+        href = params.href_cache.expand(href, base)
         res, namespace, name = findId(href, base, params)
         if res != 0:
             # check if href path is in namespaces, presumable a bug in the eiopa taxonomy
             corrected_path = "/".join(href.split("/")[0:-1]).replace("s.", "S.").replace("eu/eu/", "eu/")
-            if corrected_path in params['namespaces'].keys():
+            if corrected_path in params.namespaces.keys():
                 namespace = corrected_path
             else:
                 # if not found then use parent's namespace and url fragment
@@ -450,22 +546,22 @@ def getTurtleName(loc: dict, base: str, ns: str, params: dict) -> str:
     else:
         # if no href then use parent's namespace with label
         namespace = ns
-        name = loc.get(XLINK_LABEL, None)
+        name = loc.label
 
     # if label ends with . then delete ., otherwise we get error in turtle
     if name[-1] == ".":
         name = name[0:-1]
 
-    prefix = params['namespaces'].get(namespace, None)
+    prefix = params.namespaces.get(namespace, None)
     if prefix is None:
         prefix = "_"
 
     return prefix+":"+name
 
 
-def genRoleName(role: str, arc: int, params: dict) -> str:
+def genRoleName(role: str, arc: int, params: ConversionContext) -> str:
     base, name = splitRole(role)
-    prefix = params['namespaces'].get(base, None)
+    prefix = params.namespaces.get(base, None)
     if prefix is None:
         if arc:
             prefix = genArcRolePrefixName(params)
@@ -475,38 +571,38 @@ def genRoleName(role: str, arc: int, params: dict) -> str:
     return prefix+":"+name
 
 
-def findId(uri: str, base: str, params: dict) -> tuple([int, str, str]):
-    found = params['id2elementTbl'].get(uri, None)
+def findId(uri: str, base: str, params: ConversionContext) -> tuple([int, str, str]):
+    found = params.id2elementTbl.get(uri, None)
     if found:
         return 0, found[0], found[1]
     return -1, '', ''
 
 
-def declareNamespace(prefix: str, uri: str, params: dict) -> None:
-    params['namespaces'][uri] = prefix
+def declareNamespace(prefix: str, uri: str, params: ConversionContext) -> None:
+    params.namespaces[uri] = prefix
     return None
 
 # used for gensymmed names for nodes
-def genArcRolePrefixName(params: dict) -> str:
-    params['arcroleNumber'] += 1
-    name = "arcrole"+str(params['arcroleNumber'])
+def genArcRolePrefixName(params: ConversionContext) -> str:
+    params.arcroleNumber += 1
+    name = "arcrole"+str(params.arcroleNumber)
     return name
 
 
-def genRolePrefixName(params: dict) -> str:
-    params['roleNumber'] += 1
-    name = "role"+str(params['roleNumber'])
+def genRolePrefixName(params: ConversionContext) -> str:
+    params.roleNumber += 1
+    name = "role"+str(params.roleNumber)
     return name
 
 
-def declareRole(uri: str, arc: int, params: dict) -> None:
+def declareRole(uri: str, arc: int, params: ConversionContext) -> None:
     base, name = splitRole(uri)
-    if base not in params['namespaces'].keys():
+    if base not in params.namespaces.keys():
         if arc:
             prefix = genArcRolePrefixName(params)
         else:
             prefix = genRolePrefixName(params)
-        params['namespaces'][base] = prefix
+        params.namespaces[base] = prefix
     return None
 
 def splitRole(uri: str) -> tuple([str, str]):
@@ -0,0 +1,69 @@
+import os
+import json
+from os.path import join, isfile, relpath
+
+MANIFEST_FILE: str = 'manifest.json'
+MANIFEST_JOURNAL_FILE: str = 'manifest.journal'
+
+
+class Manifest:
+
+    ''' Output files of every converted uri, with their sha256
+
+    manifest.json in the output directory maps each input uri to a list of
+    {"file": <path relative to the output directory>, "sha256": <digest>}
+    entries, one per file or shard, so incremental loaders can skip the
+    files that didn't change. As with the CompletionIndex, update() only
+    appends to manifest.journal, one uri per line; the journal is read
+    with manifest.json and folded into it by compact(), which main() and
+    batch() call when all instances are done.
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self.outputs = None     # read on first use
+
+    def load(self) -> dict:
+        if self.outputs is not None:
+            return self.outputs
+        self.outputs = dict()
+        manifest_file = join(self.path, MANIFEST_FILE)
+        if isfile(manifest_file):
+            with open(manifest_file, 'r', encoding='utf-8') as infile:
+                self.outputs.update(json.load(infile))
+        journal_file = join(self.path, MANIFEST_JOURNAL_FILE)
+        if isfile(journal_file):
+            with open(journal_file, 'r', encoding='utf-8') as infile:
+                for line in infile:
+                    # a line without newline is an interrupted write
+                    if line.endswith('\n'):
+                        self.outputs.update(json.loads(line))
+        return self.outputs
+
+    def __contains__(self, uri) -> bool:
+        return uri in self.load()
+
+    def __getitem__(self, uri) -> list:
+        return self.load()[uri]
+
+    def update(self, files: dict, digests: dict) -> None:
+        # files: uri -> output files, digests: output file -> sha256
+        lines = list()
+        for uri, names in files.items():
+            entry = [{'file': relpath(name, self.path), 'sha256': digests[name]} for name in names]
+            if self.outputs is not None:
+                self.outputs[uri] = entry
+            lines.append(json.dumps({uri: entry})+'\n')
+        if lines:
+            with open(join(self.path, MANIFEST_JOURNAL_FILE), 'a', encoding='utf-8') as outfile:
+                outfile.write(''.join(lines))
+
+    def compact(self) -> None:
+        outputs = self.load()
+        manifest_file = join(self.path, MANIFEST_FILE)
+        with open(manifest_file + '.tmp', 'w', encoding='utf-8') as outfile:
+            json.dump(outputs, outfile, indent=4, sort_keys=True)
+        os.replace(manifest_file + '.tmp', manifest_file)
+        journal_file = join(self.path, MANIFEST_JOURNAL_FILE)
+        if isfile(journal_file):
+            os.remove(journal_file)
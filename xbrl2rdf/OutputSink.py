@@ -0,0 +1,455 @@
+import os
+import io
+import json
+import gzip
+import shutil
+import hashlib
+import pathlib
+import logging
+import tempfile
+from abc import abstractmethod
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from rdflib import Literal as RDFLiteral
+
+from .Emitter import Emitter, TripleEmitter, Literal
+
+# size of the write buffer of each output file
+BUFFER_SIZE: int = 1024 * 1024
+INDENT: str = '    '
+# compression -> extension of the compressed files
+EXTENSIONS: dict = {'gzip': '.gz', 'zstd': '.zst'}
+
+
+class OutputSink:
+
+    ''' Output files of one conversion, one per namespace in params.pagedata
+
+    Each file is written incrementally: the triples go to a buffered
+    <file>.part as they are produced. The prefix header is only known at the
+    end, so close() writes the header to the final file and appends the
+    body after it. With compress the body is compressed while it is
+    written and the header becomes a gzip member (zstd frame) of its own;
+    concatenated members are a valid gzip (zstd) file, so the body is
+    appended without recompressing. compress is 'gzip' (or True), or 'zstd'
+    if the zstandard package is installed.
+    '''
+
+    extension: str = '.ttl'
+
+    def __init__(self, output: str, compress=False,
+                 shard_size: int = None, shard_triples: int = None):
+        self.output = output
+        self.compress = compression(compress)
+        self.shard_size = shard_size
+        self.shard_triples = shard_triples
+        self.files = dict()
+        # the values of files, so a name is found without scanning them
+        self.used = set()
+        self.namespaces = dict()
+
+    def open(self, namespace: str, urlfilename: str, source: str = None):
+        # the name is derived from the source uri, so a rerun writes the same files
+        extension = self.extension + EXTENSIONS.get(self.compress, '')
+        key = urlfilename if source is None else source
+        stem = self.output + urlfilename + '-' + hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+        output_file = stem + extension
+        # the same source opened twice
+        number = 1
+        while output_file in self.used:
+            output_file = stem + '-' + str(number) + extension
+            number += 1
+        self.files[namespace] = output_file
+        self.used.add(output_file)
+        return self.openFile(namespace, urlfilename, output_file)
+
+    def openFile(self, namespace: str, urlfilename: str, output_file: str):
+        return TurtleFile(output_file, self.compress, self.shard_size, self.shard_triples)
+
+
+class NTriplesSink(OutputSink):
+
+    ''' Output files in N-Triples, one triple per line and no header
+
+    Blank node labels are scoped by the namespace and the url of the
+    document, so the files of all conversions into one output directory
+    can be concatenated or loaded side by side.
+    '''
+
+    extension: str = '.nt'
+
+    def openFile(self, namespace: str, urlfilename: str, output_file: str):
+        return NTriplesFile(output_file, self.namespaces, blankScope(namespace, urlfilename),
+                            self.compress, self.shard_size, self.shard_triples)
+
+
+class NQuadsSink(NTriplesSink):
+
+    ''' Output files in N-Quads, with the provenance of the instance or the
+    url of the taxonomy document as graph name
+    '''
+
+    extension: str = '.nq'
+
+    def openFile(self, namespace: str, urlfilename: str, output_file: str):
+        return NQuadsFile(output_file, self.namespaces, blankScope(namespace, urlfilename),
+                          self.compress, self.shard_size, self.shard_triples)
+
+
+def blankScope(namespace: str, urlfilename: str) -> str:
+    # the same document gets the same labels on every run
+    return namespace + '_' + hashlib.sha1(urlfilename.encode('utf-8')).hexdigest()[:8]
+
+
+class PartFile:
+
+    ''' Text file written to a .part file and moved in place by close()
+
+    A conversion can produce thousands of dts files, so release() closes the
+    body when a document is done; a later write reopens it for appending.
+
+    With shard_size (bytes of text, before compression) or shard_triples
+    the file is split in shards: after the subject that reaches the limit, the next write starts
+    <name>_1<extension>, then <name>_2<extension> and so on. close() writes
+    the header in front of every shard, so each one can be loaded by itself,
+    and removes the shards beyond the last one that an earlier run of the
+    same document left behind.
+
+    The .part files get unique names (<name>.<random>.part) and close()
+    builds each file under a temporary name before it replaces the final
+    one, so processes that write the same output don't clobber each
+    other's files; the last one to finish wins.
+
+    The sha256 of each file written by close() is in digests.
+    '''
+
+    # triples in the current shard, counted by the emitter
+    triples: int = 0
+
+    def __init__(self, filename: str, compress=False,
+                 shard_size: int = None, shard_triples: int = None):
+        self.filename = filename
+        self.compress = compression(compress)
+        self.shard_size = shard_size
+        self.shard_triples = shard_triples
+        self.shards = [filename]
+        self.digests = dict()
+        self.size = 0
+        self.full = False
+        self.parts = {filename: partName(filename)}
+        self.part = self.parts[filename]
+        self.body = self.openBody('w')
+
+    def openBody(self, mode: str):
+        # appending to a gzip (zstd) file adds a new member (frame)
+        if self.compress == 'gzip':
+            return gzip.open(self.part, mode+'t', encoding='utf-8')
+        if self.compress == 'zstd':
+            return zstandard.open(self.part, mode+'t', encoding='utf-8')
+        return io.open(self.part, mode, encoding='utf-8', buffering=BUFFER_SIZE)
+
+    def write(self, data: str) -> None:
+        if self.full:
+            self.nextShard()
+        if self.body is None:
+            self.body = self.openBody('a')
+        data = data.replace('\u2264', '')
+        self.body.write(data)
+        self.size += len(data) if data.isascii() else len(data.encode('utf-8'))
+
+    def subjectDone(self) -> None:
+        if (self.shard_size is not None and self.size >= self.shard_size) or \
+           (self.shard_triples is not None and self.triples >= self.shard_triples):
+            # only start a shard if something is written to it
+            self.full = True
+
+    def nextShard(self) -> None:
+        self.release()
+        stem, extension = splitExtension(self.filename)
+        shard = stem + '_' + str(len(self.shards)) + extension
+        self.shards.append(shard)
+        self.parts[shard] = partName(shard)
+        self.part = self.parts[shard]
+        self.body = self.openBody('w')
+        self.size = 0
+        self.triples = 0
+        self.full = False
+
+    def release(self) -> None:
+        if self.body is not None:
+            self.body.close()
+            self.body = None
+
+    def dump(self, filename: str) -> None:
+        # copy the text written so far to filename, uncompressed
+        self.release()
+        with open(filename, 'wb') as outfile:
+            for shard in self.shards:
+                if self.compress == 'gzip':
+                    body = gzip.open(self.parts[shard], 'rb')
+                elif self.compress == 'zstd':
+                    body = zstandard.open(self.parts[shard], 'rb')
+                else:
+                    body = open(self.parts[shard], 'rb')
+                with body:
+                    shutil.copyfileobj(body, outfile, BUFFER_SIZE)
+
+    def close(self, header: str = '') -> list:
+        self.release()
+        header = header.encode('utf-8')
+        if self.compress == 'gzip' and header:
+            header = gzip.compress(header)
+        elif self.compress == 'zstd' and header:
+            header = zstandard.ZstdCompressor().compress(header)
+        for shard in self.shards:
+            digest = hashlib.sha256(header)
+            # named after the unique .part file, and made with the usual permissions
+            target = self.parts[shard][:-len('.part')] + '.tmp'
+            with open(target, 'wb') as outfile:
+                outfile.write(header)
+                with open(self.parts[shard], 'rb') as body:
+                    for chunk in iter(lambda: body.read(BUFFER_SIZE), b''):
+                        digest.update(chunk)
+                        outfile.write(chunk)
+            os.replace(target, shard)
+            os.remove(self.parts[shard])
+            self.digests[shard] = digest.hexdigest()
+        self.removeStaleShards()
+        return self.shards
+
+    def removeStaleShards(self) -> None:
+        # a run writes <name>_1 up to <name>_<n> without gaps, so the shards
+        # of an earlier run follow the last one of this run; one stat per
+        # document if there are none, rather than a listing of the directory
+        stem, extension = splitExtension(self.filename)
+        number = len(self.shards)
+        while True:
+            shard = stem + '_' + str(number) + extension
+            try:
+                os.remove(shard)
+            except FileNotFoundError:
+                break
+            number += 1
+
+    def discard(self) -> None:
+        self.release()
+        for shard in self.shards:
+            os.remove(self.parts[shard])
+
+
+def partName(filename: str) -> str:
+    # a new file next to filename that no other writer uses
+    directory, name = os.path.split(filename)
+    handle, part = tempfile.mkstemp(suffix='.part', prefix=name+'.', dir=directory or '.')
+    os.close(handle)
+    return part
+
+
+def compression(compress) -> str:
+    # False -> None, True -> 'gzip', 'zstd' falls back to gzip without zstandard
+    if not compress:
+        return None
+    if compress is True or compress == 'gzip':
+        return 'gzip'
+    if compress == 'zstd':
+        if zstandard is None:
+            logging.warning('zstandard is not installed, compressing with gzip')
+            return 'gzip'
+        return 'zstd'
+    raise ValueError('unknown compression: '+str(compress))
+
+
+def splitExtension(filename: str) -> tuple:
+    # 'name.ttl.gz' -> ('name', '.ttl.gz')
+    stem, extension = os.path.splitext(filename)
+    if extension in EXTENSIONS.values():
+        stem, inner = os.path.splitext(stem)
+        extension = inner + extension
+    return stem, extension
+
+
+def turtleLiteral(literal: Literal) -> str:
+    value = literal.value.replace('\\', '\\\\').replace('"', '\\"')
+    if literal.long:
+        text = '"""' + value + '"""'
+    else:
+        text = '"' + value.replace('\n', '\\n').replace('\r', '\\r') + '"'
+    if literal.datatype is not None:
+        return text + '^^' + literal.datatype
+    if literal.lang is not None:
+        return text + '@' + literal.lang
+    return text
+
+
+def ntTerm(term) -> str:
+    if isinstance(term, RDFLiteral):
+        return ntLiteral(term)
+    return term.n3()
+
+
+def ntLiteral(literal: RDFLiteral) -> str:
+    # n3() writes multi-line strings in triple quotes, N-Triples has one line per triple
+    text = '"' + str(literal).replace('\\', '\\\\').replace('"', '\\"') \
+                             .replace('\n', '\\n').replace('\r', '\\r') + '"'
+    if literal.datatype is not None:
+        return text + '^^<' + literal.datatype + '>'
+    if literal.language is not None:
+        return text + '@' + literal.language
+    return text
+
+
+class TurtleWriter(Emitter):
+
+    ''' Emitter that writes turtle text to self.write
+
+    Subjects are written as
+
+    subject
+        predicate object ;
+        predicate [
+            predicate object ;
+            ] ;
+        .
+    '''
+
+    depth: int = 0
+    # subject that has no triples written yet
+    subject: str = None
+    triples: int = 0
+
+    @abstractmethod
+    def write(self, data: str) -> None:
+        pass
+
+    def comment(self, text: str) -> None:
+        self.write('# ' + text + '\n')
+
+    def startSubject(self, subject: str) -> None:
+        self.subject = subject
+        self.depth = 1
+
+    def writeSubject(self) -> None:
+        self.write(self.subject + ' \n')
+        self.subject = None
+
+    def triple(self, predicate: str, obj) -> None:
+        if self.subject is not None:
+            self.writeSubject()
+        if isinstance(obj, Literal):
+            obj = turtleLiteral(obj)
+        self.triples += 1
+        self.write(INDENT * self.depth + predicate + ' ' + obj + ' ;\n')
+
+    def startBlank(self, predicate: str) -> None:
+        if self.subject is not None:
+            self.writeSubject()
+        self.triples += 1
+        self.write(INDENT * self.depth + predicate + ' [\n')
+        self.depth += 1
+
+    def endBlank(self) -> None:
+        self.write(INDENT * self.depth + '] ;\n')
+        self.depth -= 1
+
+    def collection(self, predicate: str, items: list) -> None:
+        if self.subject is not None:
+            self.writeSubject()
+        self.triples += 1 + 2 * len(items)
+        self.write(INDENT * self.depth + predicate + ' (\n')
+        for item in items:
+            if isinstance(item, Literal):
+                item = turtleLiteral(item)
+            self.write(INDENT * (self.depth + 1) + item + '\n')
+        self.write(INDENT * self.depth + ') ;\n')
+
+    def endSubject(self) -> None:
+        if self.subject is None:
+            self.write(INDENT + '.\n\n')
+        # else a subject without triples, nothing to write
+        self.subject = None
+        self.depth = 0
+        self.subjectDone()
+
+
+class TurtleFile(PartFile, TurtleWriter):
+
+    ''' Turtle output file of one namespace '''
+
+    def load(self, filename: str) -> None:
+        # append the turtle in filename, as written by dump(), subject by
+        # subject, so the shards are split as if it had been emitted again
+        subject = []
+        triples = 0
+        collection = False
+        literal = False
+        with io.open(filename, 'r', encoding='utf-8', newline='') as infile:
+            for line in infile:
+                subject.append(line)
+                if not literal:
+                    text = line.strip()
+                    if line == '\n' and len(subject) > 1 and subject[-2] == INDENT + '.\n':
+                        # the blank line after a subject
+                        self.write(''.join(subject))
+                        self.triples += triples
+                        self.subjectDone()
+                        subject = []
+                        triples = 0
+                        continue
+                    if line.startswith(INDENT) and text not in ('.', '] ;', ') ;'):
+                        # the first line of a triple, an item of a collection counts as two
+                        triples += 2 if collection else 1
+                        collection = collection or text.endswith('(')
+                    elif text == ') ;':
+                        collection = False
+                # an escaped quote in a long literal is \", so """ only opens or closes one
+                literal ^= line.count('"""') % 2 == 1
+        if subject:
+            self.write(''.join(subject))
+            self.triples += triples
+        self.release()
+
+
+class NTriplesFile(PartFile, TripleEmitter):
+
+    ''' N-Triples output file of one namespace
+
+    The triples are written as they are emitted, so the file can be split
+    on any line.
+    '''
+
+    def __init__(self, filename: str, namespaces: dict, scope: str, compress=False,
+                 shard_size: int = None, shard_triples: int = None):
+        PartFile.__init__(self, filename, compress, shard_size, shard_triples)
+        TripleEmitter.__init__(self, self.writeTriple, namespaces, scope,
+                               pathlib.Path(os.path.abspath(filename)).as_uri())
+
+    def writeTriple(self, s, p, o) -> None:
+        self.triples += 1
+        self.write(s.n3() + ' ' + p.n3() + ' ' + ntTerm(o) + ' .\n')
+
+    def close(self, header: str = '') -> list:
+        # prefixes are resolved in every line, the turtle header isn't needed
+        return PartFile.close(self)
+
+
+class NQuadsFile(NTriplesFile):
+
+    ''' N-Quads output file of one namespace
+
+    The graph name is set by setGraph; triples before it are in the
+    default graph.
+    '''
+
+    graph = None
+
+    def setGraph(self, graph: str) -> None:
+        self.graph = self.resolve(graph)
+
+    def writeTriple(self, s, p, o) -> None:
+        if self.graph is None:
+            return NTriplesFile.writeTriple(self, s, p, o)
+        self.triples += 1
+        self.write(s.n3() + ' ' + p.n3() + ' ' + ntTerm(o) + ' ' + self.graph.n3() + ' .\n')
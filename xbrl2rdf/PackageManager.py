@@ -17,7 +17,7 @@ from os.path import join
 from collections import OrderedDict
 
 from .FileSource import openFileSource
-from .utilfunctions import getLanguageCode, isAbsolute
+from .utilfunctions import getLanguageCode, isAbsolute, PrefixIndex
 
 
 class Taxonomies:
@@ -32,12 +32,14 @@ class Taxonomies:
     package dict
     {
         'name': package name
-        'status': enabled | disabled
+        'status': enabled | disabled | unavailable (zip file missing)
         'version': version (such as 2009)
         'fileDate': 2001-01-01
         'url': web http (before caching) or local file location
         'description': text
         'remappings': dict of prefix:url of each remapping
+        'fileSize': size of the package file in bytes
+        'fileMtime': modification time of the package file
     }
 
     '''
@@ -48,7 +50,7 @@ class Taxonomies:
         self.mapping = dict()
         try:
             self.jsonFile = join(path, "taxonomyPackages.json")
-            with io.open(self.JsonFile, 'rt', encoding='utf-8') as f:
+            with io.open(self.jsonFile, 'rt', encoding='utf-8') as f:
                 self.config = json.load(f)
         except Exception:
             pass
@@ -75,6 +77,57 @@ class Taxonomies:
         return None
 
 
+    def refresh(self, path):
+        ''' update the packages with the zip files in path
+
+        Saved entries keep their place in the list, their index is the taxo
+        argument of the command line. An entry is only re-read when the size
+        or modification time of its zip file changed; an entry whose zip
+        file is missing is kept with status 'unavailable'. Zip files that are
+        not in the list yet are appended in sorted order. Returns True if the
+        config changed.
+        '''
+        packagesList = self.config["packages"]
+        before = json.dumps(packagesList, sort_keys=True)
+        known = set()
+        for i, _packageInfo in enumerate(packagesList):
+            url = _packageInfo['URL']
+            known.add(os.path.normpath(url))
+            if not os.path.isfile(url):
+                if _packageInfo['status'] == 'enabled':
+                    _packageInfo['status'] = 'unavailable'
+                continue
+            packagesList[i] = self.refreshPackage(url, _packageInfo)
+        for f in sorted(os.listdir(path)):
+            url = join(path, f)
+            if (os.path.normpath(url) in known or
+                not (os.path.isfile(url) and f[-3:] == 'zip')):
+                continue
+            _packageInfo = self.refreshPackage(url, None)
+            if _packageInfo is not None:
+                packagesList.append(_packageInfo)
+        return json.dumps(packagesList, sort_keys=True) != before
+
+
+    def refreshPackage(self, url, _packageInfo):
+        ''' saved entry of the zip file url, re-read if the zip file changed '''
+        stat = os.stat(url)
+        if (_packageInfo is not None and
+            _packageInfo.get('fileSize') == stat.st_size and
+            _packageInfo.get('fileMtime') == stat.st_mtime):
+            if _packageInfo['status'] == 'unavailable':
+                _packageInfo['status'] = 'enabled'
+            return _packageInfo
+        newPackageInfo = packageInfo(url, packageManifestName=None)
+        if not (newPackageInfo and newPackageInfo.get("name")):
+            return _packageInfo
+        if _packageInfo is not None and _packageInfo['status'] == 'disabled':
+            newPackageInfo['status'] = 'disabled'
+        newPackageInfo['fileSize'] = stat.st_size
+        newPackageInfo['fileMtime'] = stat.st_mtime
+        return newPackageInfo
+
+
     def rebuildRemappings(self):
         remappings = self.config["remappings"]
         remappings.clear()
@@ -130,6 +183,8 @@ class Taxonomies:
                                                              "supersededTaxonomyPackages": '12', 
                                                              "versioningReports": '13',
                                                              'remappings': '14',
+                                                             'fileSize': '15',
+                                                             'fileMtime': '16',
                                                              }.get(k[0],k[0])))
                            for _packageInfo in self.config['packages']]),
              ('remappings',OrderedDict(sorted(self.config['remappings'].items())))))
@@ -303,6 +358,7 @@ def parsePackage(filesource, metadataFile, fileBase, errors=[]):
 
     entryPoints = defaultdict(list)
     pkg["entryPoints"] = entryPoints
+    remappingsIndex = PrefixIndex(remappings)
 
     for entryPointSpec in tree.iter(tag=nsPrefix + "entryPoint"):
         name = None
@@ -336,18 +392,14 @@ def parsePackage(filesource, metadataFile, fileBase, errors=[]):
     
             #perform prefix remappings
             remappedUrl = resolvedUrl
-            longestPrefix = 0
-            for mapFrom, mapTo in remappings.items():
-                if remappedUrl.startswith(mapFrom):
-                    prefixLength = len(mapFrom)
-                    if prefixLength > longestPrefix:
-                        _remappedUrl = remappedUrl[prefixLength:]
-                        if not (_remappedUrl[0] in (os.sep, '/') or mapTo[-1] in (os.sep, '/')):
-                            _remappedUrl = mapTo + os.sep + _remappedUrl
-                        else:
-                            _remappedUrl = mapTo + _remappedUrl
-                        longestPrefix = prefixLength
-            if longestPrefix:
+            mapFrom = remappingsIndex.match(remappedUrl)
+            if mapFrom:
+                mapTo = remappings[mapFrom]
+                _remappedUrl = remappedUrl[len(mapFrom):]
+                if not (_remappedUrl[0] in (os.sep, '/') or mapTo[-1] in (os.sep, '/')):
+                    _remappedUrl = mapTo + os.sep + _remappedUrl
+                else:
+                    _remappedUrl = mapTo + _remappedUrl
                 remappedUrl = _remappedUrl.replace(os.sep, "/")  # always used as FileSource select
                 
             # find closest language description
@@ -10,32 +10,56 @@ from .const import XBRLDT_TYPEDDOMAINREF, SUBSTITUTIONGROUP, NILLABLE, \
 from .const import FIXED, EXT_ENUM_LINKROLE, EXT_ENUM_DOMAIN, \
                    EXT_ENUM_HEADUSABLE
 
-from .utilfunctions import processAttribute, registerNamespaces, \
+from .ConversionContext import ConversionContext
+from .utilfunctions import AttributeEmitter, TagDispatch, registerNamespaces, \
                            appendDtsQueue, prependDtsQueue
 from datetime import datetime
 from lxml import etree
 import logging
 
-def processSchema(root: etree._Element, base: str, params: dict, handlerPrefix) -> int:
+# attributes of xsd:element written as triples, in this order
+ELEMENT_ATTRIBUTES: AttributeEmitter = AttributeEmitter([
+    (XBRLI_PERIODTYPE, str),
+    (XBRLI_BALANCE, str),
+    (XBRLDT_TYPEDDOMAINREF, str),
+    (MODEL_CREATIONDATE, datetime),
+    (MODEL_TODATE, datetime),
+    (MODEL_MODIFICATIONDATE, datetime),
+    (MODEL_DOMAIN, str),
+    (MODEL_HIERARCHY, str),
+    (MODEL_ISDEFAULTMEMBER, str),
+    (ENUM_DOMAIN, str),
+    (ENUM_LINKROLE, str),
+    (SUBSTITUTIONGROUP, None),
+    (NILLABLE, bool),
+    (ABSTRACT, bool),
+    (BALANCE, str),
+    #begin sec additions
+    (FIXED, bool),
+    (EXT_ENUM_LINKROLE, None),
+    (EXT_ENUM_DOMAIN, None),
+    (EXT_ENUM_HEADUSABLE, bool)])
+
+
+def processSchema(root: etree._Element, base: str, params: ConversionContext, handlerPrefix) -> int:
 
     # skip core schemas
     targetNs = root.attrib.get("targetNamespace", None)
-    if targetNs in params['namespaces_to_skip']:
+    if targetNs in params.namespaces_to_skip:
         return 0
 
     logging.info("processing schema "+base)
 
     registerNamespaces(root, base, params)
-    processElements(root, base, targetNs, params, handlerPrefix)
+    res2 = processSchemaChildren(root, base, targetNs, params, handlerPrefix)
     xpathobj = root.xpath("//link:linkbaseRef",
                           namespaces={"link":
                                       "http://www.xbrl.org/2003/linkbase"})
     res1 = processLinkBases(xpathobj, base, targetNs, params)
-    res2 = processImportedSchema(root, base, targetNs, params)
     return res1 or res2
 
 
-def processLinkBases(nodes: etree._Element, base: str, targetNs: str, params: dict) -> int:
+def processLinkBases(nodes: etree._Element, base: str, targetNs: str, params: ConversionContext) -> int:
     res = 0
     logging.info("importing linkbases for base "+base)
     for node in nodes:
@@ -53,146 +77,89 @@ def processLinkBases(nodes: etree._Element, base: str, targetNs: str, params: di
     return res
 
 
-def processImportedSchema(root: etree._Element, base: str, ns: str, params: dict) -> int:
-    res = 0
+def processSchemaChildren(root: etree._Element, base: str, targetNs: str, params: ConversionContext, handlerPrefix) -> int:
+    # elements and imported schemas, in one pass over the children of the root
+
+    output = params.pagedata[handlerPrefix]
+
+    output.comment("SCHEMAS")
+    output.comment("target namespace: " + targetNs)
+    output.comment("base: "+base)
     logging.info("importing schema for base "+base)
     if len(root) == 0:
         logging.error("couldn't find first child element.")
         return -1
-    for node in root:
-        if (node.tag != "{http://www.w3.org/2001/XMLSchema}import") and \
-           (node.tag != "{http://www.w3.org/2001/XMLSchema}include"):
-            continue
-        schema = node.attrib.get("schemaLocation", None)
-        namespace = node.attrib.get("namespace", None)
-        prependDtsQueue(XBRL_LINKBASE, schema, base, namespace, 0, params)
-    return res
-
-
-def processElements(root: etree._Element, base: str, targetNs: str, params: dict, handlerPrefix) -> int:
-
-    output = params['pagedata'][handlerPrefix]
-    namespaces = params['namespaces']
-
-    # child_name = etree.QName(child).localname
-    # child_namespace = etree.QName(child).namespace
-
-    output.write("# SCHEMAS\n")
-    output.write("# target namespace:" + targetNs)
-    output.write("# base: "+base+"\n\n")
     unformed_attributes = set()
     for child in root:
-        if child.tag == "{http://www.w3.org/2001/XMLSchema}element":
-            for item in child.attrib.keys():
-                if item not in ['name',
-                                'id',
-                                'type',
-                                XBRLI_PERIODTYPE,
-                                XBRLI_BALANCE,
-                                MODEL_CREATIONDATE,
-                                MODEL_TODATE,
-                                MODEL_FROMDATE,
-                                MODEL_MODIFICATIONDATE,
-                                MODEL_HIERARCHY,
-                                MODEL_DOMAIN,
-                                MODEL_ISDEFAULTMEMBER,
-                                ENUM_LINKROLE,
-                                ENUM_DOMAIN,
-                                XBRLDT_TYPEDDOMAINREF,
-                                SUBSTITUTIONGROUP,
-                                NILLABLE,
-                                ABSTRACT,
-                                BALANCE,
-                                #begin additions
-                                FIXED,
-                                EXT_ENUM_LINKROLE,
-                                EXT_ENUM_DOMAIN,
-                                EXT_ENUM_HEADUSABLE
-                                ]:
-                    if str(item) not in unformed_attributes:
-                        print("Line:",child.sourceline,"Unknown attribute in element: " + str(item))
-                    unformed_attributes.add(str(item))
-
-
-            child_name = child.attrib.get('name', None)
-            prefix = namespaces.get(targetNs, None)
-            output.write(prefix+":"+child_name+" \n")
-
-            child_id = child.attrib.get('id', None)
-
-            child_type = child.attrib.get('type', None)
-            if child_type:
-                # hack for type="string" not type="xsd:string"
-                if ":" not in child_type:
-                    child_type = "xsd:"+child_type
-                elif child_type[0:3] == "xs:":  # strange error, in xbrl?
-                    child_type = "xsd:"+child_type[3:]
-                output.write("    rdf:type "+child_type+" ;\n")
-
-            output.write(processAttribute(child, XBRLI_PERIODTYPE,
-                                          attr_type=str, params=params))
-            output.write(processAttribute(child, XBRLI_BALANCE,
-                                          attr_type=str, params=params))
-            output.write(processAttribute(child, XBRLDT_TYPEDDOMAINREF,
-                                          attr_type=str, params=params))
-
-            output.write(processAttribute(child, MODEL_CREATIONDATE,
-                                          attr_type=datetime, params=params))
-            output.write(processAttribute(child, MODEL_TODATE,
-                                          attr_type=datetime, params=params))
-            output.write(processAttribute(child, MODEL_MODIFICATIONDATE,
-                                          attr_type=datetime, params=params))
-
-            output.write(processAttribute(child, MODEL_DOMAIN,
-                                          attr_type=str, params=params))
-            output.write(processAttribute(child, MODEL_HIERARCHY,
-                                          attr_type=str, params=params))
-            output.write(processAttribute(child, MODEL_ISDEFAULTMEMBER,
-                                          attr_type=str, params=params))
-
-            output.write(processAttribute(child, ENUM_DOMAIN,
-                                          attr_type=str, params=params))
-            output.write(processAttribute(child, ENUM_LINKROLE,
-                                          attr_type=str, params=params))
-
-            output.write(processAttribute(child, SUBSTITUTIONGROUP,
-                                          attr_type=None, params=params))
-            output.write(processAttribute(child, NILLABLE,
-                                          attr_type=bool, params=params))
-            output.write(processAttribute(child, ABSTRACT,
-                                          attr_type=bool, params=params))
-            output.write(processAttribute(child, BALANCE,
-                                          attr_type=str, params=params))
-            #begin sec additions
-            output.write(processAttribute(child, FIXED,
-                                          attr_type=bool, params=params))
-            output.write(processAttribute(child, EXT_ENUM_LINKROLE,
-                                          attr_type=None, params=params))
-            output.write(processAttribute(child, EXT_ENUM_DOMAIN,
-                                          attr_type=None, params=params))
-            output.write(processAttribute(child, EXT_ENUM_HEADUSABLE,
-                                          attr_type=bool, params=params))
-            output.write('    . \n\n')
-
-            params['conceptCount'] += 1
-
-            # add base#id, targetnamespace:name to dictionary
-            if child_id is None:
-                logging.info("name = "+child_name)
-            else:
-                addId(base, child_id, targetNs, child_name, params)
+        handler = SCHEMA_CHILDREN[child]
+        if handler is not None:
+            handler(child, base, targetNs, params, output, unformed_attributes)
     if len(unformed_attributes) > 0:
         print('unformed_attribs')
         for thing in unformed_attributes:
             print(thing)
     return 0
 
-def addId(xsdUri: str, child_id: str, targetNs: str, name: str, params: dict) -> int:
+
+def processImportedSchema(node: etree._Element, base: str, params: ConversionContext) -> int:
+    schema = node.attrib.get("schemaLocation", None)
+    namespace = node.attrib.get("namespace", None)
+    prependDtsQueue(XBRL_LINKBASE, schema, base, namespace, 0, params)
+    return 0
+
+
+def processElement(child: etree._Element, base: str, targetNs: str, params: ConversionContext, output, unformed_attributes: set) -> int:
+    namespaces = params.namespaces
+    for item in child.attrib.keys():
+        if item not in ELEMENT_ATTRIBUTES and item not in ('name', 'id', 'type', MODEL_FROMDATE):
+            if str(item) not in unformed_attributes:
+                print("Line:",child.sourceline,"Unknown attribute in element: " + str(item))
+            unformed_attributes.add(str(item))
+
+
+    child_name = child.attrib.get('name', None)
+    prefix = namespaces.get(targetNs, None)
+    output.startSubject(prefix+":"+child_name)
+
+    child_id = child.attrib.get('id', None)
+
+    child_type = child.attrib.get('type', None)
+    if child_type:
+        # hack for type="string" not type="xsd:string"
+        if ":" not in child_type:
+            child_type = "xsd:"+child_type
+        elif child_type[0:3] == "xs:":  # strange error, in xbrl?
+            child_type = "xsd:"+child_type[3:]
+        output.triple("rdf:type", child_type)
+
+    ELEMENT_ATTRIBUTES.emit(child, params, output)
+    output.endSubject()
+
+    params.conceptCount += 1
+
+    # add base#id, targetnamespace:name to dictionary
+    if child_id is None:
+        logging.info("name = "+child_name)
+    else:
+        addId(base, child_id, targetNs, child_name, params)
+    return 0
+
+
+# handlers of the children of xsd:schema, as called by processSchemaChildren; others are skipped
+SCHEMA_CHILDREN = TagDispatch({
+    "{http://www.w3.org/2001/XMLSchema}element": processElement,
+    "{http://www.w3.org/2001/XMLSchema}import": lambda child, base, targetNs, params, output, unformed_attributes:
+        processImportedSchema(child, base, params),
+    "{http://www.w3.org/2001/XMLSchema}include": lambda child, base, targetNs, params, output, unformed_attributes:
+        processImportedSchema(child, base, params)})
+
+
+def addId(xsdUri: str, child_id: str, targetNs: str, name: str, params: ConversionContext) -> int:
     key = xsdUri + "#" + child_id
     value = (targetNs, name)
     if key[0] == '#':
         logging.info('addId: uri = "' + key +
                      '", ns = "' + targetNs +
                      '", name="' + name)
-    params['id2elementTbl'][key] = value
+    params.id2elementTbl[key] = value
     return 0
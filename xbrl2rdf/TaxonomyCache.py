@@ -0,0 +1,144 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+from os.path import join, isdir
+
+from .DtsProcessor import dispatchDtsQueue
+from .CompletionIndex import CompletionIndex
+from .ConversionContext import ConversionContext
+from .utilfunctions import addNamespace, printNamespaces
+
+# handler prefix of the instance document, see loadXML
+INSTANCE_PREFIX: str = 'instance'
+# bump when the layout of a cache entry or the generated turtle changes
+CACHE_VERSION: int = 1
+
+
+class TaxonomyCache:
+
+    ''' On-disk cache of compiled taxonomies
+
+    An entry holds everything the translation of a DTS produced: the
+    id2elementTbl, the namespace table and the turtle of every DTS file.
+    Entries are keyed by taxonomy package and entry point(s), so the DTS
+    of an entry point is translated once and reused by later instances.
+
+    <path>/<key>/entry.json     tables and list of documents
+    <path>/<key>/<prefix>.cache turtle of each DTS file
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+    def key(self, params: ConversionContext) -> str:
+        entry_points = [item[1] for item in params.dts_queue]
+        material = json.dumps([CACHE_VERSION,
+                               params.package_uri,
+                               params.package_date,
+                               params.output_format,
+                               entry_points])
+        return hashlib.sha1(material.encode('utf-8')).hexdigest()
+
+    def load(self, key: str) -> dict:
+        entry_file = join(self.path, key, 'entry.json')
+        try:
+            with open(entry_file, 'r', encoding='utf-8') as infile:
+                return json.load(infile)
+        except (OSError, ValueError):
+            return None
+
+    def turtle(self, key: str, prefix: str) -> str:
+        return join(self.path, key, prefix+'.cache')
+
+    def store(self, key: str, entry: dict, documents: dict) -> None:
+        # build the entry in a private directory and move it in place,
+        # concurrent workers compiling the same DTS keep the first entry
+        tmp_path = join(self.path, key+'.'+str(os.getpid())+'.tmp')
+        os.makedirs(tmp_path, exist_ok=True)
+        for prefix, document in documents.items():
+            document.dump(join(tmp_path, prefix+'.cache'))
+        with open(join(tmp_path, 'entry.json'), 'w', encoding='utf-8') as outfile:
+            json.dump(entry, outfile)
+        try:
+            os.rename(tmp_path, join(self.path, key))
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def clear(self) -> None:
+        for name in os.listdir(self.path):
+            if isdir(join(self.path, name)):
+                shutil.rmtree(join(self.path, name), ignore_errors=True)
+
+
+def dispatchCachedDtsQueue(cache: TaxonomyCache, params: ConversionContext, completed_output) -> int:
+    key = cache.key(params)
+    entry = cache.load(key)
+    if entry is not None:
+        logging.info("taxonomy cache hit "+key)
+        return restoreDts(cache, key, entry, params, completed_output)
+    logging.info("taxonomy cache miss "+key)
+    return compileDts(cache, key, params, completed_output)
+
+
+def compileDts(cache: TaxonomyCache, key: str, params: ConversionContext, completed_output) -> int:
+    known_prefixes = set(params.pagedata.keys())
+    # translate with a private completion index so the entry holds the
+    # complete DTS, including files that earlier runs already wrote
+    compiled = CompletionIndex()
+    res = dispatchDtsQueue(params, compiled)
+    prefixes = [prefix for prefix in params.pagedata.keys() if prefix not in known_prefixes]
+    header = printNamespaces(params)
+    # the instance prefix belongs to the compiling instance, not to the DTS
+    namespaces = {uri: prefix for uri, prefix in params.namespaces.items()
+                  if prefix != INSTANCE_PREFIX}
+    entry = {'namespaces': namespaces,
+             'id2elementTbl': params.id2elementTbl,
+             'dtsCount': params.dtsCount,
+             'processed': sorted(compiled),
+             'header': header,
+             'documents': [{'prefix': prefix,
+                            'uri': params.sources[prefix],
+                            'urlfilename': params.urlfilename[prefix]}
+                           for prefix in prefixes]}
+    if res == 0 and params.errorCount == 0:
+        cache.store(key, entry, {prefix: params.pagedata[prefix]
+                                 for prefix in prefixes})
+    for prefix in prefixes:
+        if params.sources[prefix] in completed_output:
+            params.pagedata[prefix].discard()
+            del params.pagedata[prefix]
+            del params.urlfilename[prefix]
+            del params.sources[prefix]
+        else:
+            params.headers[prefix] = header
+    completed_output.update(compiled)
+    return res
+
+
+def restoreDts(cache: TaxonomyCache, key: str, entry: dict, params: ConversionContext, completed_output) -> int:
+    params.dts_queue.clear()
+    bound = set(params.namespaces.values())
+    for uri, prefix in entry['namespaces'].items():
+        # prefixes bound by this conversion keep their uri, entries written
+        # before the instance prefix was left out still hold it
+        if uri not in params.namespaces and prefix in bound:
+            continue
+        addNamespace(prefix, uri, params)
+    for uri, value in entry['id2elementTbl'].items():
+        params.id2elementTbl[uri] = tuple(value)
+    params.dtsCount = max(params.dtsCount, entry['dtsCount'])
+    for document in entry['documents']:
+        uri = document['uri']
+        if uri in completed_output:
+            continue
+        prefix = document['prefix']
+        params.pagedata[prefix] = params.output_sink.open(prefix, document['urlfilename'], uri)
+        params.pagedata[prefix].load(cache.turtle(key, prefix))
+        params.urlfilename[prefix] = document['urlfilename']
+        params.sources[prefix] = uri
+        params.headers[prefix] = entry['header']
+    completed_output.update(entry['processed'])
+    return 0
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import http.client
+from os.path import join, isfile
+from urllib.parse import urlsplit, urljoin
+
+# redirects followed for one request
+MAX_REDIRECTS: int = 5
+
+
+class OfflineError(OSError):
+
+    ''' Raised for a document that is not in the web cache in offline mode '''
+
+
+class WebCache:
+
+    ''' On-disk cache of documents downloaded over http(s)
+
+    The content is stored by its sha256, the url of a document points to
+    its content and holds the ETag and Last-Modified headers it was
+    served with:
+
+    <path>/objects/<sha256>     content
+    <path>/urls/<sha1 of url>   {url, sha256, etag, last_modified, fetched}
+
+    A cached document is returned without contacting the server. With
+    revalidate a conditional request is sent first and the cached copy is
+    kept on 304 Not Modified. In offline mode nothing is downloaded and a
+    document that is not cached raises OfflineError.
+
+    Connections are kept alive and reused per host, one pool per thread.
+    '''
+
+    def __init__(self, path: str, offline: bool = False, revalidate: bool = False,
+                 retries: int = 3, timeout: float = 30):
+        self.path = path
+        self.offline = offline
+        self.revalidate = revalidate
+        self.retries = retries
+        self.timeout = timeout
+        self.local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(join(self.path, 'objects'), exist_ok=True)
+        os.makedirs(join(self.path, 'urls'), exist_ok=True)
+
+    def metaFile(self, url: str) -> str:
+        return join(self.path, 'urls', hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+    def objectFile(self, digest: str) -> str:
+        return join(self.path, 'objects', digest)
+
+    def lookup(self, url: str) -> dict:
+        try:
+            with open(self.metaFile(url), 'r', encoding='utf-8') as infile:
+                meta = json.load(infile)
+        except (OSError, ValueError):
+            return None
+        if meta.get('url') != url or not isfile(self.objectFile(meta['sha256'])):
+            return None
+        return meta
+
+    def get(self, url: str) -> bytes:
+        meta = self.lookup(url)
+        if meta is not None and (self.offline or not self.revalidate):
+            self.hits += 1
+            return self.read(meta)
+        if self.offline:
+            raise OfflineError(url + ' is not in the web cache')
+        status, headers, content = self.fetch(url, meta)
+        if status == 304:
+            self.hits += 1
+            return self.read(meta)
+        self.misses += 1
+        self.store(url, headers, content)
+        return content
+
+    def read(self, meta: dict) -> bytes:
+        with open(self.objectFile(meta['sha256']), 'rb') as infile:
+            return infile.read()
+
+    def store(self, url: str, headers, content: bytes) -> None:
+        digest = hashlib.sha256(content).hexdigest()
+        object_file = self.objectFile(digest)
+        if not isfile(object_file):
+            writeAtomic(object_file, content)
+        meta = {'url': url,
+                'sha256': digest,
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'fetched': time.time()}
+        writeAtomic(self.metaFile(url), json.dumps(meta).encode('utf-8'))
+
+    def fetch(self, url: str, meta: dict = None):
+        # returns status, headers and body, following redirects
+        request_headers = dict()
+        if meta is not None:
+            if meta.get('etag'):
+                request_headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                request_headers['If-Modified-Since'] = meta['last_modified']
+        for redirect in range(MAX_REDIRECTS + 1):
+            status, headers, content = self.request(url, request_headers)
+            if status in (301, 302, 303, 307, 308) and headers.get('Location'):
+                url = urljoin(url, headers['Location'])
+                continue
+            if status == 304 and meta is not None:
+                return status, headers, None
+            if status != 200:
+                raise OSError('HTTP status ' + str(status) + ' for ' + url)
+            return status, headers, content
+        raise OSError('too many redirects for ' + url)
+
+    def request(self, url: str, request_headers: dict):
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        for attempt in range(self.retries + 1):
+            connection = self.connection(parts.scheme, parts.netloc)
+            try:
+                connection.request('GET', path, headers=request_headers)
+                response = connection.getresponse()
+                content = response.read()
+            except (http.client.HTTPException, OSError) as err:
+                # the server may have closed a kept-alive connection
+                self.dropConnection(parts.scheme, parts.netloc)
+                if attempt == self.retries:
+                    raise
+                logging.info('retrying ' + url + ': ' + str(err))
+                time.sleep(0.5 * 2 ** attempt)
+                continue
+            if response.will_close:
+                self.dropConnection(parts.scheme, parts.netloc)
+            return response.status, response.headers, content
+
+    def connection(self, scheme: str, netloc: str):
+        pool = self.pool()
+        key = (scheme, netloc)
+        if key not in pool:
+            if scheme == 'https':
+                pool[key] = http.client.HTTPSConnection(netloc, timeout=self.timeout)
+            else:
+                pool[key] = http.client.HTTPConnection(netloc, timeout=self.timeout)
+        return pool[key]
+
+    def dropConnection(self, scheme: str, netloc: str) -> None:
+        connection = self.pool().pop((scheme, netloc), None)
+        if connection is not None:
+            connection.close()
+
+    def pool(self) -> dict:
+        if not hasattr(self.local, 'connections'):
+            self.local.connections = dict()
+        return self.local.connections
+
+    def close(self) -> None:
+        # closes the connections of the calling thread
+        for connection in self.pool().values():
+            connection.close()
+        self.pool().clear()
+
+
+def writeAtomic(filename: str, content: bytes) -> None:
+    tmp_file = filename + '.' + str(os.getpid()) + '.' + str(threading.get_ident()) + '.tmp'
+    with open(tmp_file, 'wb') as outfile:
+        outfile.write(content)
+    os.replace(tmp_file, filename)
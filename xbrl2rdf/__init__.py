@@ -11,3 +11,10 @@ from .InstanceProcessor import *
 from .SchemaProcessor import *
 from .LinkbaseProcessor import *
 from .PackageManager import *
+from .TaxonomyCache import *
+from .CompletionIndex import *
+from .Manifest import *
+from .Emitter import *
+from .OutputSink import *
+from .WebCache import *
+from .ConversionContext import *
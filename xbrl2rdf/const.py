@@ -50,6 +50,15 @@ SCHEME: str = 'scheme'
 
 XBRLI_PERIODTYPE: str = '{http://www.xbrl.org/2003/instance}periodType'
 XBRLI_BALANCE: str = '{http://www.xbrl.org/2003/instance}balance'
+XBRLI_ENTITY: str = '{http://www.xbrl.org/2003/instance}entity'
+XBRLI_IDENTIFIER: str = '{http://www.xbrl.org/2003/instance}identifier'
+XBRLI_PERIOD: str = '{http://www.xbrl.org/2003/instance}period'
+XBRLI_INSTANT: str = '{http://www.xbrl.org/2003/instance}instant'
+XBRLI_FOREVER: str = '{http://www.xbrl.org/2003/instance}forever'
+XBRLI_SEGMENT: str = '{http://www.xbrl.org/2003/instance}segment'
+XBRLI_SCENARIO: str = '{http://www.xbrl.org/2003/instance}scenario'
+XBRLDI_EXPLICITMEMBER: str = '{http://xbrl.org/2006/xbrldi}explicitMember'
+XBRLDI_TYPEDMEMBER: str = '{http://xbrl.org/2006/xbrldi}typedMember'
 MODEL_CREATIONDATE: str = '{http://www.eurofiling.info/xbrl/ext/model}creationDate'
 MODEL_TODATE: str = '{http://www.eurofiling.info/xbrl/ext/model}toDate'
 MODEL_FROMDATE: str = '{http://www.eurofiling.info/xbrl/ext/model}fromDate'
@@ -1,5 +1,6 @@
 import os
 import urllib.parse
+from collections import OrderedDict
 from io import StringIO
 from urllib.request import urlopen, urlparse
 from lxml import etree
@@ -8,67 +9,69 @@ try:
 except ImportError:
     import re
 from .const import predicates
+from .Emitter import Literal
 from datetime import datetime
 import logging
 
 parentDirectory = None
 write_types = False
 
-def processAttribute(node, attr, attr_type=None,
-                     text_prefix='    ', params=None, print_result=False):
-    if text_prefix == '    ':
-        line_end: str = ' ;\n'
+def compileAttribute(attr, attr_type=None):
+    ''' function that turns a value of attr into the object of its triple
+
+        attr_type is bool, str, int, float or datetime for a literal (with
+        its datatype if write_types), 'as-is' for the value itself and None
+        for an iri, as a prefixed name if its base is a known namespace '''
+    datatypes = {bool: 'xsd:boolean', str: 'rdf:XMLLiteral', int: 'xsd:integer',
+                 float: 'xsd:decimal', datetime: 'xsd:dateTime'}
+    if attr_type in datatypes:
+        datatype = datatypes[attr_type] if write_types else None
+        long = attr_type == str
+        return lambda attr_value, params: Literal(attr_value, datatype, long=long)
+    elif attr_type == 'as-is':
+        return lambda attr_value, params: attr_value
     else:
-        line_end: str = ' .\n'
-
-    if isinstance(node, dict):
-        attr_value = node.get(attr, None)
-    else:
-        attr_value = node.attrib.get(attr, None)
-    if attr_value:
-        attr_value = attr_value.replace("\\", "\\\\")
-        if attr_type == bool:
-            if write_types:
-                return text_prefix+predicates[attr]+' "'+attr_value+'"^^xsd:boolean'+line_end
-            else:
-                return text_prefix+predicates[attr]+' "'+attr_value+'"'+line_end
-        elif attr_type == str:
-            if write_types:
-                return text_prefix+predicates[attr]+' """'+attr_value+'"""^^rdf:XMLLiteral'+line_end
-            else:
-                return text_prefix+predicates[attr]+' """'+attr_value+'"""'+line_end
-        elif attr_type == int:
-            if write_types:
-                return text_prefix+predicates[attr]+' "'+attr_value+'"^^xsd:integer'+line_end
-            else:
-                return text_prefix+predicates[attr]+' "'+attr_value+'"'+line_end
-        elif attr_type == float:
-            if write_types:
-                return text_prefix+predicates[attr]+' "'+attr_value+'"^^xsd:decimal'+line_end
-            else:
-                return text_prefix+predicates[attr]+' "'+attr_value+'"'+line_end
-        elif attr_type == datetime:
-            if write_types:
-                return text_prefix+predicates[attr]+' "'+attr_value+'"^^xsd:dateTime'+line_end
-            else:
-                return text_prefix+predicates[attr]+' "'+attr_value+'"'+line_end
-        elif attr_type == 'as-is':
-            if print_result:
-                print('as is value:',text_prefix+predicates[attr]+' '+attr_value+line_end)
-            return text_prefix+predicates[attr]+' "'+attr_value+line_end
-        else:
-            name = attr_value.split("/")[-1]
-            base = "/".join(attr_value.split("/")[0:-1])
-            prefix = params['namespaces'].get(base, None)
+        def formatName(attr_value, params):
+            base, sep, name = attr_value.rpartition("/")
+            prefix = params.namespaces.get(base, None)
             if prefix:
-                attr_value = prefix+":"+name
-            else:
-                attr_value = "<"+attr_value+">"
-            if print_result:
-                print('none value:', text_prefix+predicates[attr]+' '+attr_value+line_end)
-            return text_prefix+predicates[attr]+' '+attr_value+line_end
-    else:
-        return ''
+                return prefix+":"+name
+            return "<"+attr_value+">"
+        return formatName
+
+
+class AttributeEmitter:
+
+    ''' Triples of the attributes of one kind of node
+
+    Compiled once from a list of (attribute, attr_type), see
+    compileAttribute for the attr_types. emit() only looks at
+    the attributes the node has, and emits them in the order of the list.
+    '''
+
+    def __init__(self, attributes):
+        # attribute -> [(position, predicate, formatter)], an attribute may be listed twice
+        self.formatters = dict()
+        for position, (attr, attr_type) in enumerate(attributes):
+            self.formatters.setdefault(attr, []).append(
+                (position, predicates[attr], compileAttribute(attr, attr_type)))
+
+    def __contains__(self, attr) -> bool:
+        return attr in self.formatters
+
+    def emit(self, node, params, output) -> None:
+        # node is an element or its attributes, output an Emitter
+        attrib = node.attrib if isinstance(node, etree._Element) else node
+        formatters = self.formatters
+        found = []
+        for attr, attr_value in attrib.items():
+            if attr in formatters and attr_value:
+                for position, predicate, formatter in formatters[attr]:
+                    found.append((position, predicate, formatter(attr_value, params)))
+        if len(found) > 1:
+            found.sort(key=lambda item: item[0])
+        for position, predicate, obj in found:
+            output.triple(predicate, obj)
 
 
 def prependDtsQueue(uri_type, uri, base, ns, force, params):
@@ -78,33 +81,28 @@ def prependDtsQueue(uri_type, uri, base, ns, force, params):
     """
     uri = expandRelativePath(uri, base)
     if force != 0:
-        params['dts_processed'].remove(uri)
-    for entry in params['dts_queue']:
-        if entry[1] == uri:
-            params['dts_queue'].remove(entry)
-    params['dts_queue'].insert(0, (uri_type, uri, ns))
+        params.dts_processed.discard(uri)
+    params.dts_queue.prepend((uri_type, uri, ns))
     return 0
 
 
 def appendDtsQueue(uri_type, uri, base, ns, force, params):
-    """ put uri at end of dtsqueue if not already present
+    """ put uri at end of dtsqueue, moving it if already present
     """
     uri = expandRelativePath(uri, base)
     if force != 0:
-        params['dts_processed'].remove(uri)
-    for entry in params['dts_queue']:
-        if entry[1] == uri:
-            params['dts_queue'].remove(entry)
-    #     return -1
-
-    params['dts_queue'].append((uri_type, uri, ns))
+        params.dts_processed.discard(uri)
+    params.dts_queue.append((uri_type, uri, ns))
     return 0
 
-def xmlFromFile(filename):
-    '''takes a url (or local filename) and returns root XML object'''
+def xmlFromFile(filename, webCache=None):
+    '''takes a url (or local filename) and returns root XML object
+    downloads go through webCache, a WebCache, if given'''
     assert ('../' not in filename), 'garbage file ref got through: \n' + filename
     if 'http' in filename:
         filename=filename.replace('\\','/')
+        if webCache is not None:
+            return etree.fromstring(webCache.get(filename))
         return etree.parse(urlopen(filename)).getroot()
     return etree.parse(filename).getroot()
 
@@ -140,6 +138,42 @@ def fixFileReference(url, parentDirectory, first=True):
         result = result + '#' + parts.fragment
     return result
 
+class PrefixIndex:
+
+    ''' Longest prefix match over the keys of a prefix: replacement dict
+
+    The prefixes are grouped by length. A lookup tries the distinct
+    lengths from long to short with one dict lookup each, so its cost
+    depends on the number of distinct lengths, not on the number of
+    prefixes.
+    '''
+
+    def __init__(self, mapping=None):
+        self.mapping = dict(mapping or {})
+        self.lengths = sorted(set(len(prefix) for prefix in self.mapping), reverse=True)
+
+    def match(self, url):
+        # longest prefix of url in the index, None if there is none
+        mapping = self.mapping
+        for length in self.lengths:
+            if length <= len(url) and url[:length] in mapping:
+                return url[:length]
+        return None
+
+    def __contains__(self, url) -> bool:
+        return self.match(url) is not None
+
+    def __len__(self) -> int:
+        return len(self.mapping)
+
+    def remap(self, url):
+        # replace the longest matching prefix of url
+        prefix = self.match(url)
+        if prefix is None:
+            return url
+        return self.mapping[prefix] + url[len(prefix):]
+
+
 def isHttpUrl(url):
     return isinstance(url, str) and (url.startswith("http://") or url.startswith("https://"))
 
@@ -158,6 +192,117 @@ def isAbsolute(url):
     return False
 
 
+def parseXML(content):
+    return etree.fromstring(content,
+                            parser=etree.XMLParser(remove_comments=True))
+
+
+# tag -> (namespace, localname); the tags of a conversion repeat, so each is split once
+tagNames: dict = dict()
+
+
+def splitTag(tag):
+    # same as (etree.QName(tag).namespace, etree.QName(tag).localname)
+    names = tagNames.get(tag, None)
+    if names is None:
+        if tag[0] == '{':
+            namespace, _, localname = tag[1:].partition('}')
+            names = (namespace, localname)
+        else:
+            names = (None, tag)
+        tagNames[tag] = names
+    return names
+
+
+def localName(node):
+    return splitTag(node.tag)[1]
+
+
+class TagDispatch:
+
+    ''' Handler of an element by its tag
+
+    handlers maps localnames, for elements in any namespace, or Clark tags
+    ({namespace}localname) to handlers; other elements get default. The
+    handler found for a tag is kept, so the next element with that tag
+    costs one dict lookup.
+    '''
+
+    def __init__(self, handlers: dict, default=None):
+        self.handlers = handlers
+        self.default = default
+        self.tags = dict()
+
+    def __getitem__(self, node):
+        tag = node.tag
+        try:
+            return self.tags[tag]
+        except KeyError:
+            # also kept when it is None, for tags that have no handler
+            handler = self.handlers.get(tag, None) or \
+                      self.handlers.get(splitTag(tag)[1], self.default)
+            self.tags[tag] = handler
+            return handler
+
+
+def prefetchXML(uri, params):
+    ''' read and parse a dts file on a prefetch thread
+
+    Only reads from params. Returns None for files that loadXML has to
+    handle itself: downloads, files that aren't there and files of at
+    least stream_size bytes.
+    '''
+    size_limit = params.stream_size
+    if isHttpUrl(uri):
+        if not params.xbrl_zipfile.isZip:
+            # tar files can't be read from several threads
+            return None
+        mappedUri = os.path.abspath(params.xbrl_zipfile.mappedUrl(uri))
+        filePath = params.uri2file.get(mappedUri, None)
+        if filePath is None:
+            return None
+        fs = params.xbrl_zipfile.fs
+        if size_limit is not None and fs.getinfo(filePath).file_size >= size_limit:
+            return None
+        with fs.open(filePath, "r") as fp:
+            content = fp.read()
+    else:
+        if uri[0:6] == "file:/":
+            filePath = uri[6:]
+        else:
+            filePath = uri
+        if size_limit is not None and os.path.getsize(filePath) >= size_limit:
+            return None
+        with open(filePath, "rb") as fp:
+            content = fp.read()
+    return parseXML(content)
+
+
+class StreamSource:
+
+    ''' DTS file of at least stream_size bytes, see loadXML
+
+    Only the file, or the member of the taxonomy package, is kept; every
+    open() starts reading it again, so the handler can parse it
+    incrementally without the content being read into memory first.
+    '''
+
+    __slots__ = ('archive', 'path')
+
+    def __init__(self, path: str, archive=None):
+        self.archive = archive
+        self.path = path
+
+    def open(self):
+        if self.archive is not None:
+            return self.archive.open(self.path, "r")
+        return open(self.path, "rb")
+
+    def read(self) -> bytes:
+        with self.open() as fp:
+            return fp.read()
+
+
 def loadXML(handler, uri, ns, params, completed_output, do_downloads = True):
     #skip if already in completed_output
     #target_output = ''.join(os.path.basename(uri).split(".")[0:-1]) + '.ttl'
@@ -166,27 +311,49 @@ def loadXML(handler, uri, ns, params, completed_output, do_downloads = True):
         return 0
     else:
         print('processing:', uri)
-    completed_output.append(uri)
+    completed_output.add(uri)
     global parentDirectory
     res = 0
     xmlRoot = None
-    if uri in params['dts_processed']:
+    if uri in params.dts_processed:
         return 0  # already loaded
     else:
-        params['dts_processed'].append(uri)
+        params.dts_processed.add(uri)
 
-    if isHttpUrl(uri):
-        if parentDirectory == None:
-            parentDirectory = getParentDirectory(uri)
-        mappedUri = os.path.abspath(params['xbrl_zipfile'].mappedUrl(uri))
-        if mappedUri not in params['uri2file'].keys() and do_downloads:
+    # dts files of at least stream_size bytes go to the handler as a StreamSource
+    streamed = handler.__name__ == 'processDtsFile' and params.stream_size is not None
+
+    if isHttpUrl(uri) and parentDirectory == None:
+        parentDirectory = getParentDirectory(uri)
+    if params.prefetcher is not None and handler.__name__ == 'processDtsFile':
+        # None if the prefetcher didn't get to it or failed, read it here then
+        xmlRoot = params.prefetcher.take(uri)
+
+    if xmlRoot is not None:
+        pass  # parsed by the prefetcher
+
+    elif isHttpUrl(uri):
+        mappedUri = os.path.abspath(params.xbrl_zipfile.mappedUrl(uri))
+        if mappedUri not in params.uri2file.keys() and do_downloads:
             logging.info('xbrl uri "'+uri+'" not found in zip file, attempting download\n')
-            xmlRoot = xmlFromFile(fixFileReference(uri,parentDirectory))
-        elif mappedUri in params['uri2file'].keys():
-            filePath = params['uri2file'][mappedUri]
             try:
-                fp = params['xbrl_zipfile'].fs.open(filePath, "r")
-                content = fp.read()
+                xmlRoot = xmlFromFile(fixFileReference(uri,parentDirectory),
+                                      params.web_cache)
+            except OSError as err:
+                logging.error('Could not download '+uri+': '+str(err)+'\n')
+                params.errorCount += 1
+                return -1
+        elif mappedUri in params.uri2file.keys():
+            filePath = params.uri2file[mappedUri]
+            fs = params.xbrl_zipfile.fs
+            try:
+                if streamed and params.xbrl_zipfile.isZip and \
+                        fs.getinfo(filePath).file_size >= params.stream_size:
+                    # large dts files are parsed incrementally by the handler
+                    xmlRoot = StreamSource(filePath, fs)
+                else:
+                    fp = fs.open(filePath, "r")
+                    content = fp.read()
             except:
                 logging.info('Could not read '+uri+' from zip-file, even though file present\n')
                 return -1
@@ -202,38 +369,44 @@ def loadXML(handler, uri, ns, params, completed_output, do_downloads = True):
             filePath = uri[6:]
         else:
             filePath = uri
-        try:
-            fp = open(filePath, "rb")
-            content = fp.read()
-            fp.close()
-        except:
-            params['log'].write("Error: "+uri+" is malformed\n")
-            params['errorCount'] += 1
-            return -1
+        if handler.__name__ == 'processInstanceStream':
+            # streaming handlers parse the file themselves
+            xmlRoot = filePath
+        elif streamed and os.path.isfile(filePath) and os.path.getsize(filePath) >= params.stream_size:
+            xmlRoot = StreamSource(filePath)
+        else:
+            try:
+                fp = open(filePath, "rb")
+                content = fp.read()
+                fp.close()
+            except:
+                logging.error(uri+" is malformed")
+                params.errorCount += 1
+                return -1
     if xmlRoot is not None:
         root = xmlRoot
     else:
-        root = etree.fromstring(content,
-                            parser=etree.XMLParser(remove_comments=True))
+        root = parseXML(content)
     if root is None:
-        params['log'].write("Error: document has no root element.\n")
-        params['errorCount'] += 1
+        logging.error("document has no root element.")
+        params.errorCount += 1
         return -1
     #add a ns for the instance, or a numbered dts namespace
-    if handler.__name__ == 'processInstance':
+    if handler.__name__ in ('processInstance', 'processInstanceStream'):
         addNamespace("instance", os.path.basename(uri), params)
         handlerPrefix = 'instance'
     elif handler.__name__ == 'processDtsFile':
-        params['dtsCount'] = params['dtsCount'] + 1
-        dtsCount = str(params['dtsCount'])
+        params.dtsCount = params.dtsCount + 1
+        dtsCount = str(params.dtsCount)
         currentDts = 'dts'+dtsCount
         #safeUri = urllib.parse.quote(uri, safe='')
         #full https filenames are too long for OS sometimes
         simpleUri = ''.join(os.path.basename(uri).split(".")[0:-1])
         addNamespace(currentDts, uri, params)
-        params['urlfilename'][currentDts] = '/taxonomies/' + simpleUri
-        params['pagedata'][currentDts] = StringIO()
-        params['sources'][currentDts] = uri
+        params.urlfilename[currentDts] = '/taxonomies/' + simpleUri
+        params.pagedata[currentDts] = params.output_sink.open(currentDts, params.urlfilename[currentDts], uri)
+        params.pagedata[currentDts].setGraph('<'+uri+'>')
+        params.sources[currentDts] = uri
         handlerPrefix = currentDts
     else:
         assert(False), 'unregistered handler: '+ handler.__name__
@@ -241,8 +414,11 @@ def loadXML(handler, uri, ns, params, completed_output, do_downloads = True):
     #print('in loadXML, handler:', handler.__name__, 'prefix', handlerPrefix)
 
     res = handler(root, uri, ns, params, handlerPrefix)
+    if handlerPrefix != 'instance':
+        # the document is done, don't keep its output file open
+        params.pagedata[handlerPrefix].release()
 
-    params['fileCount'] += 1
+    params.fileCount += 1
 
     return res
 
@@ -251,13 +427,13 @@ def registerNamespaces(root, base, params):
     nsmap = root.nsmap
     for prefix in nsmap.keys():
         uri = nsmap[prefix]
-        if uri not in params['namespaces_to_skip']:
+        if uri not in params.namespaces_to_skip:
             addNamespace(prefix, uri, params)
     return 0
 
 
 def addNamespace(prefix, uri, params):
-    namespaces = params['namespaces']
+    namespaces = params.namespaces
     found = namespaces.get(uri, None)
     if found:
         if prefix != found:
@@ -266,12 +442,12 @@ def addNamespace(prefix, uri, params):
             return -1
         del namespaces[uri]
     namespaces[uri] = prefix
-    # params['prefixes'].write("@prefix "+prefix+": <"+uri+">.\n")
+    # params.prefixes.write("@prefix "+prefix+": <"+uri+">.\n")
     return 0
 
 
 def printNamespaces(params):
-    namespaces = params['namespaces']
+    namespaces = params.namespaces
     res: str = ''
     for uri in namespaces:
         if uri[-1] != "#":
@@ -280,6 +456,46 @@ def printNamespaces(params):
             res += "@prefix "+namespaces[uri]+": <"+uri+">.\n"
     return res
 
+# entries of the HrefCache of a conversion
+HREF_CACHE_SIZE: int = 65536
+
+
+class HrefCache:
+
+    ''' Bounded LRU of expandRelativePath results, keyed by (href, base)
+
+    The locators of the label, reference and definition linkbases of a DTS
+    point to the same concepts over and over, so the urljoin of an href
+    against the linkbase it appears in is done once per linkbase and kept
+    until size newer pairs push it out. hits and misses are reported with
+    the conversion statistics.
+    '''
+
+    def __init__(self, size=HREF_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def expand(self, href, base):
+        key = (href, base)
+        entries = self.entries
+        uri = entries.get(key, None)
+        if uri is not None:
+            self.hits += 1
+            entries.move_to_end(key)
+            return uri
+        self.misses += 1
+        uri = expandRelativePath(href, base)
+        entries[key] = uri
+        if len(entries) > self.size:
+            entries.popitem(last=False)
+        return uri
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
 def expandRelativePath(relPath, base):
 
     # if relPath[0:7]=="http://":
@@ -15,105 +15,237 @@ from datetime import datetime
 import rdflib
 import time
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from .PackageManager import Taxonomies
 from .FileSource import openFileSource
-from .InstanceProcessor import processInstance
-from .DtsProcessor import dispatchDtsQueue
+from .InstanceProcessor import processInstance, processInstanceStream, entryPoints
+from .DtsProcessor import DtsQueue, DtsPrefetcher, dispatchDtsQueue
+from .TaxonomyCache import TaxonomyCache, dispatchCachedDtsQueue
+from .CompletionIndex import CompletionIndex, EMITTED_FILE, EMITTED_JOURNAL_FILE
+from .OutputSink import OutputSink, NTriplesSink, NQuadsSink
+from .Manifest import Manifest
+from .WebCache import WebCache
+from .ConversionContext import ConversionContext
 from .utilfunctions import addNamespace, printNamespaces, \
                         expandRelativePath, isHttpUrl, loadXML
 
 TAXONOMY_PATH = join("data", "taxonomies")
-taxonomies: list = [f for f in listdir(TAXONOMY_PATH) if isfile(join(TAXONOMY_PATH, f)) and f[-3:] == 'zip']
-manager = Taxonomies(TAXONOMY_PATH)
-for taxonomy in taxonomies:
-    manager.addPackage(join(TAXONOMY_PATH, taxonomy))
-manager.rebuildRemappings()
-manager.save()
-taxo_choices: str = "\n".join([str(idx)+": "+str(item['name']) for idx, item in enumerate(manager.config['packages'])])
+# taxonomy packages, discovered on first use by getManager()
+manager: Taxonomies = None
+
+
+def getManager() -> Taxonomies:
+    global manager
+    if manager is None:
+        manager = Taxonomies(TAXONOMY_PATH)
+        # only new or changed zip files are opened
+        if manager.refresh(TAXONOMY_PATH):
+            manager.rebuildRemappings()
+            manager.save()
+    return manager
+
+
+def taxoChoices() -> str:
+    return "\n".join([str(idx)+": "+str(item['name'])+(" (unavailable)" if item['status'] == 'unavailable' else "")
+                      for idx, item in enumerate(getManager().config['packages'])])
 
 
 #@click.command()
 #@click.option('--url', default=join("data", "instances", "qrs_240_instance.xbrl"), prompt="input file")
-#@click.option('--taxo', default=2, prompt=taxo_choices)
+#@click.option('--taxo', default=2, prompt=taxoChoices())
 #@click.option('--output', default=join("data", "rdf"), prompt="output directory")
-#@click.option('--output_format', default=1, prompt="1: rdf-turtle\n2: rdf-star-turtle\n")
+#@click.option('--output_format', default=1, prompt="1: rdf-turtle\n2: rdf-star-turtle\n3: n-triples\n4: n-quads\n")
 
 def main():
-    #list of the files already processed
-    completed_output = list()
     #extensions_to_process = ['.xbrl']
     directory = tk.filedialog.askdirectory(title = 'Select input directory')
     output = tk.filedialog.askdirectory(title = 'Select output directory')
     extensions = tk.simpledialog.askstring(title ='Enter extensions separated by whitespace', prompt = 'Enter extensions separated by whitespace')
-    extensions = re.split('\s+', extensions)
+    extensions = re.split(r'\s+', extensions)
+    workers = tk.simpledialog.askinteger(title = 'Worker processes', prompt = 'Number of worker processes (1 = sequential)',
+                                         initialvalue = os.cpu_count(), minvalue = 1)
     #setup output directories
     Path(output + "/data").mkdir(parents=True, exist_ok=True)
     Path(output + "/taxonomies").mkdir(parents=True, exist_ok=True)
-    #check to see if json file exists
-    for filename in os.listdir(output):
-        if filename == 'preloads.json':
-            with open(join(output, 'preloads.json'), 'r') as infile:
-                completed_output=json.load(infile)
+    #the files already processed, from preloads.json and its journal
+    completed_output = CompletionIndex(output)
+    urls = list()
     for filename in os.listdir(directory):
         extension = os.path.splitext(filename)[1][1:]
         if extension in extensions:
-            url = os.path.join(directory,filename)
-            #setting the default taxo since isn't used with local files
-            #and ttl rathern than ttl* since those are the options we need
-            go(2, 1, url, output, completed_output)
+            urls.append(os.path.join(directory,filename))
+    #setting the default taxo since isn't used with local files
+    #and ttl rathern than ttl* since those are the options we need
+    cache_dir = join(output, '.taxonomy_cache')
+    web_cache_dir = join(output, '.web_cache')
+    if workers is not None and workers > 1:
+        batch(2, 1, urls, output, completed_output, workers, cache_dir, web_cache_dir)
+    else:
+        for url in urls:
+            go(2, 1, url, output, completed_output, cache_dir=cache_dir,
+               web_cache_dir=web_cache_dir)
+        Manifest(output).compact()
+
+
+# completion index of the current worker process, seeded by the pool initializer
+_worker_completed_output: CompletionIndex = None
+# hashed context and unit names of the current worker process, with dedup
+_worker_emitted: CompletionIndex = None
+
+
+def _initWorker(uris, emitted) -> None:
+    global _worker_completed_output, _worker_emitted
+    _worker_completed_output = CompletionIndex(uris=uris)
+    _worker_emitted = CompletionIndex(uris=emitted)
+
+
+def _batchWorker(taxo: int, output_format: int, url, output, cache_dir, web_cache_dir, dedup,
+                 shard_size, shard_triples, compress) -> tuple:
+    # every call to go() builds its own params, so only the completion index
+    # is shared between the instances handled by one worker process; a failed
+    # conversion has taken its uris out of the indexes again
+    try:
+        res = go(taxo, output_format, url, output, _worker_completed_output,
+                 save_preloads=False, cache_dir=cache_dir, web_cache_dir=web_cache_dir, dedup=dedup,
+                 shard_size=shard_size, shard_triples=shard_triples, compress=compress,
+                 emitted=_worker_emitted)
+    except Exception as err:
+        logging.error("failed to process "+url+": "+str(err))
+        res = -1
+    return res, _worker_completed_output.drain(), _worker_emitted.drain()
+
+
+def batch(taxo: int, output_format: int, urls, output, completed_output, workers=None, cache_dir=None,
+          web_cache_dir=None, dedup=False, shard_size=None, shard_triples=None, compress=False) -> int:
+    """convert the instances in urls with a pool of worker processes
+
+    The first instance of every entry point is converted here, before the
+    pool starts, so each DTS is translated once. Each worker starts from a
+    copy of completed_output, which then holds the DTS files; the uris
+    completed by the workers are merged into completed_output, which is
+    checkpointed as each instance finishes. Workers share the taxonomy
+    cache in cache_dir and the web cache in web_cache_dir, if given. With
+    dedup the hashed names of contexts and units are merged the same way,
+    into emitted.json; two workers may both write a context, which only
+    repeats its triples. An instance that fails is left out of
+    completed_output, so a rerun converts it again, and batch() returns -1.
+    """
+    pending = [url for url in urls if url not in completed_output]
+    if not pending:
+        return 0
+    res = 0
+    emitted = emittedIndex(output) if dedup else CompletionIndex()
+    first = dict()
+    for url in pending:
+        first.setdefault(entryPoints(url), url)
+    for url in first.values():
+        try:
+            if go(taxo, output_format, url, output, completed_output,
+                  cache_dir=cache_dir, web_cache_dir=web_cache_dir, dedup=dedup,
+                  shard_size=shard_size, shard_triples=shard_triples, compress=compress,
+                  emitted=emitted) < 0:
+                res = -1
+        except Exception as err:
+            logging.error("failed to process "+url+": "+str(err))
+            res = -1
+    pending = [url for url in pending if url not in first.values()]
+    if pending:
+        res = min(res, _runPool(taxo, output_format, pending, output, completed_output, emitted,
+                                workers, cache_dir, web_cache_dir, dedup, shard_size, shard_triples,
+                                compress))
+    Manifest(output).compact()
+    return res
 
-def go(taxo: int, output_format: int, url, output, completed_output) -> int:
-    log_file: str = join(output, "".join(os.path.basename(url).split(".")[0:-1])+".log")
-    logging.basicConfig(filename=log_file, level=logging.DEBUG, filemode="w")
 
-    fp_taxo_zipfile: FileSource = openFileSource(manager.config['packages'][taxo]['URL'])
-    fp_taxo_zipfile.mappedPaths = manager.config['packages'][taxo]["remappings"]
-    fp_taxo_zipfile.open()
+def _runPool(taxo: int, output_format: int, urls, output, completed_output, emitted, workers,
+             cache_dir, web_cache_dir, dedup, shard_size, shard_triples, compress) -> int:
+    res = 0
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_initWorker,
+                             initargs=(completed_output.uris, emitted.uris)) as executor:
+        futures = {executor.submit(_batchWorker, taxo, output_format, url, output,
+                                   cache_dir, web_cache_dir, dedup, shard_size, shard_triples,
+                                   compress): url
+                   for url in urls}
+        for future in as_completed(futures):
+            try:
+                url_res, uris, names = future.result()
+            except Exception as err:
+                logging.error("failed to process "+futures[future]+": "+str(err))
+                res = -1
+                continue
+            if url_res < 0:
+                res = -1
+            completed_output.update(uris)
+            completed_output.checkpoint()
+            emitted.update(names)
+            emitted.checkpoint()
+    return res
+
 
-    params: dict = dict()
-
-    params['out']: StringIO = StringIO()
-    params['facts']: StringIO = StringIO()
-    params['prefix']: StringIO = StringIO()
-
-    params['xbrl_zipfile']: FileSource = fp_taxo_zipfile
-    params['uri2file']: dict = {abspath(join(params['xbrl_zipfile'].url, file)): file for file in params['xbrl_zipfile'].dir}
-
-    params['package_name']: str = manager.config['packages'][taxo]['name']
-    params['package_uri']: str = manager.config['packages'][taxo]['URL']
-    params['output_format']: int = output_format
-
-    params['namespaces']: dict = dict()
-    params['dts_processed']: list = list()
-    params['id2elementTbl']: dict = dict()
-    params['dts_queue']: list = list()
-    params['factCount']: int = 0
-    params['conceptCount']: int = 0
-    params['xlinkCount']: int = 0
-    params['arcCount']: int = 0
-    params['locCount']: int = 0
-    params['resCount']: int = 0
-    params['linkCount']: int = 0
-    params['fileCount']: int = 0
-    params['errorCount']: int = 0
-    params['provenanceNumber']: int = 0
-    params['arcroleNumber']: int = 0
-    params['roleNumber']: int = 0
-    params['resourceCount']: int = 0
-    params['dtsCount']: int = 0
-    #dict: key: namespace, value (safe) url for filename
-    params['urlfilename']: dict = dict()
-    #dict: key: namespace, value stringIO containing document data
-    params['pagedata']: dict = dict()
-    #dict namespace -> source href
-    params['sources']: dict = dict()
-    #don't process instance docs that are already done
+def emittedIndex(output: str) -> CompletionIndex:
+    # the hashed names written to output, kept apart from the completed uris
+    return CompletionIndex(output, preloads_file=EMITTED_FILE, journal_file=EMITTED_JOURNAL_FILE)
+
+
+def go(taxo: int, output_format: int, url, output, completed_output: CompletionIndex,
+       save_preloads: bool = True, cache_dir: str = None,
+       stream_size: int = 64 * 1024 * 1024, compress=False,
+       prefetch: int = 4, web_cache_dir: str = None, offline: bool = False,
+       sink=None, dedup: bool = False, shard_size: int = None, shard_triples: int = None,
+       emitted: CompletionIndex = None) -> int:
+    #don't process instance docs that are already done, before anything is opened
     #target_output = ''.join(os.path.basename(url).split(".")[0:-1]) + '.ttl'
     if url in completed_output:
         #print(url, ' has already been processed, skipping.')
         return 0
+    log_file: str = join(output, "".join(os.path.basename(url).split(".")[0:-1])+".log")
+    logging.basicConfig(filename=log_file, level=logging.DEBUG, filemode="w")
+
+    package: dict = getManager().config['packages'][taxo]
+    if package['status'] == 'unavailable':
+        logging.error('taxonomy package '+package['URL']+' not found')
+        return -1
+    fp_taxo_zipfile: FileSource = openFileSource(package['URL'])
+    fp_taxo_zipfile.mappedPaths = package["remappings"]
+    fp_taxo_zipfile.open()
+
+    params: ConversionContext = ConversionContext()
+
+    params.xbrl_zipfile = fp_taxo_zipfile
+    params.uri2file = {abspath(join(params.xbrl_zipfile.url, file)): file for file in params.xbrl_zipfile.dir}
+
+    params.package_name = package['name']
+    params.package_uri = package['URL']
+    params.package_date = package.get('fileDate', '')
+    params.output_format = output_format
+    params.stream_size = stream_size
+
+    params.dts_queue = DtsQueue()
+    params.dts_processed = params.dts_queue.processed
+    #the taxonomy cache stores turtle, so it is only used with the turtle output files
+    #(formats 1 and 2), not with n-triples, n-quads or a sink given by the caller
+    turtle = sink is None and output_format not in (3, 4)
+    params.taxonomy_cache = TaxonomyCache(cache_dir) if cache_dir and turtle else None
+    params.web_cache = WebCache(web_cache_dir, offline=offline) if web_cache_dir else None
+    #with dedup, contexts and units get hashed names and the ones in emitted aren't written again;
+    #emitted.json of the output directory unless batch() hands its index over
+    if dedup:
+        params.emitted = emitted if emitted is not None else emittedIndex(output)
     print('processing:', url)
+    #files in output, unless another sink is given, e.g. a GraphSink
+    if sink is not None:
+        params.output_sink = sink
+    elif output_format == 3:
+        params.output_sink = NTriplesSink(output, compress, shard_size, shard_triples)
+    elif output_format == 4:
+        params.output_sink = NQuadsSink(output, compress, shard_size, shard_triples)
+    else:
+        params.output_sink = OutputSink(output, compress, shard_size, shard_triples)
+    params.output_sink.namespaces = params.namespaces
+    #prefetch threads, 0 disables
+    params.prefetcher = DtsPrefetcher(prefetch) if prefetch else None
 
     addNamespace("xbrli", "http://www.xbrl.org/2003/instance", params)
     addNamespace("link", "http://www.xbrl.org/2003/linkbase", params)
@@ -155,46 +287,71 @@ def go(taxo: int, output_format: int, url, output, completed_output) -> int:
 
 
     # schemas not to include
-    params['namespaces_to_skip'] = ["http://www.xbrl.org/2003/instance",
+    params.namespaces_to_skip = ["http://www.xbrl.org/2003/instance",
                                     "http://xbrl.org/2005/xbrldt",
                                     "http://www.xbrl.org/2003/XLink",
                                     "http://xbrl.org/2008/variable",
                                     "http://www.xbrl.org/2003/linkbase"]
 
     # utilfunctions.printNamespaces(params)
-    #setup filename and stringIO for instance doc
-    params['urlfilename']['instance'] = '/data/'+''.join(os.path.basename(url).split(".")[0:-1])
-    params['pagedata']['instance'] = StringIO()
-    params['sources']['instance'] = os.path.basename(url)
-    res = parse_xbrl(url, params, completed_output)
+    #setup filename and output file for instance doc
+    params.urlfilename['instance'] = '/data/'+''.join(os.path.basename(url).split(".")[0:-1])
+    params.pagedata['instance'] = params.output_sink.open('instance', params.urlfilename['instance'], url)
+    params.sources['instance'] = os.path.basename(url)
+    #what this conversion adds to the indexes, forgotten again if it fails
+    completed_mark: int = len(completed_output.pending)
+    emitted = params.emitted
+    emitted_mark: int = len(emitted.pending) if emitted is not None else 0
+    res = -1
+    try:
+        res = parse_xbrl(url, params, completed_output)
+    finally:
+        if params.prefetcher is not None:
+            params.prefetcher.close()
+        if res < 0:
+            #the instance is not complete, so a rerun converts it again
+            completed_output.rollback(completed_mark)
+            if emitted is not None:
+                emitted.rollback(emitted_mark)
+            for data in params.pagedata.values():
+                data.discard()
+            params.xbrl_zipfile.close()
+            if params.web_cache is not None:
+                params.web_cache.close()
+    if res < 0:
+        logging.error("failed to convert "+url)
+        return res
     if res:
-        logging.warning("WARNING: "+str(params['errorCount'])+" error(s) found when importing "+url)
-
-    params['prefix'] = printNamespaces(params)
-    for namespace, data in params['pagedata'].items():
-        file_content: StringIO = StringIO()
-        file_content.write("#Source HREF: " + params['sources'][namespace]+ "\n\n")
-        file_content.write("# RDF triples (turtle syntax)\n\n")
-        file_content.write(params['prefix'])
-        file_content.write("\n\n")
-        file_content.write(params['pagedata'][namespace].getvalue().replace('\u2264', ''))
-        url = params['urlfilename'][namespace]
-        strtime = str(time.time())
-        output_file: str = output + "".join(url) + '-' + strtime +".ttl"
-        #print('writing:', namespace, 'to:', output_file)
-        assert (output_file), 'unable to open ' + output_file + ' for writing!'
-        fh = open(output_file, "w", encoding='utf-8')
-        fh.write(file_content.getvalue())
-        fh.close()
+        logging.warning("WARNING: "+str(params.errorCount)+" error(s) found when importing "+url)
+
+    params.prefix = printNamespaces(params)
+    #input uri -> output files and output file -> sha256, for the manifest
+    outputs: dict = dict()
+    digests: dict = dict()
+    for namespace, data in params.pagedata.items():
+        header: str = "#Source HREF: " + params.sources[namespace]+ "\n\n" + \
+                      "# RDF triples (turtle syntax)\n\n" + \
+                      params.headers.get(namespace, params.prefix) + "\n\n"
+        #the triples are already on disk, the header is written in front of them
+        output_files: list = data.close(header)
+        #print('writing:', namespace, 'to:', output_files)
+        if output_files:
+            outputs[url if namespace == 'instance' else params.sources[namespace]] = output_files
+            digests.update(data.digests)
+    Manifest(output).update(outputs, digests)
     #write preloads
-    with open(join(output, 'preloads.json'), 'w') as outfile:
-        json.dump(completed_output, outfile, indent=4)
-    params['xbrl_zipfile'].close()
+    if save_preloads:
+        completed_output.checkpoint()
+        if params.emitted is not None:
+            params.emitted.checkpoint()
+    params.xbrl_zipfile.close()
+    if params.web_cache is not None:
+        params.web_cache.close()
 
     return 0
 
 
-def parse_xbrl(uri: str, params: dict, completed_output) -> int:
+def parse_xbrl(uri: str, params: ConversionContext, completed_output) -> int:
     assert(" " not in uri), uri + ': whitespace is not allowed in instance filenames, remove and try again'
     started = datetime.now()
 
@@ -204,28 +361,54 @@ def parse_xbrl(uri: str, params: dict, completed_output) -> int:
             base += os.sep
         uri = expandRelativePath(uri, base)
 
-    if loadXML(processInstance, uri, None, params, completed_output):
+    if isLargeInstance(uri, params):
+        handler = processInstanceStream
+        if params.emitted is not None:
+            # a fact may come before its context, which then has no hashed name yet
+            logging.warning("contexts and units of streamed instance "+uri+" are not deduplicated")
+            params.emitted = None
+    else:
+        handler = processInstance
+    if loadXML(handler, uri, None, params, completed_output):
         return -1
 
     # process taxonomy files
-    res = dispatchDtsQueue(params, completed_output)
+    if params.taxonomy_cache is None:
+        res = dispatchDtsQueue(params, completed_output)
+    else:
+        res = dispatchCachedDtsQueue(params.taxonomy_cache, params, completed_output)
 
     finished = datetime.now()
 
     logging.info("turtle generation took " + str(finished - started) + " seconds\nfound:\n" +
-                 str(params['factCount']) + " facts, \n" +
-                 str(params['conceptCount']) + " concepts, \n" +
-                 str(params['linkCount']) + " links, \n" +
-                 str(params['xlinkCount']) + " xlinks, \n" +
-                 str(params['arcCount']) + " arcs, \n" +
-                 str(params['locCount']) + " locators and \n" +
-                 str(params['resCount']) + " resources \nfrom processing "+str(params['fileCount'])+" files.")
-
-    if params['errorCount'] > 0:
+                 str(params.factCount) + " facts, \n" +
+                 str(params.conceptCount) + " concepts, \n" +
+                 str(params.linkCount) + " links, \n" +
+                 str(params.xlinkCount) + " xlinks, \n" +
+                 str(params.arcCount) + " arcs, \n" +
+                 str(params.locCount) + " locators and \n" +
+                 str(params.resCount) + " resources \nfrom processing "+str(params.fileCount)+" files, \n" +
+                 str(params.deferralCount) + " linkbases deferred until their schemas were loaded.\n" +
+                 "href cache: " + str(params.href_cache.hits) + " hits, " +
+                 str(params.href_cache.misses) + " misses.")
+
+    # the instance is converted, problems with the DTS are reported as warnings
+    if res or params.errorCount > 0:
         res = 1
 
     return res
 
 
+def isLargeInstance(uri: str, params: ConversionContext) -> bool:
+    if params.stream_size is None or isHttpUrl(uri):
+        return False
+    if uri[0:6] == "file:/":
+        uri = uri[6:]
+    try:
+        return os.path.getsize(uri) >= params.stream_size
+    except OSError:
+        return False
+
+
 if __name__ == "__main__":
     sys.exit(main())